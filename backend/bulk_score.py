@@ -0,0 +1,346 @@
+"""
+Nirabhi Bulk Scoring - Offline Backfills
+
+When our rules change we need to re-score a lot of historical content,
+and going through HTTP one post at a time would take weeks. This tool
+runs ContentAnalyzer directly over big JSONL or CSV files:
+
+- The input is memory-mapped and cut into byte ranges at line breaks;
+  each worker reads and parses its own range, so the parent stays cheap
+- Every worker process builds its analyzer once and reuses it
+- Each chunk is scored as one batch (see ContentAnalyzer.analyze_batch),
+  so per-text decisions run as NumPy array operations
+- Results are written in input order, whatever order workers finish in
+- A checkpoint is saved after every chunk, so `--resume` picks up where
+  an interrupted run stopped
+
+Usage:
+    python bulk_score.py posts.jsonl scores.jsonl --workers 8
+    python bulk_score.py posts.csv scores.csv --text-field body --resume
+
+CSV inputs need a header row and must not contain line breaks inside
+quoted fields (each record has to sit on one line).
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from models.artifact import ArtifactError, load_artifact
+from models.content_analyzer import ContentAnalyzer
+from models.policy import DEFAULT_POLICY
+
+OUTPUT_FIELDS = [
+    "id",
+    "toxicity_score",
+    "is_toxic",
+    "category",
+    "severity",
+    "sentiment_score",
+    "confidence",
+    "error",
+]
+
+# The output has no explanations or suggestions, so they're never built
+BULK_POLICY = replace(DEFAULT_POLICY, explanations=False, suggestions=False, support=False)
+
+# Each worker process keeps one analyzer and one event loop for its lifetime
+_analyzer: Optional[ContentAnalyzer] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker(artifact_path: Optional[str] = None):
+    """Build the analyzer once per worker process"""
+    global _analyzer, _loop
+    _loop = asyncio.new_event_loop()
+    # Batches skip flood detection and run on the loop, so no spam index or threads
+    _analyzer = ContentAnalyzer(
+        artifact=load_artifact(artifact_path) if artifact_path else None,
+        spam_index_size=0,
+        analysis_workers=0
+    )
+    _loop.run_until_complete(_analyzer.initialize())
+
+
+def _parse_records(
+    raw: bytes,
+    input_format: str,
+    header: Optional[List[str]],
+    text_field: str,
+    id_field: str,
+    first_line: int
+) -> Iterator[Tuple[Any, Optional[str], Optional[str]]]:
+    """Yield (id, text, error) for each non-blank line of a chunk"""
+    # Split on b"\n" only, as _plan_chunks and the line counts do; str.splitlines()
+    # would also break records on \r, \x85, U+2028 and U+2029 inside them
+    for line_number, raw_line in enumerate(raw.split(b"\n"), first_line):
+        if not raw_line.strip():
+            continue
+        try:
+            line = raw_line.decode("utf-8").rstrip("\r")
+            if input_format == "csv":
+                row = dict(zip(header, next(csv.reader([line]))))
+            else:
+                row = json.loads(line)
+        except (ValueError, csv.Error) as e:
+            yield line_number, None, f"unparseable record: {e}"
+            continue
+
+        if not isinstance(row, dict):
+            yield line_number, None, "record is not an object"
+            continue
+        record_id = row.get(id_field, line_number)
+        text = row.get(text_field)
+        if not isinstance(text, str) or not text.strip():
+            yield record_id, None, f"missing or empty '{text_field}'"
+        else:
+            yield record_id, text, None
+
+
+async def _score(records) -> List[Dict[str, Any]]:
+    """Score a chunk as one batch; if that fails, text by text to find the culprit"""
+    records = list(records)
+    try:
+        verdicts = iter(await _analyzer.analyze_batch(
+            [text for _, text, error in records if error is None], BULK_POLICY
+        ))
+    except Exception:
+        verdicts = None
+
+    results = []
+    for record_id, text, error in records:
+        if error is not None:
+            results.append({"id": record_id, "error": error})
+            continue
+        try:
+            analysis = next(verdicts) if verdicts is not None else (
+                await _analyzer.analyze_batch([text], BULK_POLICY)
+            )[0]
+        except Exception as e:
+            results.append({"id": record_id, "error": f"analysis failed: {e}"})
+            continue
+        results.append({
+            "id": record_id,
+            "toxicity_score": analysis.toxicity_score,
+            "is_toxic": analysis.is_toxic,
+            "category": analysis.category.value,
+            "severity": analysis.severity.value,
+            "sentiment_score": analysis.sentiment_score,
+            "confidence": analysis.confidence,
+        })
+    return results
+
+
+def _score_chunk(task: Dict[str, Any]) -> Tuple[bytes, int]:
+    """
+    Worker entry point: read one byte range of the input, score it and
+    return the serialized output plus the number of records.
+    """
+    with open(task["input_path"], "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            raw = mm[task["start"]:task["end"]]
+
+    records = _parse_records(
+        raw,
+        task["input_format"],
+        task["header"],
+        task["text_field"],
+        task["id_field"],
+        task["first_line"]
+    )
+    results = _loop.run_until_complete(_score(records))
+
+    if task["output_format"] == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=OUTPUT_FIELDS)
+        writer.writerows(results)
+        payload = buffer.getvalue()
+    else:
+        payload = "".join(json.dumps(result, ensure_ascii=False) + "\n" for result in results)
+    return payload.encode("utf-8"), len(results)
+
+
+def _plan_chunks(mm: mmap.mmap, start: int, chunk_bytes: int) -> Iterator[Tuple[int, int]]:
+    """Cut the file into ~chunk_bytes ranges that end on line breaks"""
+    size = len(mm)
+    while start < size:
+        end = min(start + chunk_bytes, size)
+        if end < size:
+            newline = mm.find(b"\n", end)
+            end = size if newline == -1 else newline + 1
+        yield start, end
+        start = end
+
+
+def _guess_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _load_checkpoint(path: str, input_path: str, input_size: int) -> Dict[str, Any]:
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint["input_path"] != os.path.abspath(input_path) or checkpoint["input_size"] != input_size:
+        raise SystemExit(f"❌ Checkpoint {path} belongs to a different input; refusing to resume")
+    return checkpoint
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    """Write the checkpoint atomically so a crash never leaves half a file"""
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+
+class Progress:
+    """A single self-updating progress line on stderr"""
+
+    def __init__(self, total_bytes: int, done_bytes: int, done_records: int):
+        self.total_bytes = total_bytes
+        self.start_bytes = done_bytes
+        self.start_records = done_records
+        self.started = time.monotonic()
+        self.last_shown = 0.0
+
+    def show(self, done_bytes: int, done_records: int, final: bool = False):
+        now = time.monotonic()
+        if not final and now - self.last_shown < 0.5:
+            return
+        self.last_shown = now
+        elapsed = max(now - self.started, 1e-9)
+        rate = (done_records - self.start_records) / elapsed
+        byte_rate = (done_bytes - self.start_bytes) / elapsed
+        percent = done_bytes / self.total_bytes * 100 if self.total_bytes else 100.0
+        eta = (self.total_bytes - done_bytes) / byte_rate if byte_rate else 0.0
+        sys.stderr.write(
+            f"\r📊 {done_records:,} records | {percent:5.1f}% | "
+            f"{rate:,.0f} rec/s | ETA {eta:,.0f}s   "
+        )
+        if final:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+
+def run(args: argparse.Namespace):
+    input_format = args.input_format or _guess_format(args.input)
+    output_format = args.output_format or _guess_format(args.output)
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+    input_size = os.path.getsize(args.input)
+
+    with open(args.input, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # CSV headers are read once here and shipped to every worker
+        header = None
+        data_start = 0
+        if input_format == "csv":
+            header_end = mm.find(b"\n")
+            header_end = len(mm) if header_end == -1 else header_end + 1
+            header = next(csv.reader([mm[:header_end].decode("utf-8")]))
+            data_start = header_end
+
+        checkpoint = {
+            "input_path": os.path.abspath(args.input),
+            "input_size": input_size,
+            "input_offset": data_start,
+            "output_offset": 0,
+            "records": 0,
+            "lines": 0,
+        }
+        if args.resume and os.path.exists(checkpoint_path):
+            checkpoint = _load_checkpoint(checkpoint_path, args.input, input_size)
+            print(f"🔄 Resuming after {checkpoint['records']:,} records", file=sys.stderr)
+
+        output_mode = "r+b" if checkpoint["output_offset"] and os.path.exists(args.output) else "wb"
+        with open(args.output, output_mode) as out:
+            # Drop anything written after the last checkpoint
+            out.seek(checkpoint["output_offset"])
+            out.truncate()
+            if output_format == "csv" and checkpoint["output_offset"] == 0:
+                out.write((",".join(OUTPUT_FIELDS) + "\r\n").encode("utf-8"))
+
+            progress = Progress(input_size, checkpoint["input_offset"], checkpoint["records"])
+            chunks = _plan_chunks(mm, checkpoint["input_offset"], args.chunk_bytes)
+            window = args.workers * 4  # Enough queued work to keep every core busy
+            pending: deque = deque()
+            first_line = checkpoint["lines"] + 1
+
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.artifact,)) as pool:
+                def submit_next() -> bool:
+                    nonlocal first_line
+                    span = next(chunks, None)
+                    if span is None:
+                        return False
+                    start, end = span
+                    lines = mm[start:end].count(b"\n") + (0 if mm[end - 1:end] == b"\n" else 1)
+                    task = {
+                        "input_path": args.input,
+                        "start": start,
+                        "end": end,
+                        "input_format": input_format,
+                        "output_format": output_format,
+                        "header": header,
+                        "text_field": args.text_field,
+                        "id_field": args.id_field,
+                        "first_line": first_line,
+                    }
+                    pending.append((pool.submit(_score_chunk, task), end, lines))
+                    first_line += lines
+                    return True
+
+                while len(pending) < window and submit_next():
+                    pass
+
+                while pending:
+                    # Always wait for the oldest chunk so output stays in input order
+                    future, end, lines = pending.popleft()
+                    payload, count = future.result()
+                    out.write(payload)
+                    out.flush()
+
+                    checkpoint["input_offset"] = end
+                    checkpoint["output_offset"] = out.tell()
+                    checkpoint["records"] += count
+                    checkpoint["lines"] += lines
+                    _save_checkpoint(checkpoint_path, checkpoint)
+                    progress.show(end, checkpoint["records"])
+
+                    submit_next()
+
+            progress.show(input_size, checkpoint["records"], final=True)
+
+    print(f"✅ Scored {checkpoint['records']:,} records into {args.output}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Score large JSONL/CSV files with Nirabhi offline")
+    parser.add_argument("input", help="JSONL or CSV file to score")
+    parser.add_argument("output", help="Where to write results (.jsonl or .csv)")
+    parser.add_argument("--text-field", default="text", help="Field holding the text (default: text)")
+    parser.add_argument("--id-field", default="id", help="Field holding the record ID (default: id)")
+    parser.add_argument("--input-format", choices=["jsonl", "csv"], help="Defaults to the input extension")
+    parser.add_argument("--output-format", choices=["jsonl", "csv"], help="Defaults to the output extension")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--chunk-bytes", type=int, default=1 << 20, help="Input bytes per work unit")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint if present")
+    parser.add_argument("--artifact", help="Prebuilt analyzer artifact shared by the workers (see models/artifact.py)")
+    args = parser.parse_args(argv)
+    if args.artifact:
+        try:
+            load_artifact(args.artifact)  # Fail fast here rather than in every worker
+        except ArtifactError as e:
+            parser.error(str(e))
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
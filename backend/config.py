@@ -7,7 +7,7 @@ us manage different environments (development, staging, production).
 """
 
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -48,6 +48,15 @@ class Settings(BaseSettings):
         env="DATABASE_URL"
     )
     database_echo: bool = Field(default=False, env="DATABASE_ECHO")  # Log SQL queries
+    rollup_retention_days: int = Field(default=90, env="ROLLUP_RETENTION_DAYS")  # Daily rows before monthly compaction
+    rollup_compaction_interval_seconds: float = Field(default=3600, env="ROLLUP_COMPACTION_INTERVAL_SECONDS")
+    rollup_monthly_retention_months: int = Field(default=24, env="ROLLUP_MONTHLY_RETENTION_MONTHS")  # Monthly rows kept (0 keeps them forever)
+    health_max_communities: int = Field(default=1000, env="HEALTH_MAX_COMMUNITIES")  # Communities with live health metrics (LRU)
+    
+    # Retention of raw analyses (0 keeps them forever)
+    analysis_retention_days: int = Field(default=30, env="ANALYSIS_RETENTION_DAYS")
+    retention_slice_ms: float = Field(default=5.0, env="RETENTION_SLICE_MS")  # Max work per slice
+    retention_interval_seconds: float = Field(default=60, env="RETENTION_INTERVAL_SECONDS")
     
     # Redis Configuration (for caching and background tasks)
     redis_url: str = Field(default="redis://localhost:6379", env="REDIS_URL")
@@ -59,11 +68,42 @@ class Settings(BaseSettings):
     )
     use_gpu: bool = Field(default=False, env="USE_GPU")  # Set to True if GPU available
     model_cache_dir: str = Field(default="./model_cache", env="MODEL_CACHE_DIR")
+    analyzer_artifact_path: Optional[str] = Field(default=None, env="ANALYZER_ARTIFACT_PATH")  # Built by models/artifact.py
     
     # Content Analysis Settings
     max_text_length: int = Field(default=10000, env="MAX_TEXT_LENGTH")
     default_toxicity_threshold: float = Field(default=0.7, env="DEFAULT_TOXICITY_THRESHOLD")
     analysis_timeout_seconds: int = Field(default=30, env="ANALYSIS_TIMEOUT_SECONDS")
+    max_tracked_threads: int = Field(default=10000, env="MAX_TRACKED_THREADS")  # Conversation states kept (LRU)
+    draft_sentence_cache_size: int = Field(default=50000, env="DRAFT_SENTENCE_CACHE_SIZE")  # Sentences memoized for drafts
+    policy_cache_size: int = Field(default=10000, env="POLICY_CACHE_SIZE")  # Compiled user policies kept (LRU)
+    spam_index_size: int = Field(default=100000, env="SPAM_INDEX_SIZE")  # Recent texts kept for flood detection (0 = off)
+    spam_window_seconds: float = Field(default=600, env="SPAM_WINDOW_SECONDS")
+    spam_similarity: float = Field(default=0.8, env="SPAM_SIMILARITY")  # Estimated Jaccard to count as a near-duplicate
+    spam_burst_size: int = Field(default=5, env="SPAM_BURST_SIZE")  # Near-duplicates per window that make a flood
+    spam_min_senders: int = Field(default=3, env="SPAM_MIN_SENDERS")  # Different senders a flood needs
+    ws_max_in_flight: int = Field(default=32, env="WS_MAX_IN_FLIGHT")  # Per WebSocket connection
+    stream_max_in_flight: int = Field(default=64, env="STREAM_MAX_IN_FLIGHT")  # Per /analyze/stream request
+    analysis_workers: int = Field(default=2, env="ANALYSIS_WORKERS")  # Threads for model inference (0 = run on the event loop)
+    
+    # Batch Jobs
+    job_workers: int = Field(default=2, env="JOB_WORKERS")  # Jobs scored at once
+    job_chunk_size: int = Field(default=100, env="JOB_CHUNK_SIZE")  # Items between progress saves
+    job_max_items: int = Field(default=10000, env="JOB_MAX_ITEMS")  # Per inline batch
+    job_input_dir: Optional[str] = Field(default=None, env="JOB_INPUT_DIR")  # File jobs read from here (unset = off)
+    jobs_journal_path: Optional[str] = Field(default=None, env="JOBS_JOURNAL_PATH")  # Keeps jobs across restarts (unset = off)
+    job_retention_days: int = Field(default=7, env="JOB_RETENTION_DAYS")
+    job_callback_timeout_seconds: float = Field(default=10, env="JOB_CALLBACK_TIMEOUT_SECONDS")
+    job_callback_attempts: int = Field(default=3, env="JOB_CALLBACK_ATTEMPTS")
+    job_callback_allowed_hosts: List[str] = Field(default=[], env="JOB_CALLBACK_ALLOWED_HOSTS")  # Hosts or ".domain"s callbacks may go to (empty = no callbacks)
+    
+    # Shadow Evaluation (see models/shadow.py)
+    shadow_candidate_path: Optional[str] = Field(default=None, env="SHADOW_CANDIDATE_PATH")  # Candidate spec (unset = off)
+    shadow_sample_rate: float = Field(default=0.05, env="SHADOW_SAMPLE_RATE")  # Share of /analyze requests scored twice
+    shadow_cpu_budget: float = Field(default=0.05, env="SHADOW_CPU_BUDGET")  # Share of one core shadow scoring may use
+    shadow_max_delay_ms: float = Field(default=100, env="SHADOW_MAX_DELAY_MS")  # Older samples are dropped, not run late
+    shadow_score_tolerance: float = Field(default=0.15, env="SHADOW_SCORE_TOLERANCE")  # Score gap still counted as agreement
+    shadow_max_disagreements: int = Field(default=1000, env="SHADOW_MAX_DISAGREEMENTS")  # Newest kept
     
     # Rate Limiting
     rate_limit_per_minute: int = Field(default=60, env="RATE_LIMIT_PER_MINUTE")
@@ -73,6 +113,15 @@ class Settings(BaseSettings):
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     log_format: str = Field(default="json", env="LOG_FORMAT")  # json or text
     log_file: str = Field(default="nirabhi.log", env="LOG_FILE")
+    log_text_previews: bool = Field(default=False, env="LOG_TEXT_PREVIEWS")  # Users' text never hits the logs unless enabled
+    log_sample_rates: Dict[str, float] = Field(  # Fraction of each hot-path event kept, e.g. '{"analysis": 0.05}'
+        default={"analysis": 0.05},
+        env="LOG_SAMPLE_RATES"
+    )
+    log_rate_limits: Dict[str, float] = Field(  # Max of each hot-path event per second
+        default={"analysis": 20, "support": 5},
+        env="LOG_RATE_LIMITS"
+    )
     
     # Security Settings
     secret_key: str = Field(
@@ -81,6 +130,7 @@ class Settings(BaseSettings):
     )
     algorithm: str = Field(default="HS256", env="ALGORITHM")
     access_token_expire_minutes: int = Field(default=30, env="ACCESS_TOKEN_EXPIRE_MINUTES")
+    admin_token: Optional[str] = Field(default=None, env="ADMIN_TOKEN")  # Admin endpoints are off until this is set
     
     # Feature Flags
     enable_analytics: bool = Field(default=True, env="ENABLE_ANALYTICS")
@@ -96,6 +146,14 @@ class Settings(BaseSettings):
     enable_metrics: bool = Field(default=True, env="ENABLE_METRICS")
     metrics_port: int = Field(default=9090, env="METRICS_PORT")
     sentry_dsn: Optional[str] = Field(default=None, env="SENTRY_DSN")
+    profile_max_seconds: float = Field(default=30, env="PROFILE_MAX_SECONDS")  # Longest sampling profile allowed
+    
+    # Readiness: /ready reports not ready past any of these (0 = don't check)
+    ready_max_loop_lag_ms: float = Field(default=100, env="READY_MAX_LOOP_LAG_MS")
+    ready_max_in_flight: int = Field(default=256, env="READY_MAX_IN_FLIGHT")
+    ready_max_queued: int = Field(default=32, env="READY_MAX_QUEUED")  # Analyses waiting for an inference thread
+    ready_max_write_backlog: int = Field(default=1000, env="READY_MAX_WRITE_BACKLOG")
+    ready_max_p99_ms: float = Field(default=1000, env="READY_MAX_P99_MS")  # Over the last minute
     
     # Content Moderation Policies
     strict_mode: bool = Field(default=False, env="STRICT_MODE")
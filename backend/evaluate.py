@@ -0,0 +1,289 @@
+"""
+Nirabhi Evaluation - Quality Versus Latency
+
+The cutoffs in `_combine_analysis_scores` and `_determine_category`, and
+whether the model is worth its cost, have so far been set by feel. This
+tool replays a labeled corpus through several analyzer configurations
+and measures, for each one:
+
+- precision and recall per ToxicityCategory, plus macro F1
+- precision and recall of `is_toxic` (a text counts as toxic when its
+  label isn't "safe")
+- throughput and latency percentiles
+
+It then prints a Pareto table: a configuration is marked when no other
+one is both faster and more accurate. Give accuracy targets and it names
+the cheapest configuration that meets them.
+
+Configurations are candidate specs, the same JSON shadow evaluation
+reads (see models/shadow.py). A few are built in (rules with default,
+stricter and more lenient thresholds, smaller lexicons, and the model
+and rules-then-model cascade when transformers is installed). Add your
+own with --config.
+
+Usage:
+    python evaluate.py corpus.jsonl
+    python evaluate.py corpus.csv --config candidate.json --min-precision 0.8 --min-recall 0.7
+    python evaluate.py corpus.jsonl --only rules rules-strict --json report.json
+
+The corpus is JSONL or CSV (with a header row) with a text field and a
+label field holding a category value such as "threat" or "safe".
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.content_analyzer import TRANSFORMERS_AVAILABLE
+from models.schemas import ToxicityCategory
+from models.shadow import CandidateAnalyzer, load_candidate
+
+BUILTIN_CONFIGS: List[Dict[str, Any]] = [
+    {"name": "rules"},
+    {
+        "name": "rules-strict",
+        "thresholds": {"safe_below": 0.2, "harassment_above": 0.4, "hate_speech_above": 0.6},
+    },
+    {
+        "name": "rules-lenient",
+        "thresholds": {"safe_below": 0.4, "harassment_above": 0.6, "hate_speech_above": 0.8},
+    },
+    {"name": "rules-lexicon-2000", "lexicon_size": 2000},
+    {"name": "rules-lexicon-500", "lexicon_size": 500},
+    {"name": "model", "use_model": True},
+    {"name": "cascade", "use_model": True, "cascade_band": [0.2, 0.7]},
+]
+
+WARMUP_ITEMS = 50
+
+
+def load_corpus(path: str, text_field: str, label_field: str) -> List[Tuple[str, ToxicityCategory]]:
+    """Read (text, label) pairs. Exits with a message on a malformed corpus."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            try:
+                rows = [json.loads(line) for line in f if line.strip()]
+            except ValueError as e:
+                raise SystemExit(f"❌ {path} is not valid JSONL: {e}")
+
+    corpus = []
+    labels = {category.value: category for category in ToxicityCategory}
+    for line_number, row in enumerate(rows, 1):
+        text, label = row.get(text_field), row.get(label_field)
+        if not isinstance(text, str) or not text.strip():
+            raise SystemExit(f"❌ Record {line_number} has no '{text_field}'")
+        if label not in labels:
+            raise SystemExit(f"❌ Record {line_number} has unknown label {label!r}")
+        corpus.append((text.strip(), labels[label]))
+    if not corpus:
+        raise SystemExit(f"❌ {path} has no records")
+    return corpus
+
+
+def _percentile(ordered: List[float], share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def _ratio(hits: int, total: int) -> Optional[float]:
+    return hits / total if total else None
+
+
+def _f1(precision: Optional[float], recall: Optional[float]) -> float:
+    if not precision or not recall:
+        return 0.0
+    return 2 * precision * recall / (precision + recall)
+
+
+def score_predictions(
+    labels: List[ToxicityCategory],
+    predicted: List[ToxicityCategory],
+    flagged: List[bool]
+) -> Dict[str, Any]:
+    """Per-category precision/recall, macro F1 over labelled categories, and is_toxic precision/recall"""
+    true_positives, predicted_counts, label_counts = Counter(), Counter(predicted), Counter(labels)
+    for label, guess in zip(labels, predicted):
+        if label == guess:
+            true_positives[label] += 1
+
+    categories = {}
+    for category in ToxicityCategory:
+        if not label_counts[category] and not predicted_counts[category]:
+            continue
+        precision = _ratio(true_positives[category], predicted_counts[category])
+        recall = _ratio(true_positives[category], label_counts[category])
+        categories[category.value] = {
+            "support": label_counts[category],
+            "precision": precision,
+            "recall": recall,
+            "f1": _f1(precision, recall),
+        }
+
+    labelled = [stats["f1"] for stats in categories.values() if stats["support"]]
+    toxic = [label != ToxicityCategory.SAFE for label in labels]
+    caught = sum(1 for is_toxic, flag in zip(toxic, flagged) if is_toxic and flag)
+    flag_precision = _ratio(caught, sum(flagged))
+    flag_recall = _ratio(caught, sum(toxic))
+    return {
+        "categories": categories,
+        "macro_f1": sum(labelled) / len(labelled) if labelled else 0.0,
+        "flag_precision": flag_precision,
+        "flag_recall": flag_recall,
+        "flag_f1": _f1(flag_precision, flag_recall),
+    }
+
+
+async def evaluate_config(
+    spec: Dict[str, Any],
+    corpus: List[Tuple[str, ToxicityCategory]],
+    rounds: int = 3
+) -> Dict[str, Any]:
+    """
+    Replay the corpus through one configuration. Timings come from the
+    fastest of `rounds` passes, so one noisy pass doesn't decide a ranking.
+    """
+    analyzer = CandidateAnalyzer(spec)
+    await analyzer.initialize()
+    for text, _ in corpus[:WARMUP_ITEMS]:
+        await analyzer.analyze_text(text)
+
+    elapsed = float("inf")
+    for _ in range(rounds):
+        round_latencies, predicted, flagged = [], [], []
+        started = time.perf_counter()
+        for text, _ in corpus:
+            item_started = time.perf_counter()
+            verdict = await analyzer.analyze_text(text)
+            round_latencies.append((time.perf_counter() - item_started) * 1000)
+            predicted.append(verdict.category)
+            flagged.append(verdict.is_toxic)
+        round_elapsed = time.perf_counter() - started
+        if round_elapsed < elapsed:
+            elapsed, latencies_ms = round_elapsed, round_latencies
+
+    ordered = sorted(latencies_ms)
+    return {
+        "name": spec["name"],
+        "spec": spec,
+        **score_predictions([label for _, label in corpus], predicted, flagged),
+        "items_per_second": len(corpus) / elapsed,
+        "latency_ms": {
+            "mean": sum(ordered) / len(ordered),
+            "p50": _percentile(ordered, 0.50),
+            "p95": _percentile(ordered, 0.95),
+            "p99": _percentile(ordered, 0.99),
+        },
+    }
+
+
+def mark_pareto(results: List[Dict[str, Any]]):
+    """Flag configurations no other one beats on both mean latency and macro F1"""
+    for result in results:
+        cost, quality = result["latency_ms"]["mean"], result["macro_f1"]
+        result["pareto"] = not any(
+            other["latency_ms"]["mean"] <= cost and other["macro_f1"] >= quality
+            and (other["latency_ms"]["mean"] < cost or other["macro_f1"] > quality)
+            for other in results
+        )
+
+
+def cheapest_meeting(results: List[Dict[str, Any]], targets: Dict[str, float]) -> Optional[Dict[str, Any]]:
+    """The fastest configuration meeting every target, if any does"""
+    meeting = [
+        result for result in results
+        if all((result[metric] or 0.0) >= minimum for metric, minimum in targets.items())
+    ]
+    return min(meeting, key=lambda result: result["latency_ms"]["mean"], default=None)
+
+
+def _show(value: Optional[float]) -> str:
+    return "   -  " if value is None else f"{value:6.3f}"
+
+
+def print_report(results: List[Dict[str, Any]], per_category: bool):
+    print(f"{'configuration':<22} {'flag P':>6} {'flag R':>6} {'macroF1':>7} {'items/s':>9} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}  pareto")
+    for result in sorted(results, key=lambda result: result["latency_ms"]["mean"]):
+        latency = result["latency_ms"]
+        print(f"{result['name']:<22} {_show(result['flag_precision'])} {_show(result['flag_recall'])} "
+              f"{result['macro_f1']:7.3f} {result['items_per_second']:9,.0f} "
+              f"{latency['p50']:7.3f} {latency['p95']:7.3f} {latency['p99']:7.3f}  "
+              f"{'*' if result['pareto'] else ''}")
+
+    if per_category:
+        for result in results:
+            print(f"\n{result['name']}")
+            print(f"  {'category':<16} {'support':>7} {'precision':>9} {'recall':>6}")
+            for category, stats in result["categories"].items():
+                print(f"  {category:<16} {stats['support']:7d}    {_show(stats['precision'])} {_show(stats['recall'])}")
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    corpus = load_corpus(args.corpus, args.text_field, args.label_field)
+    configs = BUILTIN_CONFIGS + [load_candidate(path).spec for path in args.config]
+    if args.only:
+        configs = [spec for spec in configs if spec["name"] in args.only]
+
+    results = []
+    for spec in configs:
+        if spec.get("use_model") and not TRANSFORMERS_AVAILABLE:
+            print(f"⏭️  Skipping {spec['name']}: transformers is not installed", file=sys.stderr)
+            continue
+        print(f"📊 Evaluating {spec['name']} on {len(corpus):,} texts...", file=sys.stderr)
+        results.append(await evaluate_config(spec, corpus, args.rounds))
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare analyzer configurations on a labeled corpus")
+    parser.add_argument("corpus", help="Labeled JSONL or CSV corpus")
+    parser.add_argument("--text-field", default="text", help="Field holding the text (default: text)")
+    parser.add_argument("--label-field", default="label", help="Field holding the category (default: label)")
+    parser.add_argument("--config", action="append", default=[], help="Extra candidate spec (repeatable)")
+    parser.add_argument("--only", nargs="+", help="Evaluate only these configurations")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed passes per configuration; the fastest counts")
+    parser.add_argument("--min-precision", type=float, help="Required is_toxic precision")
+    parser.add_argument("--min-recall", type=float, help="Required is_toxic recall")
+    parser.add_argument("--min-macro-f1", type=float, help="Required macro F1 across categories")
+    parser.add_argument("--per-category", action="store_true", help="Also print per-category tables")
+    parser.add_argument("--json", help="Write the full results here")
+    args = parser.parse_args(argv)
+
+    try:
+        results = asyncio.run(run(args))
+    except ValueError as e:
+        parser.error(str(e))
+    if not results:
+        raise SystemExit("❌ No configurations to evaluate")
+
+    mark_pareto(results)
+    print_report(results, args.per_category)
+
+    targets = {
+        metric: minimum for metric, minimum in (
+            ("flag_precision", args.min_precision),
+            ("flag_recall", args.min_recall),
+            ("macro_f1", args.min_macro_f1),
+        ) if minimum is not None
+    }
+    if targets:
+        best = cheapest_meeting(results, targets)
+        if best is None:
+            print("\n❌ No configuration meets the targets")
+        else:
+            print(f"\n✅ Cheapest configuration meeting the targets: {best['name']} "
+                  f"({best['latency_ms']['mean']:.3f} ms mean)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
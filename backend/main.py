@@ -11,29 +11,56 @@ This is the heart of our content moderation system. It provides APIs for:
 Built with love for creating safer digital spaces.
 """
 
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query, WebSocket, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from fastapi.encoders import jsonable_encoder
 import uvicorn
 from typing import List, Optional
+import asyncio
+import hmac
 import logging
 from datetime import datetime
 
 # Import our custom modules
 from models.content_analyzer import ContentAnalyzer
+from models.artifact import ArtifactError, load_artifact
 from models.database import Database
+from models.retention import RetentionManager
+from models.jobs import JobRunner
+from models.shadow import ShadowEvaluator, load_candidate
+from models.history_index import decode_cursor
+from models.export import EXPORT_FORMATS, ndjson_chunks, csv_chunks
 from models.schemas import (
     ContentAnalysisRequest,
     ContentAnalysisResponse,
     UserPreferences,
     ToxicityReport,
-    HealthCheck
+    ToxicityCategory,
+    SeverityLevel,
+    AnalysisHistoryPage,
+    HealthCheck,
+    JobRequest,
+    JobInfo,
+    JobResultsPage,
+    JobStatus
 )
-from utils.logger import setup_logger
+from utils.logger import setup_logger, log_event
+from utils.realtime import ChatModerationSession
+from utils.ndjson_stream import NDJSONDuplexResponse, stream_analyses
+from utils.profiler import format_collapsed, profile_coroutine, sample_event_loop
+from utils.load_monitor import LoadMonitor, ReadinessThresholds
 from config import settings
 
 # Initialize our beautiful logger
-logger = setup_logger()
+logger = setup_logger(
+    log_level=settings.get_log_level(),
+    log_format=settings.log_format,
+    log_file=settings.log_file,
+    production=settings.is_production(),
+    sample_rates=settings.log_sample_rates,
+    rate_limits=settings.log_rate_limits
+)
 
 # Create the FastAPI app with a warm welcome
 app = FastAPI(
@@ -53,9 +80,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cheap gauges of how loaded we are, for /health and /ready
+load_monitor = LoadMonitor()
+readiness_thresholds = ReadinessThresholds(
+    max_loop_lag_ms=settings.ready_max_loop_lag_ms,
+    max_in_flight=settings.ready_max_in_flight,
+    max_queued=settings.ready_max_queued,
+    max_write_backlog=settings.ready_max_write_backlog,
+    max_p99_ms=settings.ready_max_p99_ms
+)
+app.add_middleware(load_monitor.middleware)
+
+def load_analyzer_artifact():
+    """
+    Map the prebuilt analyzer artifact, if one is configured. A stale or
+    damaged artifact is refused and we build from source instead.
+    """
+    if not settings.analyzer_artifact_path:
+        return None
+    try:
+        artifact = load_artifact(settings.analyzer_artifact_path)
+    except ArtifactError as e:
+        logger.error(f"❌ Refusing analyzer artifact, building from source instead: {e}")
+        return None
+    logger.info(f"📦 Using analyzer artifact {artifact.path} (built {artifact.header['built_at']})")
+    return artifact
+
 # Initialize our AI brain and database
-content_analyzer = ContentAnalyzer()
-database = Database()
+content_analyzer = ContentAnalyzer(
+    max_tracked_threads=settings.max_tracked_threads,
+    sentence_cache_size=settings.draft_sentence_cache_size,
+    spam_index_size=settings.spam_index_size,
+    spam_window_seconds=settings.spam_window_seconds,
+    spam_similarity=settings.spam_similarity,
+    spam_burst_size=settings.spam_burst_size,
+    spam_min_senders=settings.spam_min_senders,
+    analysis_workers=settings.analysis_workers,
+    artifact=load_analyzer_artifact()
+)
+def load_shadow_evaluator():
+    """
+    Set up shadow evaluation if a candidate is configured. A candidate we
+    can't load turns shadow mode off rather than stopping the service.
+    """
+    if not settings.shadow_candidate_path:
+        return None
+    try:
+        candidate = load_candidate(settings.shadow_candidate_path)
+    except ValueError as e:
+        logger.error(f"❌ Shadow evaluation disabled, bad candidate: {e}")
+        return None
+    return ShadowEvaluator(
+        candidate,
+        sample_rate=settings.shadow_sample_rate,
+        cpu_budget=settings.shadow_cpu_budget,
+        max_delay_ms=settings.shadow_max_delay_ms,
+        score_tolerance=settings.shadow_score_tolerance,
+        max_disagreements=settings.shadow_max_disagreements
+    )
+
+shadow = load_shadow_evaluator()
+database = Database(
+    rollup_retention_days=settings.rollup_retention_days,
+    rollup_compaction_interval_seconds=settings.rollup_compaction_interval_seconds,
+    rollup_monthly_retention_months=settings.rollup_monthly_retention_months,
+    rollup_compaction_slice_ms=settings.retention_slice_ms,
+    policy_cache_size=settings.policy_cache_size,
+    jobs_journal_path=settings.jobs_journal_path,
+    job_retention_days=settings.job_retention_days,
+    health_max_communities=settings.health_max_communities
+)
+retention = RetentionManager(
+    database,
+    retention_days=settings.analysis_retention_days,
+    slice_ms=settings.retention_slice_ms,
+    interval_seconds=settings.retention_interval_seconds
+)
+jobs = JobRunner(
+    database,
+    content_analyzer,
+    workers=settings.job_workers,
+    chunk_size=settings.job_chunk_size,
+    max_items=settings.job_max_items,
+    max_text_length=settings.max_text_length,
+    input_dir=settings.job_input_dir,
+    callback_timeout_seconds=settings.job_callback_timeout_seconds,
+    callback_attempts=settings.job_callback_attempts,
+    callback_allowed_hosts=settings.job_callback_allowed_hosts
+)
 
 @app.on_event("startup")
 async def startup_event():
@@ -66,6 +178,11 @@ async def startup_event():
     logger.info("🚀 Nirabhi is starting up...")
     await database.connect()
     await content_analyzer.initialize()
+    if shadow is not None:
+        await shadow.initialize()
+    retention.start()
+    await jobs.start()
+    load_monitor.start()
     logger.info("✅ All systems ready! Nirabhi is now protecting digital spaces.")
 
 @app.on_event("shutdown")
@@ -75,8 +192,13 @@ async def shutdown_event():
     Always good to be polite!
     """
     logger.info("👋 Nirabhi is shutting down...")
+    retention.stop()
+    jobs.stop()
+    load_monitor.stop()
+    content_analyzer.close()
     await database.disconnect()
     logger.info("✅ Shutdown complete. Thanks for using Nirabhi!")
+    await logger.complete()  # Flush anything still queued for the sinks
 
 @app.get("/", response_model=HealthCheck)
 async def root():
@@ -91,6 +213,24 @@ async def root():
         version="1.0.0"
     )
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Admin endpoints answer 404 until ADMIN_TOKEN is set, then 403 to
+    anyone without it.
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def verdict_response(verdict, headers: Optional[dict] = None) -> Response:
+    """
+    Serialize a verdict once, here at the edge. Returning a ready Response
+    skips FastAPI's own validation pass; `response_model` still documents
+    the shape.
+    """
+    return Response(verdict.to_json(), media_type="application/json", headers=headers)
+
 @app.post("/analyze", response_model=ContentAnalysisResponse)
 async def analyze_content(
     request: ContentAnalysisRequest,
@@ -108,22 +248,45 @@ async def analyze_content(
     It's like having a wise friend who helps keep conversations healthy.
     """
     try:
-        logger.info(f"🔍 Analyzing content: {request.text[:50]}...")
+        if settings.log_text_previews:
+            log_event("analysis.preview", f"🔍 Analyzing content: {request.text[:50]}...")
+        
+        # Apply the user's saved preferences, if we know who they are
+        policy = await database.get_user_policy(request.user_id) if request.user_id else None
         
         # Use our AI brain to analyze the content
         analysis_result = await content_analyzer.analyze_text(
             text=request.text,
             context=request.context,
-            user_preferences=request.user_preferences
+            user_preferences=request.user_preferences,
+            thread_id=request.thread_id,
+            policy=policy,
+            community_id=request.community_id,
+            sender_id=request.sender_id
         )
         
         # Store the analysis for future learning (in the background)
         background_tasks.add_task(
-            database.store_analysis,
+            load_monitor.track_write(database.store_analysis),
             request.text,
-            analysis_result
+            analysis_result,
+            request.user_id,
+            request.community_id
         )
         
+        # Now and then, see how a candidate analyzer would have scored it
+        if shadow is not None:
+            sampled_at = shadow.sample(analysis_result)
+            if sampled_at is not None:
+                background_tasks.add_task(
+                    shadow.evaluate,
+                    analysis_result,
+                    sampled_at,
+                    context=request.context,
+                    user_preferences=request.user_preferences,
+                    policy=policy
+                )
+        
         # If content is highly toxic, let's also prepare helpful resources
         if analysis_result.toxicity_score > 0.7:
             background_tasks.add_task(
@@ -131,8 +294,15 @@ async def analyze_content(
                 analysis_result
             )
         
-        logger.info(f"✅ Analysis complete. Toxicity score: {analysis_result.toxicity_score}")
-        return analysis_result
+        log_event(
+            "analysis",
+            "✅ Analysis complete",
+            toxicity_score=analysis_result.toxicity_score,
+            category=analysis_result.category.value,
+            processing_time_ms=analysis_result.processing_time_ms,
+            text_length=len(request.text)
+        )
+        return verdict_response(analysis_result)
         
     except Exception as e:
         logger.error(f"❌ Error analyzing content: {str(e)}")
@@ -141,6 +311,70 @@ async def analyze_content(
             detail="Oops! Something went wrong while analyzing the content. Please try again."
         )
 
+@app.post("/analyze/draft", response_model=ContentAnalysisResponse)
+async def analyze_draft(request: ContentAnalysisRequest):
+    """
+    Check a draft while it's still being typed.
+    
+    Built for pre-posting warnings that re-check on every pause in typing:
+    sentences we've already seen are served from cache, so only the part
+    the user just wrote gets analyzed. Drafts aren't stored.
+    """
+    try:
+        policy = await database.get_user_policy(request.user_id) if request.user_id else None
+        analysis_result, stats = await content_analyzer.analyze_draft(
+            text=request.text,
+            user_preferences=request.user_preferences,
+            policy=policy
+        )
+    except Exception as e:
+        logger.error(f"❌ Error analyzing draft: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Oops! Something went wrong while checking your draft. Please try again."
+        )
+    
+    return verdict_response(analysis_result, {
+        "X-Draft-Sentences": str(stats.sentences),
+        "X-Draft-Cache-Hits": str(stats.cache_hits)
+    })
+
+@app.post("/analyze/stream")
+async def analyze_content_stream(request: Request):
+    """
+    Analyze a large batch as a stream.
+    
+    Send NDJSON lines like {"id": "a", "text": "..."} and read NDJSON
+    results back as each item finishes - no need to wait for the whole
+    batch, and no limit on how many items you send.
+    """
+    return NDJSONDuplexResponse(
+        stream_analyses(
+            request.stream(),
+            content_analyzer,
+            window=settings.stream_max_in_flight,
+            max_text_length=settings.max_text_length,
+            on_result=database.store_analysis
+        )
+    )
+
+@app.websocket("/ws/analyze")
+async def analyze_stream_socket(websocket: WebSocket):
+    """
+    Real-time moderation for chat.
+    
+    Keep one connection open, send messages with IDs, and receive verdicts
+    as soon as each one is ready. See utils/realtime.py for the protocol.
+    """
+    session = ChatModerationSession(
+        websocket,
+        content_analyzer,
+        max_in_flight=settings.ws_max_in_flight,
+        max_text_length=settings.max_text_length,
+        on_result=database.store_analysis
+    )
+    await session.run()
+
 @app.get("/reports/user/{user_id}", response_model=List[ToxicityReport])
 async def get_user_reports(user_id: str):
     """
@@ -159,6 +393,145 @@ async def get_user_reports(user_id: str):
             detail="Couldn't fetch your reports right now. Please try again later."
         )
 
+@app.get("/history", response_model=AnalysisHistoryPage, dependencies=[Depends(require_admin)])
+async def get_history(
+    user_id: Optional[str] = None,
+    category: Optional[ToxicityCategory] = None,
+    severity: Optional[SeverityLevel] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """
+    Search past analyses, newest first.
+    
+    Every filter is optional and they can be combined. Results come in
+    pages - pass the `next_cursor` from one page to get the next.
+    Rows include the original text, so this is admin-only.
+    """
+    try:
+        return await database.query_analysis_history(
+            user_id=user_id,
+            category=category,
+            severity=severity,
+            since=since,
+            until=until,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Error querying history: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Couldn't fetch the analysis history right now. Please try again later."
+        )
+
+@app.get("/history/export", dependencies=[Depends(require_admin)])
+async def export_history(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: Optional[str] = None,
+    category: Optional[ToxicityCategory] = None,
+    severity: Optional[SeverityLevel] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Stream matching analyses as NDJSON or CSV, oldest first.
+    
+    Rows are written as they are read, so exports of any size use the same
+    small amount of memory. Each row includes a `cursor`; if a download
+    breaks, pass the last one back to resume right after it.
+    Admin-only, like /history.
+    """
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    batches = database.iter_analysis_records(
+        user_id=user_id,
+        category=category,
+        severity=severity,
+        since=since,
+        until=until,
+        cursor=cursor
+    )
+    chunks = ndjson_chunks(batches) if format == "ndjson" else csv_chunks(batches)
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="nirabhi-history.{format}"'}
+    )
+
+@app.post("/jobs", response_model=JobInfo, status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Score a big batch in the background.
+    
+    Send the items themselves, or the name of a JSONL/CSV file in the
+    server's job input directory. You get the job's ID straight away -
+    poll GET /jobs/{job_id} for progress and read results from
+    GET /jobs/{job_id}/results. Give a `callback_url` to be told when
+    it's done instead.
+    """
+    try:
+        return await jobs.submit(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str):
+    """
+    A job's status and progress.
+    """
+    job = await database.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No such job")
+    return job
+
+@app.get("/jobs/{job_id}/results", response_model=JobResultsPage)
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    A page of a job's results, in input order. Results can be read while
+    the job is still running; keep passing `next_offset` back to follow it.
+    """
+    job = await database.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No such job")
+    results = await database.get_job_results(job_id, offset, limit)
+    next_offset = offset + len(results)
+    finished = job.status in (JobStatus.COMPLETED, JobStatus.FAILED)
+    return JobResultsPage(
+        job_id=job_id,
+        status=job.status,
+        results=results,
+        next_offset=None if finished and next_offset >= job.processed else next_offset
+    )
+
+@app.get("/stats/health")
+async def community_health(community: Optional[str] = Query(None, max_length=128)):
+    """
+    How a community (or, without one, everyone) is doing right now.
+    
+    For the last minute, hour and day: analyses per minute, the share
+    that was toxic, categories, and the mean, p50, p90 and p99 of
+    toxicity and sentiment scores. Served from running metrics, so it
+    costs the same however much history we hold.
+    """
+    snapshot = database.health.snapshot(community)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No recent analyses for this community")
+    return snapshot
+
 @app.post("/preferences/{user_id}")
 async def update_user_preferences(
     user_id: str,
@@ -180,21 +553,148 @@ async def update_user_preferences(
             detail="Couldn't update your preferences right now. Please try again."
         )
 
+def load_snapshot() -> dict:
+    """What the probes report: component state plus load gauges"""
+    return {
+        "timestamp": datetime.utcnow(),
+        "components": {
+            "database": "connected" if database.connected else "disconnected",
+            "ai_model": content_analyzer.model_status,
+            "api": "running"
+        },
+        "load": load_monitor.snapshot(queued=content_analyzer.queued_inferences)
+    }
+
 @app.get("/health")
 async def health_check():
     """
     A quick health check to make sure everything is running smoothly.
     Like checking your pulse - simple but important!
+    
+    This is liveness: if we can answer at all, we're alive, so it's always
+    a 200. Whether we should get traffic right now is /ready's call.
     """
-    return {
-        "status": "healthy",
-        "timestamp": datetime.utcnow(),
-        "components": {
-            "database": "healthy",
-            "ai_model": "loaded",
-            "api": "running"
+    snapshot = load_snapshot()
+    components = snapshot["components"]
+    healthy = components["database"] == "connected" and components["ai_model"] != "loading"
+    return {"status": "healthy" if healthy else "starting", **snapshot}
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Should the load balancer send us traffic? 503 while the models are
+    loading, the database is down or any load gauge is past its threshold.
+    """
+    snapshot = load_snapshot()
+    reasons = LoadMonitor.overloaded(snapshot["load"], readiness_thresholds)
+    if snapshot["components"]["ai_model"] == "loading":
+        reasons.insert(0, "models are still loading")
+    if snapshot["components"]["database"] != "connected":
+        reasons.insert(0, "database is not connected")
+    return JSONResponse(
+        jsonable_encoder({"ready": not reasons, "reasons": reasons, **snapshot}),
+        status_code=503 if reasons else 200
+    )
+
+@app.get("/metrics/storage")
+async def storage_metrics():
+    """
+    How much analysis data we are holding and how retention is keeping up.
+    """
+    if not settings.enable_metrics:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return retention.metrics()
+
+@app.get("/metrics/pipeline")
+async def pipeline_metrics():
+    """
+    The analysis stage graph: which stages run together, and how long
+    each one takes on average and at worst.
+    """
+    if not settings.enable_metrics:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return content_analyzer.pipeline.describe()
+
+@app.get("/metrics/shadow")
+async def shadow_metrics():
+    """
+    How often the shadow candidate agrees with the live analyzer, how much
+    shadow work was dropped and how the two compare on latency.
+    """
+    if not settings.enable_metrics or shadow is None:
+        raise HTTPException(status_code=404, detail="Shadow evaluation is not running")
+    return shadow.summary()
+
+# Only one profile at a time, whichever kind
+profile_lock = asyncio.Lock()
+
+def collapsed_stacks_response(stacks, name: str, headers: dict) -> Response:
+    headers["Content-Disposition"] = f'attachment; filename="{name}-{datetime.utcnow():%Y%m%dT%H%M%S}.folded"'
+    return Response(format_collapsed(stacks), media_type="text/plain", headers=headers)
+
+@app.get("/admin/shadow/disagreements", dependencies=[Depends(require_admin)])
+async def shadow_disagreements(limit: int = Query(100, ge=1, le=1000)):
+    """
+    The newest texts the shadow candidate scored differently, with both
+    verdicts. Admin-only, since these include what users wrote.
+    """
+    if shadow is None:
+        raise HTTPException(status_code=404, detail="Shadow evaluation is not running")
+    return shadow.recent_disagreements(limit)
+
+@app.post("/admin/profile/sample", dependencies=[Depends(require_admin)])
+async def profile_sample(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1, le=1000)
+):
+    """
+    Sample this worker's event loop for a while and download the stacks.
+    
+    The result is a collapsed-stack file (one "frame;frame;... count" line
+    per stack) ready for flamegraph.pl or speedscope. Sampling happens
+    from a separate thread, so requests keep being served meanwhile.
+    """
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profile_lock:
+        sampler = await sample_event_loop(
+            min(seconds, settings.profile_max_seconds),
+            interval_ms / 1000
+        )
+    return collapsed_stacks_response(
+        sampler.stacks,
+        "sample",
+        {"X-Profile-Samples": str(sampler.samples)}
+    )
+
+@app.post("/admin/profile/request", dependencies=[Depends(require_admin)])
+async def profile_request(request: ContentAnalysisRequest):
+    """
+    Run one analysis under a deterministic profiler and download its stacks.
+    
+    Weights are microseconds of self time. The profiler only runs while
+    this analysis is executing, so other requests don't show up in it.
+    Like any analysis, it counts towards the user's thread and spam state.
+    """
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profile_lock:
+        policy = await database.get_user_policy(request.user_id) if request.user_id else None
+        result, profiler = await profile_coroutine(content_analyzer.analyze_text(
+            text=request.text,
+            context=request.context,
+            user_preferences=request.user_preferences,
+            thread_id=request.thread_id,
+            policy=policy
+        ))
+    return collapsed_stacks_response(
+        profiler.collapsed_microseconds(),
+        "request",
+        {
+            "X-Profile-Elapsed-Us": str(profiler.elapsed_ns // 1000),
+            "X-Analysis-Processing-Ms": f"{result.processing_time_ms:.3f}"
         }
-    }
+    )
 
 async def prepare_support_resources(analysis_result):
     """
@@ -203,7 +703,7 @@ async def prepare_support_resources(analysis_result):
     
     This runs in the background so we don't slow down the main response.
     """
-    logger.info("🤝 Preparing support resources for user wellbeing")
+    log_event("support", "🤝 Preparing support resources for user wellbeing")
     # Here we could integrate with mental health resources,
     # crisis hotlines, or educational materials
     pass
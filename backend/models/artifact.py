@@ -0,0 +1,409 @@
+"""
+Prebuilt Analyzer Artifact
+
+Every worker used to rebuild the same static state at start-up: regex
+patterns, support resources and, biggest of all, VADER's lexicons, parsed
+from text files into Python dicts. That costs start-up time, and memory
+that grows with the number of workers.
+
+Instead we can build all of it once into a single versioned file. Workers
+memory-map it read-only, so the operating system keeps one copy in the
+page cache for all of them, and look words up in place through hash
+tables laid out in the file - no dicts to build.
+
+Each artifact records a fingerprint of the sources it was built from and
+a checksum of its contents. A worker refuses an artifact whose version,
+fingerprint or checksum doesn't match.
+
+Build, check and benchmark from the backend directory:
+
+    python -m models.artifact build analyzer.artifact
+    python -m models.artifact verify analyzer.artifact
+    python -m models.artifact bench analyzer.artifact --workers 4
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import vaderSentiment
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from .content_analyzer import (
+    HATE_SPEECH_PATTERNS,
+    PROFANITY_PATTERNS,
+    SUPPORT_RESOURCES,
+    THREAT_PATTERNS
+)
+
+ARTIFACT_VERSION = 1
+MAGIC = b"NIRABHI\x00"
+PREAMBLE = struct.Struct("<8sI")   # magic, header length
+TABLE_HEADER = struct.Struct("<IIII")  # keys, slots, value kind, has ASCII keys
+
+FLOAT_VALUES = 0
+TEXT_VALUES = 1
+
+VADER_DIR = os.path.dirname(vaderSentiment.vaderSentiment.__file__)
+VADER_LEXICONS = ("vader_lexicon.txt", "emoji_utf8_lexicon.txt")
+
+
+class ArtifactError(ValueError):
+    """The artifact is missing, corrupt, stale or from another version"""
+
+
+def source_fingerprint() -> str:
+    """
+    Hash of everything an artifact is built from. If any rule, resource
+    or lexicon changes, existing artifacts no longer match.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(ARTIFACT_VERSION).encode())
+    digest.update(json.dumps(
+        [HATE_SPEECH_PATTERNS, THREAT_PATTERNS, PROFANITY_PATTERNS, SUPPORT_RESOURCES],
+        sort_keys=True
+    ).encode())
+    for name in VADER_LEXICONS:
+        with open(os.path.join(VADER_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _pad(blob: bytes) -> bytes:
+    return blob + b"\x00" * (-len(blob) % 8)
+
+
+def _pack_table(entries: Dict[str, Any], value_kind: int) -> bytes:
+    """
+    Lay out a string-keyed open-addressing hash table:
+
+        header | slots (u32 entry+1, 0 = empty) | key offsets (u32, n+1) |
+        values (f64, n) or value offsets (u32, n+1) | key bytes | value bytes
+    """
+    keys = list(entries)
+    slot_count = 1
+    while slot_count < len(keys) * 2:
+        slot_count *= 2
+
+    slots = [0] * slot_count
+    encoded_keys = [key.encode("utf-8") for key in keys]
+    for index, key in enumerate(encoded_keys):
+        slot = zlib.crc32(key) & (slot_count - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = index + 1
+
+    def offsets(blobs: List[bytes]) -> Tuple[bytes, bytes]:
+        positions = [0]
+        for blob in blobs:
+            positions.append(positions[-1] + len(blob))
+        return struct.pack(f"<{len(positions)}I", *positions), b"".join(blobs)
+
+    key_offsets, key_bytes = offsets(encoded_keys)
+    if value_kind == FLOAT_VALUES:
+        values, value_bytes = struct.pack(f"<{len(keys)}d", *entries.values()), b""
+    else:
+        values, value_bytes = offsets([value.encode("utf-8") for value in entries.values()])
+
+    has_ascii_keys = any(key.isascii() for key in keys)
+    return b"".join([
+        TABLE_HEADER.pack(len(keys), slot_count, value_kind, has_ascii_keys),
+        _pad(struct.pack(f"<{slot_count}I", *slots)),
+        _pad(key_offsets),
+        _pad(values),
+        _pad(key_bytes),
+        _pad(value_bytes),
+    ])
+
+
+class MappedTable(Mapping):
+    """
+    A read-only str -> float/str mapping served straight from a table
+    inside the mapped artifact. Drop-in for VADER's lexicon dicts.
+
+    VADER asks about the same few thousand everyday words over and over,
+    so recent answers are kept in a small private dict that is simply
+    cleared when it fills up.
+    """
+
+    HOT_KEYS = 4096
+
+    def __init__(self, buffer: memoryview):
+        self._hot: Dict[str, int] = {}
+        self._count, slot_count, self._kind, has_ascii_keys = TABLE_HEADER.unpack_from(buffer)
+        self._mask = slot_count - 1
+        self._has_ascii_keys = bool(has_ascii_keys)
+
+        position = TABLE_HEADER.size
+        def take(length: int) -> memoryview:
+            nonlocal position
+            view = buffer[position:position + length]
+            position += length + (-length % 8)
+            return view
+
+        self._slots = take(slot_count * 4).cast("I")
+        self._key_offsets = take((self._count + 1) * 4).cast("I")
+        if self._kind == FLOAT_VALUES:
+            self._values = take(self._count * 8).cast("d")
+        else:
+            self._values = take((self._count + 1) * 4).cast("I")
+        self._keys = take(self._key_offsets[self._count])
+        if self._kind == TEXT_VALUES:
+            self._value_bytes = take(self._values[self._count])
+
+    def _find(self, key: str) -> int:
+        """Index of the key's entry, or -1"""
+        index = self._hot.get(key)
+        if index is None:
+            if len(self._hot) >= self.HOT_KEYS:
+                self._hot.clear()
+            index = self._hot[key] = self._probe(key)
+        return index
+
+    def _probe(self, key: str) -> int:
+        if not self._has_ascii_keys and key.isascii():
+            return -1  # e.g. the emoji table, probed with every character of a text
+        encoded = key.encode("utf-8")
+        slot = zlib.crc32(encoded) & self._mask
+        while True:
+            entry = self._slots[slot]
+            if not entry:
+                return -1
+            index = entry - 1
+            if self._keys[self._key_offsets[index]:self._key_offsets[index + 1]] == encoded:
+                return index
+            slot = (slot + 1) & self._mask
+
+    def _value(self, index: int) -> Any:
+        if self._kind == FLOAT_VALUES:
+            return self._values[index]
+        return bytes(self._value_bytes[self._values[index]:self._values[index + 1]]).decode("utf-8")
+
+    def __getitem__(self, key: str) -> Any:
+        index = self._find(key) if isinstance(key, str) else -1
+        if index < 0:
+            raise KeyError(key)
+        return self._value(index)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._find(key) if isinstance(key, str) else -1
+        return self._value(index) if index >= 0 else default
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._count):
+            yield bytes(self._keys[self._key_offsets[index]:self._key_offsets[index + 1]]).decode("utf-8")
+
+
+class AnalyzerArtifact:
+    """A loaded, verified artifact. Keep it alive as long as it's used."""
+
+    def __init__(self, path: str, header: Dict[str, Any], mapped: mmap.mmap, payload: memoryview):
+        self.path = path
+        self.header = header
+        self._mapped = mapped
+        self._payload = payload
+
+        self.patterns: Dict[str, List[str]] = json.loads(bytes(self._section("patterns")))
+        self.support_resources: List[Dict[str, str]] = json.loads(bytes(self._section("support_resources")))
+        self.lexicon = MappedTable(self._section("vader_lexicon"))
+        self.emojis = MappedTable(self._section("emoji_lexicon"))
+
+    def _section(self, name: str) -> memoryview:
+        offset, length = self.header["sections"][name]
+        return self._payload[offset:offset + length]
+
+    def compiled_patterns(self, name: str) -> List[re.Pattern]:
+        return [re.compile(pattern, re.IGNORECASE) for pattern in self.patterns[name]]
+
+    def sentiment_analyzer(self) -> SentimentIntensityAnalyzer:
+        """A VADER analyzer reading its lexicons from the artifact"""
+        analyzer = MappedSentimentAnalyzer.__new__(MappedSentimentAnalyzer)
+        analyzer.lexicon = self.lexicon
+        analyzer.emoji_table = self.emojis
+        return analyzer
+
+
+class MappedSentimentAnalyzer(SentimentIntensityAnalyzer):
+    """
+    VADER over mapped lexicons. VADER checks every character of a text
+    against the emoji lexicon; plain-ASCII text can't contain emojis, so
+    for it we hand VADER an empty dict and skip those lookups.
+    """
+
+    NO_EMOJIS: Dict[str, str] = {}
+
+    def polarity_scores(self, text):
+        self.emojis = self.NO_EMOJIS if text.isascii() else self.emoji_table
+        return super().polarity_scores(text)
+
+
+def build_artifact(path: str) -> Dict[str, Any]:
+    """Write a fresh artifact to `path` (atomically) and return its header"""
+    analyzer = SentimentIntensityAnalyzer()
+    sections = {
+        "patterns": json.dumps({
+            "hate_speech": HATE_SPEECH_PATTERNS,
+            "threat": THREAT_PATTERNS,
+            "profanity": PROFANITY_PATTERNS,
+        }).encode("utf-8"),
+        "support_resources": json.dumps(SUPPORT_RESOURCES).encode("utf-8"),
+        "vader_lexicon": _pack_table(analyzer.lexicon, FLOAT_VALUES),
+        "emoji_lexicon": _pack_table(analyzer.emojis, TEXT_VALUES),
+    }
+
+    layout, payload = {}, bytearray()
+    for name, blob in sections.items():
+        layout[name] = [len(payload), len(blob)]
+        payload += _pad(blob)
+
+    header = {
+        "artifact_version": ARTIFACT_VERSION,
+        "source_fingerprint": source_fingerprint(),
+        "payload_sha256": hashlib.sha256(payload).hexdigest(),
+        "built_at": datetime.utcnow().isoformat(),
+        "sections": layout,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(PREAMBLE.size + len(header_bytes)) % 8)  # Keep the payload 8-byte aligned
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    return header
+
+
+def load_artifact(path: str, verify_checksum: bool = True) -> AnalyzerArtifact:
+    """
+    Map an artifact read-only and check it belongs to this code.
+    Raises ArtifactError if it doesn't.
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"can't map {path}: {e}") from e
+
+    view = memoryview(mapped)
+    try:
+        magic, header_length = PREAMBLE.unpack_from(view)
+        if magic != MAGIC:
+            raise ArtifactError(f"{path} is not an analyzer artifact")
+        header = json.loads(bytes(view[PREAMBLE.size:PREAMBLE.size + header_length]))
+        payload = view[PREAMBLE.size + header_length:]
+    except (struct.error, ValueError) as e:
+        raise ArtifactError(f"{path} has an unreadable header: {e}") from e
+
+    if header.get("artifact_version") != ARTIFACT_VERSION:
+        raise ArtifactError(
+            f"{path} is artifact version {header.get('artifact_version')}, expected {ARTIFACT_VERSION}"
+        )
+    if header.get("source_fingerprint") != source_fingerprint():
+        raise ArtifactError(f"{path} was built from different rules or lexicons; rebuild it")
+    if verify_checksum and hashlib.sha256(payload).hexdigest() != header.get("payload_sha256"):
+        raise ArtifactError(f"{path} is corrupt (checksum mismatch)")
+
+    return AnalyzerArtifact(path, header, mapped, payload)
+
+
+# Benchmarks: python -m models.artifact bench analyzer.artifact --workers 4
+def _memory_kib() -> Tuple[int, int]:
+    """(RSS, private memory) of this process in KiB"""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields["Rss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def _bench_worker(artifact_path: Optional[str], barrier, results):
+    import asyncio
+    import time
+    from .content_analyzer import ContentAnalyzer
+
+    rss_before, private_before = _memory_kib()
+    started = time.perf_counter()
+    artifact = load_artifact(artifact_path) if artifact_path else None
+    analyzer = ContentAnalyzer(spam_index_size=0, artifact=artifact)
+    asyncio.run(analyzer.initialize())
+    analyzer.sentiment_analyzer.polarity_scores("warming up :) this is great 💘")
+    elapsed = time.perf_counter() - started
+    rss_after, private_after = _memory_kib()
+
+    samples = ["You are such a wonderful person, thank you!", "I hate this, it's awful and stupid"] * 500
+    started = time.perf_counter()
+    for sample in samples:
+        analyzer.sentiment_analyzer.polarity_scores(sample)
+    per_call = (time.perf_counter() - started) / len(samples)
+
+    barrier.wait()  # Measure while every worker is alive, so shared pages are shared
+    results.put((elapsed, rss_after - rss_before, private_after - private_before, per_call))
+    barrier.wait()
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+    import sys
+
+    parser = argparse.ArgumentParser(description="Build, verify or benchmark the analyzer artifact")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build an artifact from the current rules and lexicons")
+    build.add_argument("path")
+    verify = commands.add_parser("verify", help="Check an artifact matches this code")
+    verify.add_argument("path")
+    bench = commands.add_parser("bench", help="Compare worker start-up with and without an artifact")
+    bench.add_argument("path")
+    bench.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        header = build_artifact(args.path)
+        print(f"✅ Built {args.path} ({os.path.getsize(args.path) / 1024:.0f} KiB)")
+        print(f"   fingerprint {header['source_fingerprint'][:16]}…  sha256 {header['payload_sha256'][:16]}…")
+    elif args.command == "verify":
+        try:
+            loaded = load_artifact(args.path)
+        except ArtifactError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ {args.path} matches (built {loaded.header['built_at']}, "
+              f"{len(loaded.lexicon)} words, {len(loaded.emojis)} emojis)")
+    else:
+        context = multiprocessing.get_context("spawn")
+        for label, artifact_path in (("from source", None), ("from artifact", args.path)):
+            barrier = context.Barrier(args.workers)
+            results = context.Queue()
+            workers = [
+                context.Process(target=_bench_worker, args=(artifact_path, barrier, results))
+                for _ in range(args.workers)
+            ]
+            for worker in workers:
+                worker.start()
+            rows = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            count = len(rows)
+            print(f"📊 {label:<14} x{count}: start {sum(r[0] for r in rows) / count * 1000:6.1f} ms, "
+                  f"RSS +{sum(r[1] for r in rows) / count / 1024:5.1f} MiB, "
+                  f"private +{sum(r[2] for r in rows) / count / 1024:5.1f} MiB per worker, "
+                  f"polarity_scores {sum(r[3] for r in rows) / count * 1e6:5.1f} µs")
@@ -0,0 +1,208 @@
+"""
+Vectorized Scoring for Batches
+
+Once a text's signals are extracted, turning them into a verdict is a
+handful of comparisons: `_combine_analysis_scores`, `_determine_category`,
+`_determine_severity` and `_calculate_confidence`. Per text that is cheap,
+but a backfill pays the interpreter for every branch of every text.
+
+Here the same rules run over a whole batch at once. The signals of N
+texts are gathered into NumPy arrays and each rule becomes one array
+operation, giving arrays of scores, category codes, severity codes and
+confidences. Every step mirrors the scalar code operation for operation,
+so the results are the same floats, not just close ones -
+tests/test_batch_scoring.py checks that on random and edge-case signals.
+
+NumPy is optional: without it `NUMPY_AVAILABLE` is False and callers
+stay on the scalar path.
+"""
+
+from typing import Dict, List, NamedTuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from .policy import CompiledPolicy
+from .schemas import SeverityLevel, ToxicityCategory
+from .verdict import CATEGORIES, CATEGORY_CODES, SEVERITY_CODES
+
+SAFE = CATEGORY_CODES[ToxicityCategory.SAFE]
+THREAT = CATEGORY_CODES[ToxicityCategory.THREAT]
+HATE_SPEECH = CATEGORY_CODES[ToxicityCategory.HATE_SPEECH]
+CYBERBULLYING = CATEGORY_CODES[ToxicityCategory.CYBERBULLYING]
+HARASSMENT = CATEGORY_CODES[ToxicityCategory.HARASSMENT]
+INAPPROPRIATE = CATEGORY_CODES[ToxicityCategory.INAPPROPRIATE]
+
+CRITICAL = SEVERITY_CODES[SeverityLevel.CRITICAL]
+HIGH = SEVERITY_CODES[SeverityLevel.HIGH]
+MEDIUM = SEVERITY_CODES[SeverityLevel.MEDIUM]
+LOW = SEVERITY_CODES[SeverityLevel.LOW]
+
+
+class BatchSignals(NamedTuple):
+    """The signals of N texts, one array per signal"""
+    toxicity: "np.ndarray"
+    severe_toxicity: "np.ndarray"
+    threat: "np.ndarray"
+    insult: "np.ndarray"
+    sentiment: "np.ndarray"  # VADER compound
+    has_threats: "np.ndarray"
+    has_hate_speech: "np.ndarray"
+    has_profanity: "np.ndarray"
+    excessive_caps: "np.ndarray"
+    pattern_matches: "np.ndarray"  # How many pattern checks fired
+
+
+class BatchScores(NamedTuple):
+    """What the scalar rules decide for each text of a batch"""
+    toxicity_score: "np.ndarray"
+    category_code: "np.ndarray"
+    severity_code: "np.ndarray"
+    confidence: "np.ndarray"
+
+
+def gather_signals(
+    toxicity: List[Dict[str, float]],
+    sentiment: List[Dict[str, float]],
+    patterns: List[Dict[str, bool]]
+) -> BatchSignals:
+    """Stack per-text analysis dicts into arrays (missing scores count as 0)"""
+    def column(rows, key) -> "np.ndarray":
+        return np.fromiter((row.get(key, 0.0) for row in rows), dtype=np.float64, count=len(rows))
+
+    def flag(key) -> "np.ndarray":
+        return np.fromiter((bool(row.get(key)) for row in patterns), dtype=bool, count=len(patterns))
+
+    return BatchSignals(
+        toxicity=column(toxicity, 'toxicity'),
+        severe_toxicity=column(toxicity, 'severe_toxicity'),
+        threat=column(toxicity, 'threat'),
+        insult=column(toxicity, 'insult'),
+        sentiment=column(sentiment, 'compound'),
+        has_threats=flag('has_threats'),
+        has_hate_speech=flag('has_hate_speech'),
+        has_profanity=flag('has_profanity'),
+        excessive_caps=flag('excessive_caps'),
+        pattern_matches=np.fromiter(
+            (sum(1 for value in row.values() if value) for row in patterns),
+            dtype=np.int64,
+            count=len(patterns)
+        )
+    )
+
+
+def combine_scores(signals: BatchSignals, thresholds) -> "np.ndarray":
+    """`_combine_analysis_scores` for a whole batch"""
+    score = signals.toxicity.copy()
+    np.maximum(score, 0.8, out=score, where=signals.severe_toxicity > 0.5)
+    np.maximum(score, 0.9, out=score, where=signals.threat > 0.3)
+    negative = signals.sentiment < thresholds.negative_sentiment
+    np.maximum(score, np.abs(signals.sentiment) * thresholds.sentiment_weight, out=score, where=negative)
+    np.maximum(score, 0.85, out=score, where=signals.has_threats)
+    np.maximum(score, 0.75, out=score, where=signals.has_hate_speech)
+    shouting = signals.excessive_caps & signals.has_profanity
+    np.minimum(score + 0.2, 1.0, out=score, where=shouting)
+    return np.minimum(score, 1.0)
+
+
+def determine_categories(signals: BatchSignals, scores: "np.ndarray", thresholds) -> "np.ndarray":
+    """`_determine_category` for a whole batch, as category codes"""
+    return np.select(
+        [
+            scores < thresholds.safe_below,
+            signals.has_threats | (signals.threat > thresholds.threat_model_above),
+            signals.has_hate_speech | (scores > thresholds.hate_speech_above),
+            (signals.insult > thresholds.insult_above) & (scores > thresholds.cyberbullying_above),
+            scores > thresholds.harassment_above,
+        ],
+        [SAFE, THREAT, HATE_SPEECH, CYBERBULLYING, HARASSMENT],
+        default=INAPPROPRIATE
+    )
+
+
+def determine_severities(scores: "np.ndarray", categories: "np.ndarray") -> "np.ndarray":
+    """`_determine_severity` for a whole batch, as severity codes"""
+    return np.select(
+        [categories == THREAT, scores >= 0.8, scores >= 0.6],
+        [CRITICAL, HIGH, MEDIUM],
+        default=LOW
+    )
+
+
+def calculate_confidences(signals: BatchSignals) -> "np.ndarray":
+    """`_calculate_confidence` for a whole batch"""
+    confidence = 0.5 + np.where(signals.toxicity > 0.1, 0.3, 0.0)
+    confidence += np.minimum(signals.pattern_matches * 0.1, 0.2)
+    return np.minimum(confidence, 0.95)
+
+
+def score_batch(signals: BatchSignals, thresholds) -> BatchScores:
+    """Every per-text decision for a batch of signals"""
+    scores = combine_scores(signals, thresholds)
+    categories = determine_categories(signals, scores, thresholds)
+    return BatchScores(
+        toxicity_score=scores,
+        category_code=categories,
+        severity_code=determine_severities(scores, categories),
+        confidence=calculate_confidences(signals)
+    )
+
+
+def flag_toxic(scores: BatchScores, policy: CompiledPolicy) -> "np.ndarray":
+    """`policy.is_toxic` for a whole batch"""
+    filtered = np.array([policy.filters(category) for category in CATEGORIES])
+    return (scores.toxicity_score > policy.threshold) & filtered[scores.category_code]
+
+
+# Benchmarks: python -m models.batch_scoring
+if __name__ == "__main__":
+    import random
+    import time
+
+    from .content_analyzer import ContentAnalyzer, DEFAULT_THRESHOLDS
+    from .policy import DEFAULT_POLICY
+
+    # That both paths agree is checked in tests/test_batch_scoring.py;
+    # this only compares their speed
+    analyzer = ContentAnalyzer(spam_index_size=0, analysis_workers=0)
+    rng = random.Random(48)
+
+    def random_signals():
+        toxicity = {key: rng.random() for key in ('toxicity', 'severe_toxicity', 'obscene', 'threat', 'insult')
+                    if rng.random() < 0.9}
+        sentiment = {'compound': rng.uniform(-1.0, 1.0)}
+        patterns = {key: rng.random() < 0.3 for key in (
+            'has_hate_speech', 'has_threats', 'has_profanity', 'excessive_caps', 'excessive_punctuation'
+        )}
+        return toxicity, sentiment, patterns
+
+    def scalar(toxicity, sentiment, patterns):
+        score = analyzer._combine_analysis_scores(toxicity, sentiment, patterns)
+        category = analyzer._determine_category(toxicity, patterns, score)
+        return (
+            score,
+            CATEGORY_CODES[category],
+            SEVERITY_CODES[analyzer._determine_severity(score, category)],
+            analyzer._calculate_confidence(toxicity, patterns),
+            DEFAULT_POLICY.is_toxic(score, category)
+        )
+
+    batch = [random_signals() for _ in range(10000)]
+    columns = [list(column) for column in zip(*batch)]
+    print(f"📊 {len(batch):,} random signals")
+    for label, run in (
+        ("scalar", lambda: [scalar(*item) for item in batch]),
+        ("vectorized", lambda: flag_toxic(score_batch(gather_signals(*columns), DEFAULT_THRESHOLDS), DEFAULT_POLICY)),
+        ("  (scoring only)", lambda: score_batch(signals, DEFAULT_THRESHOLDS)),
+    ):
+        signals = gather_signals(*columns)
+        best = float("inf")
+        for _ in range(5):
+            started = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - started)
+        print(f"  {label:<18} {best / len(batch) * 1e6:6.2f} µs per text")
@@ -9,10 +9,15 @@ the emotional impact and safety of any piece of text.
 """
 
 import re
+import copy
 import time
 import asyncio
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple
+
+from loguru import logger
 
 # AI and ML libraries
 try:
@@ -20,19 +25,109 @@ try:
     import torch
     TRANSFORMERS_AVAILABLE = True
 except ImportError:
-    print("⚠️ Advanced AI models not available (transformers/torch not installed)")
-    print("🔄 Will use lightweight rule-based analysis instead")
+    logger.warning("⚠️ Advanced AI models not available (transformers/torch not installed)")
+    logger.info("🔄 Will use lightweight rule-based analysis instead")
     TRANSFORMERS_AVAILABLE = False
 
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 # Our custom models
 from .schemas import (
-    ContentAnalysisResponse,
     ToxicityCategory,
     SeverityLevel,
     UserPreferences
 )
+from .batch_scoring import NUMPY_AVAILABLE, flag_toxic, gather_signals, score_batch
+from .conversation import ConversationTracker, ThreadState, adjust_for_conversation
+from .draft_cache import (
+    DraftStats,
+    SentenceCache,
+    SentenceFeatures,
+    merge_sentence_features,
+    sentence_key,
+    split_sentences
+)
+from .language import (
+    ENGLISH,
+    HINDI,
+    HINDI_HATE_SPEECH_PATTERNS,
+    HINDI_PROFANITY_PATTERNS,
+    HINDI_THREAT_PATTERNS,
+    HINGLISH_LEXICON,
+    LanguageIdentifier,
+    LanguageRouter,
+    RuleSet
+)
+from .near_duplicate import MIN_TEXT_LENGTH, NearDuplicateIndex
+from .normalizer import NormalizedText, normalize
+from .pipeline import Pipeline, Stage
+from .policy import CompiledPolicy, DEFAULT_POLICY
+from .verdict import CATEGORIES, CATEGORY_CODES, SEVERITIES, SEVERITY_CODES, Verdict
+
+# Only the tail of a long context is read when seeding a conversation
+MAX_CONTEXT_CHARS = 2000
+
+# The static rules our analyzer is built from. Workers can also load these
+# (plus VADER's lexicons) from a prebuilt artifact - see models/artifact.py
+HATE_SPEECH_PATTERNS = [
+    r'\b(hate|despise|loathe)\s+(you|them|those)\b',
+    r'\b(kill|die|death)\s+(yourself|yourselves)\b',
+    r'\b(stupid|idiot|moron)\s+(people|person)\b',
+]
+
+THREAT_PATTERNS = [
+    r'\b(going\s+to|gonna|will)\s+(kill|hurt|harm|beat|destroy)\b',
+    r'\b(watch\s+out|be\s+careful|you\s+better)\b',
+    r'\bor\s+else\b',
+]
+
+# Basic pattern matching for demonstration
+# Real systems would use more sophisticated profanity databases
+PROFANITY_PATTERNS = [
+    r'\b[a-z]*sh[i1]t[a-z]*\b',
+    r'\b[a-z]*d[a4]mn[a-z]*\b',
+    r'\b[a-z]*cr[a4]p[a-z]*\b',
+]
+
+@dataclass(frozen=True)
+class ScoringThresholds:
+    """
+    The cutoffs that turn raw signals into a score and a category.
+    The defaults are what we have always shipped; evaluate.py measures
+    what other values would do.
+    """
+    negative_sentiment: float = -0.5  # Sentiment below this raises the score...
+    sentiment_weight: float = 0.6     # ...to this share of its strength
+    safe_below: float = 0.3
+    threat_model_above: float = 0.4
+    hate_speech_above: float = 0.7
+    insult_above: float = 0.5
+    cyberbullying_above: float = 0.6
+    harassment_above: float = 0.5
+
+
+DEFAULT_THRESHOLDS = ScoringThresholds()
+
+SUPPORT_RESOURCES = [
+    {
+        "name": "Crisis Text Line",
+        "description": "Free 24/7 support via text message",
+        "contact": "Text HOME to 741741",
+        "url": "https://www.crisistextline.org/"
+    },
+    {
+        "name": "National Suicide Prevention Lifeline",
+        "description": "Free and confidential support 24/7",
+        "contact": "988",
+        "url": "https://suicidepreventionlifeline.org/"
+    },
+    {
+        "name": "StopBullying.gov",
+        "description": "Resources for dealing with cyberbullying",
+        "contact": "Online resources",
+        "url": "https://www.stopbullying.gov/"
+    }
+]
 
 class ContentAnalyzer:
     """
@@ -40,22 +135,88 @@ class ContentAnalyzer:
     helpful feedback to create safer digital spaces.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        max_tracked_threads: int = 10000,
+        sentence_cache_size: int = 50000,
+        spam_index_size: int = 100000,
+        spam_window_seconds: float = 600,
+        spam_similarity: float = 0.8,
+        spam_burst_size: int = 5,
+        spam_min_senders: int = 3,
+        artifact=None,
+        analysis_workers: int = 2,
+        use_model: bool = True,
+        thresholds: ScoringThresholds = DEFAULT_THRESHOLDS,
+        cascade_band: Optional[Tuple[float, float]] = None
+    ):
         """
         Initialize our AI analyzer.
         We start empty but ready to learn!
+        
+        With a loaded `artifact` (see models/artifact.py), rules and
+        lexicons come from the shared, memory-mapped file instead of
+        being rebuilt in every worker.
+        
+        `analysis_workers` threads run the pipeline stages that block,
+        like the transformer model (0 runs everything on the event loop).
+        With `use_model` off we stick to the rules even if transformers
+        is installed.
+        
+        With a `cascade_band` (low, high), the rules score every text first
+        and only texts whose strongest rule signal falls in [low, high) are
+        passed on to the model.
         """
+        self.artifact = artifact
+        self.use_model = use_model
+        self.thresholds = thresholds
+        self.cascade_band = cascade_band
         self.toxicity_classifier = None
         self.sentiment_analyzer = None
         self.is_initialized = False
         
+        # Which language(s) a text is in decides which rules it meets
+        self.language_identifier = LanguageIdentifier()
+        self.router: Optional[LanguageRouter] = None
+        
+        # The stages of analyze_text, built once the models are loaded
+        self.analysis_workers = analysis_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=analysis_workers,
+            thread_name_prefix="analysis"
+        ) if analysis_workers > 0 else None
+        self.pipeline: Optional[Pipeline] = None
+        
+        # Compact per-thread summaries for conversation-aware scoring
+        self.conversations = ConversationTracker(max_threads=max_tracked_threads)
+        
+        # Per-sentence results, so re-checking a growing draft stays cheap
+        self.sentence_cache = SentenceCache(max_entries=sentence_cache_size)
+        
+        # Recent texts, so floods of near-identical messages are caught as spam
+        self.near_duplicates = NearDuplicateIndex(
+            max_entries=spam_index_size,
+            window_seconds=spam_window_seconds,
+            similarity=spam_similarity,
+            burst_size=spam_burst_size,
+            min_senders=spam_min_senders
+        ) if spam_index_size > 0 else None
+        
         # Precompiled regex patterns for quick detection
-        self.hate_speech_patterns = self._compile_hate_speech_patterns()
-        self.threat_patterns = self._compile_threat_patterns()
-        self.profanity_patterns = self._compile_profanity_patterns()
+        if artifact is not None:
+            self.hate_speech_patterns = artifact.compiled_patterns("hate_speech")
+            self.threat_patterns = artifact.compiled_patterns("threat")
+            self.profanity_patterns = artifact.compiled_patterns("profanity")
+        else:
+            self.hate_speech_patterns = self._compile_hate_speech_patterns()
+            self.threat_patterns = self._compile_threat_patterns()
+            self.profanity_patterns = self._compile_profanity_patterns()
         
         # Support resources for users who need help
-        self.support_resources = self._load_support_resources()
+        if artifact is not None:
+            self.support_resources = artifact.support_resources
+        else:
+            self.support_resources = self._load_support_resources()
     
     async def initialize(self):
         """
@@ -66,9 +227,9 @@ class ContentAnalyzer:
             return
             
         try:
-            print("🧠 Loading AI models for content analysis...")
+            logger.info("🧠 Loading AI models for content analysis...")
             
-            if TRANSFORMERS_AVAILABLE:
+            if TRANSFORMERS_AVAILABLE and self.use_model:
                 # Load a lightweight but effective toxicity detection model
                 # Using DistilBERT for speed while maintaining accuracy
                 self.toxicity_classifier = pipeline(
@@ -77,31 +238,91 @@ class ContentAnalyzer:
                     device=0 if torch.cuda.is_available() else -1,
                     return_all_scores=True
                 )
-                print("✅ Advanced AI models loaded successfully!")
+                logger.info("✅ Advanced AI models loaded successfully!")
             else:
-                print("🔄 Advanced models not available, using rule-based analysis")
+                logger.info("🔄 Advanced models not available, using rule-based analysis")
                 self.toxicity_classifier = None
             
             # Initialize VADER sentiment analyzer (lightweight and works great!)
-            self.sentiment_analyzer = SentimentIntensityAnalyzer()
+            self.sentiment_analyzer = self._create_sentiment_analyzer()
+            self.router = self._build_language_router()
+            self.pipeline = self._build_pipeline()
             
             self.is_initialized = True
-            print("✅ Content analyzer ready!")
+            logger.info("✅ Content analyzer ready!")
             
         except Exception as e:
-            print(f"❌ Error loading AI models: {str(e)}")
+            logger.error("❌ Error loading AI models: {}", e)
             # Fallback to rule-based analysis if models fail to load
             self.toxicity_classifier = None
-            self.sentiment_analyzer = SentimentIntensityAnalyzer()
+            self.sentiment_analyzer = self._create_sentiment_analyzer()
+            self.router = self._build_language_router()
+            self.pipeline = self._build_pipeline()
             self.is_initialized = True
-            print("⚠️ Using fallback rule-based analysis")
+            logger.warning("⚠️ Using fallback rule-based analysis")
+
+    def close(self):
+        """Let the inference threads finish what they are doing and stop"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    @property
+    def model_status(self) -> str:
+        """'loading' until initialize() is done, then 'model' or 'rules'"""
+        if not self.is_initialized:
+            return "loading"
+        return "model" if self.toxicity_classifier is not None else "rules"
+
+    @property
+    def queued_inferences(self) -> int:
+        """Offloaded stages waiting for a free inference thread"""
+        if self.pipeline is None:
+            return 0
+        return max(0, self.pipeline.offloaded_in_flight - self.analysis_workers)
+
+    def _create_sentiment_analyzer(self) -> SentimentIntensityAnalyzer:
+        """VADER, reading its lexicons from the artifact when we have one"""
+        if self.artifact is not None:
+            return self.artifact.sentiment_analyzer()
+        return SentimentIntensityAnalyzer()
+    
+    def _build_language_router(self) -> LanguageRouter:
+        """
+        English rules for English, Hindi rules for Hindi and Hinglish.
+        Hinglish sentiment is VADER with romanized Hindi words layered
+        over the English lexicon, since the two are mixed so freely.
+        """
+        english = RuleSet(
+            languages=(ENGLISH,),
+            hate_speech=tuple(self.hate_speech_patterns),
+            threat=tuple(self.threat_patterns),
+            profanity=tuple(self.profanity_patterns),
+            sentiment=self.sentiment_analyzer
+        )
+        
+        hinglish_sentiment = copy.copy(self.sentiment_analyzer)
+        hinglish_sentiment.lexicon = ChainMap(HINGLISH_LEXICON, self.sentiment_analyzer.lexicon)
+        
+        router = LanguageRouter(self.language_identifier, english)
+        router.register(RuleSet(
+            languages=(HINDI,),
+            hate_speech=tuple(re.compile(p, re.IGNORECASE) for p in HINDI_HATE_SPEECH_PATTERNS),
+            threat=tuple(re.compile(p, re.IGNORECASE) for p in HINDI_THREAT_PATTERNS),
+            profanity=tuple(re.compile(p, re.IGNORECASE) for p in HINDI_PROFANITY_PATTERNS),
+            sentiment=hinglish_sentiment
+        ))
+        return router
     
     async def analyze_text(
         self,
         text: str,
         context: Optional[str] = None,
-        user_preferences: Optional[Dict[str, Any]] = None
-    ) -> ContentAnalysisResponse:
+        user_preferences: Optional[Dict[str, Any]] = None,
+        thread_id: Optional[str] = None,
+        policy: Optional[CompiledPolicy] = None,
+        community_id: Optional[str] = None,
+        sender_id: Optional[str] = None
+    ) -> Verdict:
         """
         The main analysis function - where we examine text and provide insights.
         
@@ -109,19 +330,284 @@ class ContentAnalyzer:
         - Is it harmful or toxic?
         - What emotions does it carry?
         - How can we help make it better?
+        
+        With a `thread_id` (or a one-off `context`), the score also takes
+        into account where the conversation has been heading.
+        
+        Near-copies of a message that is flooding in right now are flagged
+        as spam straight away, reusing the verdict we gave the first copy.
+        Floods are tracked per `community_id`, and only count once several
+        different senders (`sender_id`) have posted the copies.
+        
+        A user's compiled `policy` decides what counts as toxic for them
+        and which parts of the response are worth building at all.
+        """
+        start_time = time.time()
+        
+        if not self.is_initialized:
+            await self.initialize()
+        
+        # The steps and their order live in _build_pipeline
+        run = await self.pipeline.run({
+            "text": text,
+            "context": context,
+            "user_preferences": user_preferences,
+            "thread_id": thread_id,
+            "policy": policy,
+            "start_time": start_time,
+            "community_id": community_id,
+            "sender_id": sender_id
+        })
+        if run.halted_by is not None:
+            return run.values["spam_verdict"]
+        return run.values["verdict"]
+    
+    async def analyze_batch(
+        self,
+        texts: List[str],
+        policy: Optional[CompiledPolicy] = None,
+        offload: bool = False
+    ) -> List[Verdict]:
+        """
+        Analyze many texts in one go, for backfills.
+        
+        Signals are still extracted text by text, but turning them into
+        scores, categories and severities happens for the whole batch at
+        once with NumPy (see models/batch_scoring.py) - the same verdicts
+        analyze_text gives. Flood detection and conversations are left
+        out: they describe live traffic, not a pile of stored texts.
+        Each verdict's processing time is its share of the batch's.
+        
+        Callers sharing the event loop with live requests should pass
+        `offload`: with the model loaded, signals are then extracted on
+        our worker threads, like analyze_text's model stage.
         """
         start_time = time.time()
         
         if not self.is_initialized:
             await self.initialize()
+        policy = policy or DEFAULT_POLICY
         
-        # Clean and prepare the text
-        cleaned_text = self._preprocess_text(text)
+        if offload and self.executor is not None and self.toxicity_classifier is not None:
+            toxicity, sentiment, patterns = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._extract_signals, texts
+            )
+        else:
+            toxicity, sentiment, patterns = self._extract_signals(texts)
         
-        # Run multiple analysis methods
-        toxicity_analysis = await self._analyze_toxicity(cleaned_text)
-        sentiment_analysis = self._analyze_sentiment(cleaned_text)
-        pattern_analysis = self._analyze_patterns(cleaned_text)
+        if not NUMPY_AVAILABLE:
+            return [
+                self._build_response(text, *signals, start_time, policy=policy)
+                for text, *signals in zip(texts, toxicity, sentiment, patterns)
+            ]
+        
+        scores = score_batch(gather_signals(toxicity, sentiment, patterns), self.thresholds)
+        toxic = flag_toxic(scores, policy)
+        processing_time = (time.time() - start_time) * 1000 / max(len(texts), 1)
+        return [
+            self._assemble_verdict(
+                text,
+                score,
+                is_toxic,
+                CATEGORIES[category_code],
+                SEVERITIES[severity_code],
+                signals['compound'],
+                confidence,
+                processing_time,
+                None,
+                None,
+                policy
+            )
+            for text, signals, score, is_toxic, category_code, severity_code, confidence in zip(
+                texts,
+                sentiment,
+                scores.toxicity_score.tolist(),
+                toxic.tolist(),
+                scores.category_code.tolist(),
+                scores.severity_code.tolist(),
+                scores.confidence.tolist()
+            )
+        ]
+    
+    def _extract_signals(
+        self,
+        texts: List[str]
+    ) -> Tuple[List[Dict[str, float]], List[Dict[str, float]], List[Dict[str, bool]]]:
+        """Toxicity, sentiment and pattern signals for each text (blocking)"""
+        toxicity, sentiment, patterns = [], [], []
+        for text in texts:
+            cleaned, rules = self._prepare_text(text)
+            toxicity.append(self._classify_toxicity(cleaned.text, cleaned.folded, rules))
+            sentiment.append(self._analyze_sentiment(cleaned.text, rules))
+            patterns.append(self._analyze_patterns(cleaned.text, cleaned.folded, rules))
+        return toxicity, sentiment, patterns
+    
+    def _build_pipeline(self) -> Pipeline:
+        """
+        The stages of analyze_text and what each one needs. The flood
+        check goes first and can end the run with a spam verdict; the
+        three scorers don't depend on each other, so they share a wave
+        (with the model, when we have one, on a worker thread); the
+        verdict waits for all of them.
+        """
+        return Pipeline(
+            [
+                Stage(
+                    "flood_check", self._check_flood,
+                    inputs=("text", "start_time", "policy", "community_id", "sender_id"),
+                    outputs=("probe", "spam_verdict"),
+                    when=lambda values: (
+                        self.near_duplicates is not None and len(values["text"]) >= MIN_TEXT_LENGTH
+                    ),
+                    halts_on="spam_verdict"
+                ),
+                Stage(
+                    "preprocess", self._prepare_text,
+                    inputs=("text",),
+                    outputs=("cleaned", "rules"),
+                    after=("flood_check",)
+                ),
+                Stage(
+                    "toxicity", lambda cleaned, rules: self._classify_toxicity(cleaned.text, cleaned.folded, rules),
+                    inputs=("cleaned", "rules"),
+                    outputs=("toxicity",),
+                    offload=self.toxicity_classifier is not None
+                ),
+                Stage(
+                    "sentiment", lambda cleaned, rules: self._analyze_sentiment(cleaned.text, rules),
+                    inputs=("cleaned", "rules"),
+                    outputs=("sentiment",)
+                ),
+                Stage(
+                    "patterns", lambda cleaned, rules: self._analyze_patterns(cleaned.text, cleaned.folded, rules),
+                    inputs=("cleaned", "rules"),
+                    outputs=("patterns",)
+                ),
+                Stage(
+                    "conversation", self._conversation_state,
+                    inputs=("thread_id", "context"),
+                    outputs=("conversation",),
+                    when=lambda values: bool(values["thread_id"] or values["context"]),
+                    after=("flood_check",)
+                ),
+                Stage(
+                    "verdict", self._build_response,
+                    inputs=(
+                        "text", "toxicity", "sentiment", "patterns",
+                        "start_time", "user_preferences", "conversation", "policy"
+                    ),
+                    outputs=("verdict",)
+                ),
+                Stage(
+                    "remember", self._remember_verdict,
+                    inputs=("probe", "verdict"),
+                    when=lambda values: values["probe"] is not None
+                ),
+            ],
+            inputs=(
+                "text", "context", "user_preferences", "thread_id", "policy", "start_time",
+                "community_id", "sender_id"
+            ),
+            executor=self.executor
+        )
+    
+    def _check_flood(
+        self,
+        text: str,
+        start_time: float,
+        policy: Optional[CompiledPolicy],
+        community_id: Optional[str],
+        sender_id: Optional[str]
+    ) -> Tuple[Any, Optional[Verdict]]:
+        """
+        Near-copies of a message that is flooding in right now are flagged
+        as spam straight away, reusing the verdict we gave the first copy.
+        """
+        probe = self.near_duplicates.probe(text, scope=community_id, sender=sender_id)
+        if probe.dense:
+            self.near_duplicates.insert(probe)
+            return probe, self._spam_response(text, probe.cluster.verdict, start_time, policy)
+        return probe, None
+    
+    def _remember_verdict(self, probe, verdict: Verdict):
+        """Index the text, so its cluster can answer for copies to come"""
+        self.near_duplicates.insert(probe, verdict)
+    
+    def _prepare_text(self, text: str) -> Tuple[NormalizedText, RuleSet]:
+        """Clean the text and pick the rules for its language(s)"""
+        cleaned = self._preprocess_text(text)
+        return cleaned, self.router.route(cleaned.folded)
+    
+    async def analyze_draft(
+        self,
+        text: str,
+        user_preferences: Optional[Dict[str, Any]] = None,
+        policy: Optional[CompiledPolicy] = None
+    ) -> Tuple[Verdict, DraftStats]:
+        """
+        Analyze a draft that is still being typed.
+        
+        Drafts get re-checked on every pause in typing, and almost all of
+        the text is the same as last time. So we score sentence by sentence,
+        remember each sentence's results by hash, and only do real work for
+        the sentences that changed. The document verdict is then built from
+        the per-sentence results with the usual scoring rules.
+        """
+        start_time = time.time()
+        
+        if not self.is_initialized:
+            await self.initialize()
+        
+        cleaned_text = self._preprocess_text(text).text
+        
+        features = []
+        cache_hits = 0
+        for sentence in split_sentences(cleaned_text):
+            key = sentence_key(sentence)
+            sentence_features = self.sentence_cache.get(key)
+            if sentence_features is None:
+                folded = self._preprocess_text(sentence).folded
+                rules = self.router.route(folded)
+                sentence_features = SentenceFeatures.measure(
+                    sentence,
+                    await self._analyze_toxicity(sentence, folded, rules),
+                    self._analyze_sentiment(sentence, rules),
+                    self._analyze_patterns(sentence, folded, rules)
+                )
+                self.sentence_cache.put(key, sentence_features)
+            else:
+                cache_hits += 1
+            features.append(sentence_features)
+        
+        toxicity_analysis, sentiment_analysis, pattern_analysis = merge_sentence_features(features)
+        
+        response = self._build_response(
+            text,
+            toxicity_analysis,
+            sentiment_analysis,
+            pattern_analysis,
+            start_time,
+            user_preferences,
+            policy=policy
+        )
+        return response, DraftStats(sentences=len(features), cache_hits=cache_hits)
+    
+    def _build_response(
+        self,
+        text: str,
+        toxicity_analysis: Dict[str, float],
+        sentiment_analysis: Dict[str, float],
+        pattern_analysis: Dict[str, bool],
+        start_time: float,
+        user_preferences: Optional[Dict[str, Any]] = None,
+        conversation: Optional[ThreadState] = None,
+        policy: Optional[CompiledPolicy] = None
+    ) -> Verdict:
+        """
+        Turn the raw signals into a verdict with explanations and suggestions.
+        Sections the policy turns off are never built.
+        """
+        policy = policy or DEFAULT_POLICY
         
         # Combine all our insights
         combined_score = self._combine_analysis_scores(
@@ -130,6 +616,13 @@ class ContentAnalyzer:
             pattern_analysis
         )
         
+        if conversation is not None:
+            combined_score = adjust_for_conversation(
+                combined_score,
+                sentiment_analysis['compound'],
+                conversation
+            )
+        
         # Determine the primary category and severity
         category = self._determine_category(
             toxicity_analysis,
@@ -137,69 +630,200 @@ class ContentAnalyzer:
             combined_score
         )
         
+        if conversation is not None:
+            conversation.observe(combined_score, sentiment_analysis['compound'], category.value)
+        
         severity = self._determine_severity(combined_score, category)
         
-        # Generate helpful explanations and suggestions
-        explanation = self._generate_explanation(
-            category,
+        return self._assemble_verdict(
+            text,
             combined_score,
-            text
-        )
-        
-        suggestions = self._generate_suggestions(
+            policy.is_toxic(combined_score, category),
             category,
-            text,
-            user_preferences
+            severity,
+            sentiment_analysis['compound'],
+            self._calculate_confidence(toxicity_analysis, pattern_analysis),
+            (time.time() - start_time) * 1000,
+            user_preferences,
+            conversation,
+            policy
         )
+    
+    def _assemble_verdict(
+        self,
+        text: str,
+        combined_score: float,
+        is_toxic: bool,
+        category: ToxicityCategory,
+        severity: SeverityLevel,
+        sentiment_score: float,
+        confidence: float,
+        processing_time: float,
+        user_preferences: Optional[Dict[str, Any]],
+        conversation: Optional[ThreadState],
+        policy: CompiledPolicy
+    ) -> Verdict:
+        """The verdict for decided scores, with the sections the policy asks for"""
+        # Generate helpful explanations and suggestions
+        explanation = ""
+        if policy.explanations:
+            explanation = self._generate_explanation(
+                category,
+                combined_score,
+                text
+            )
+        
+        suggestions = []
+        if policy.suggestions:
+            suggestions = self._generate_suggestions(
+                category,
+                text,
+                user_preferences
+            )
         
         # Get support resources if needed
         support_resources = None
-        if combined_score > 0.7 or category in [
+        if policy.support and (combined_score > 0.7 or category in [
             ToxicityCategory.THREAT,
             ToxicityCategory.CYBERBULLYING,
             ToxicityCategory.HATE_SPEECH
-        ]:
+        ]):
             support_resources = self.support_resources
         
-        # Calculate processing time
-        processing_time = (time.time() - start_time) * 1000
-        
-        return ContentAnalysisResponse(
+        return Verdict(
             text=text,
             toxicity_score=combined_score,
-            is_toxic=combined_score > 0.5,  # Default threshold
-            category=category,
-            severity=severity,
-            sentiment_score=sentiment_analysis['compound'],
-            confidence=self._calculate_confidence(toxicity_analysis, pattern_analysis),
+            is_toxic=is_toxic,
+            category_code=CATEGORY_CODES[category],
+            severity_code=SEVERITY_CODES[severity],
+            sentiment_score=sentiment_score,
+            confidence=confidence,
             explanation=explanation,
-            suggestions=suggestions,
+            suggestions=tuple(suggestions),
             support_resources=support_resources,
-            analysis_timestamp=datetime.utcnow(),
-            processing_time_ms=processing_time
+            analyzed_at=time.time(),
+            processing_time_ms=processing_time,
+            conversation=conversation.signals() if conversation is not None else None
         )
     
-    def _preprocess_text(self, text: str) -> str:
+    def _spam_response(
+        self,
+        text: str,
+        cached: Verdict,
+        start_time: float,
+        policy: Optional[CompiledPolicy] = None
+    ) -> Verdict:
         """
-        Clean up the text for better analysis.
-        Like washing vegetables before cooking!
+        Answer a flood message from its cluster's cached verdict.
+        The scores stay those of the first copy; the label becomes spam.
+        """
+        policy = policy or DEFAULT_POLICY
+        severity = cached.severity
+        if severity == SeverityLevel.LOW:
+            severity = SeverityLevel.MEDIUM
+        
+        return cached._replace(
+            text=text,
+            is_toxic=policy.filters(ToxicityCategory.SPAM),
+            category_code=CATEGORY_CODES[ToxicityCategory.SPAM],
+            severity_code=SEVERITY_CODES[severity],
+            explanation=(
+                self._generate_explanation(ToxicityCategory.SPAM, cached.toxicity_score, text)
+                if policy.explanations else ""
+            ),
+            suggestions=tuple(self._generate_suggestions(ToxicityCategory.SPAM, text)) if policy.suggestions else (),
+            support_resources=cached.support_resources if policy.support else None,
+            analyzed_at=time.time(),
+            processing_time_ms=(time.time() - start_time) * 1000,
+            conversation=None
+        )
+    
+    def _conversation_state(
+        self,
+        thread_id: Optional[str],
+        context: Optional[str]
+    ) -> Optional[ThreadState]:
         """
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
+        Find the running summary for this message's conversation.
         
-        # Normalize some common internet language
-        text = re.sub(r'(.)\1{3,}', r'\1\1', text)  # Reduce repeated characters
+        Known threads are a dictionary lookup. A new thread (or a request
+        with context but no thread) is seeded by scoring the context once.
+        """
+        if thread_id:
+            state = self.conversations.get(thread_id)
+            if state is not None:
+                return state
+            state = self.conversations.create(thread_id)
+        elif context:
+            state = ThreadState()
+        else:
+            return None
+        
+        if context and context.strip():
+            cleaned_context = self._preprocess_text(context[-MAX_CONTEXT_CHARS:])
+            rules = self.router.route(cleaned_context.folded)
+            toxicity = self._rule_based_toxicity_analysis(cleaned_context.text, cleaned_context.folded, rules)
+            sentiment = self._analyze_sentiment(cleaned_context.text, rules)
+            patterns = self._analyze_patterns(cleaned_context.text, cleaned_context.folded, rules)
+            score = self._combine_analysis_scores(toxicity, sentiment, patterns)
+            category = self._determine_category(toxicity, patterns, score)
+            state.observe(score, sentiment['compound'], category.value)
+        return state
+    
+    def _preprocess_text(self, text: str) -> NormalizedText:
+        """
+        Clean up the text for better analysis.
+        Like washing vegetables before cooking!
         
-        return text
+        One pass folds away the usual disguises (fullwidth letters,
+        look-alike characters, zero-width spaces, leetspeak) and squashes
+        whitespace and repeated characters - see models/normalizer.py.
+        We get back the cleaned text plus a lowercased, de-leeted copy
+        for pattern matching.
+        """
+        return normalize(text)
     
-    async def _analyze_toxicity(self, text: str) -> Dict[str, float]:
+    async def _analyze_toxicity(
+        self,
+        text: str,
+        folded: Optional[str] = None,
+        rules: Optional[RuleSet] = None
+    ) -> Dict[str, float]:
         """
         Use our AI model to detect toxicity.
-        This is the main AI-powered analysis.
+        This is the main AI-powered analysis. The model's forward pass
+        runs on our worker threads so the event loop stays free.
         """
-        if not self.toxicity_classifier:
+        if self.toxicity_classifier is not None and self.executor is not None:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._classify_toxicity, text, folded, rules
+            )
+        return self._classify_toxicity(text, folded, rules)
+    
+    def _classify_toxicity(
+        self,
+        text: str,
+        folded: Optional[str] = None,
+        rules: Optional[RuleSet] = None
+    ) -> Dict[str, float]:
+        """
+        The blocking part of toxicity analysis, safe to run on a worker
+        thread (the model releases the GIL while it thinks).
+        
+        The model only reads English, so texts not detected as (partly)
+        English go straight to the rules, which still include the
+        English patterns.
+        """
+        if not self.toxicity_classifier or (rules is not None and ENGLISH not in rules.languages):
             # Fallback to simple rule-based analysis
-            return self._rule_based_toxicity_analysis(text)
+            return self._rule_based_toxicity_analysis(text, folded, rules)
+        
+        if self.cascade_band is not None:
+            # Let the rules settle the clear cases on their own
+            scores = self._rule_based_toxicity_analysis(text, folded, rules)
+            low, high = self.cascade_band
+            if not low <= max(scores.values()) < high:
+                return scores
         
         try:
             # Run the text through our toxicity classifier
@@ -225,15 +849,21 @@ class ContentAnalyzer:
             return scores
             
         except Exception as e:
-            print(f"⚠️ AI model error, using fallback: {str(e)}")
-            return self._rule_based_toxicity_analysis(text)
+            logger.warning("⚠️ AI model error, using fallback: {}", e)
+            return self._rule_based_toxicity_analysis(text, folded, rules)
     
-    def _rule_based_toxicity_analysis(self, text: str) -> Dict[str, float]:
+    def _rule_based_toxicity_analysis(
+        self,
+        text: str,
+        folded: Optional[str] = None,
+        rules: Optional[RuleSet] = None
+    ) -> Dict[str, float]:
         """
         Fallback analysis using patterns and rules.
         Sometimes the old ways are reliable!
         """
-        text_lower = text.lower()
+        text_lower = folded if folded is not None else normalize(text).folded
+        rules = rules or self.router.route(text_lower)
         scores = {
             'toxicity': 0.0,
             'severe_toxicity': 0.0,
@@ -243,20 +873,20 @@ class ContentAnalyzer:
         }
         
         # Check for hate speech patterns
-        hate_matches = sum(1 for pattern in self.hate_speech_patterns 
+        hate_matches = sum(1 for pattern in rules.hate_speech 
                           if pattern.search(text_lower))
         if hate_matches > 0:
             scores['toxicity'] = min(0.3 + (hate_matches * 0.2), 1.0)
         
         # Check for threats
-        threat_matches = sum(1 for pattern in self.threat_patterns 
+        threat_matches = sum(1 for pattern in rules.threat 
                            if pattern.search(text_lower))
         if threat_matches > 0:
             scores['threat'] = min(0.4 + (threat_matches * 0.3), 1.0)
             scores['severe_toxicity'] = max(scores['severe_toxicity'], 0.7)
         
         # Check for profanity
-        profanity_matches = sum(1 for pattern in self.profanity_patterns 
+        profanity_matches = sum(1 for pattern in rules.profanity 
                               if pattern.search(text_lower))
         if profanity_matches > 0:
             scores['obscene'] = min(0.2 + (profanity_matches * 0.2), 1.0)
@@ -264,26 +894,35 @@ class ContentAnalyzer:
         
         return scores
     
-    def _analyze_sentiment(self, text: str) -> Dict[str, float]:
+    def _analyze_sentiment(self, text: str, rules: Optional[RuleSet] = None) -> Dict[str, float]:
         """
         Understand the emotional tone of the text.
         Are people being kind or mean?
         """
-        return self.sentiment_analyzer.polarity_scores(text)
+        analyzer = rules.sentiment if rules is not None else self.sentiment_analyzer
+        return analyzer.polarity_scores(text)
     
-    def _analyze_patterns(self, text: str) -> Dict[str, bool]:
+    def _analyze_patterns(
+        self,
+        text: str,
+        folded: Optional[str] = None,
+        rules: Optional[RuleSet] = None
+    ) -> Dict[str, bool]:
         """
         Look for specific patterns that indicate different types of problems.
+        Word patterns run on the matching copy, so "1d10t" reads as "idiot";
+        shouting is judged on the text as written.
         """
-        text_lower = text.lower()
+        text_lower = folded if folded is not None else normalize(text).folded
+        rules = rules or self.router.route(text_lower)
         
         return {
             'has_hate_speech': any(pattern.search(text_lower) 
-                                  for pattern in self.hate_speech_patterns),
+                                  for pattern in rules.hate_speech),
             'has_threats': any(pattern.search(text_lower) 
-                              for pattern in self.threat_patterns),
+                              for pattern in rules.threat),
             'has_profanity': any(pattern.search(text_lower) 
-                                for pattern in self.profanity_patterns),
+                                for pattern in rules.profanity),
             'excessive_caps': len(re.findall(r'[A-Z]{4,}', text)) > 2,
             'excessive_punctuation': len(re.findall(r'[!?]{3,}', text)) > 0
         }
@@ -310,9 +949,10 @@ class ContentAnalyzer:
             base_score = max(base_score, 0.9)
         
         # Consider sentiment - very negative sentiment can indicate toxicity
+        thresholds = self.thresholds
         sentiment_score = sentiment_analysis.get('compound', 0.0)
-        if sentiment_score < -0.5:
-            base_score = max(base_score, abs(sentiment_score) * 0.6)
+        if sentiment_score < thresholds.negative_sentiment:
+            base_score = max(base_score, abs(sentiment_score) * thresholds.sentiment_weight)
         
         # Pattern-based adjustments
         if pattern_analysis.get('has_threats'):
@@ -333,26 +973,27 @@ class ContentAnalyzer:
         """
         Figure out what type of toxicity we're dealing with.
         """
-        if combined_score < 0.3:
+        thresholds = self.thresholds
+        if combined_score < thresholds.safe_below:
             return ToxicityCategory.SAFE
         
         # Check for specific threat patterns
         if (pattern_analysis.get('has_threats') or 
-            toxicity_analysis.get('threat', 0.0) > 0.4):
+            toxicity_analysis.get('threat', 0.0) > thresholds.threat_model_above):
             return ToxicityCategory.THREAT
         
         # Check for hate speech
         if (pattern_analysis.get('has_hate_speech') or
-            combined_score > 0.7):
+            combined_score > thresholds.hate_speech_above):
             return ToxicityCategory.HATE_SPEECH
         
         # Check for cyberbullying indicators
-        if (toxicity_analysis.get('insult', 0.0) > 0.5 and
-            combined_score > 0.6):
+        if (toxicity_analysis.get('insult', 0.0) > thresholds.insult_above and
+            combined_score > thresholds.cyberbullying_above):
             return ToxicityCategory.CYBERBULLYING
         
         # Check for harassment
-        if combined_score > 0.5:
+        if combined_score > thresholds.harassment_above:
             return ToxicityCategory.HARASSMENT
         
         # Default to inappropriate for mild toxicity
@@ -391,6 +1032,12 @@ class ContentAnalyzer:
         if category == ToxicityCategory.SAFE:
             return "This content appears to be safe and appropriate for most audiences."
         
+        if category == ToxicityCategory.SPAM:
+            return (
+                "This content is nearly identical to many other messages posted "
+                "in the last few minutes, which looks like a spam flood."
+            )
+        
         explanations = {
             ToxicityCategory.HATE_SPEECH: (
                 "This content contains language that may be hurtful or discriminatory "
@@ -461,6 +1108,11 @@ class ContentAnalyzer:
                 "Express disagreement or frustration without mentioning harm",
                 "Consider taking a break before responding when you're angry",
                 "Remember that threats can have serious legal and personal consequences"
+            ],
+            ToxicityCategory.SPAM: [
+                "Post your message once rather than repeating it",
+                "Try replying to what others are saying instead of copying the same text",
+                "If you're sharing something important, one clear message is easier to notice"
             ]
         }
         
@@ -501,59 +1153,23 @@ class ContentAnalyzer:
         Compile regex patterns for detecting hate speech.
         These are basic patterns - real systems would use more sophisticated detection.
         """
-        patterns = [
-            r'\b(hate|despise|loathe)\s+(you|them|those)\b',
-            r'\b(kill|die|death)\s+(yourself|yourselves)\b',
-            r'\b(stupid|idiot|moron)\s+(people|person)\b',
-        ]
-        return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        return [re.compile(pattern, re.IGNORECASE) for pattern in HATE_SPEECH_PATTERNS]
     
     def _compile_threat_patterns(self) -> List[re.Pattern]:
         """
         Compile regex patterns for detecting threats.
         """
-        patterns = [
-            r'\b(going\s+to|gonna|will)\s+(kill|hurt|harm|beat|destroy)\b',
-            r'\b(watch\s+out|be\s+careful|you\s+better)\b',
-            r'\bor\s+else\b',
-        ]
-        return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        return [re.compile(pattern, re.IGNORECASE) for pattern in THREAT_PATTERNS]
     
     def _compile_profanity_patterns(self) -> List[re.Pattern]:
         """
         Compile basic profanity detection patterns.
         This is a simplified version - production systems would use comprehensive lists.
         """
-        # Basic pattern matching for demonstration
-        # Real systems would use more sophisticated profanity databases
-        patterns = [
-            r'\b[a-z]*sh[i1]t[a-z]*\b',
-            r'\b[a-z]*d[a4]mn[a-z]*\b',
-            r'\b[a-z]*cr[a4]p[a-z]*\b',
-        ]
-        return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        return [re.compile(pattern, re.IGNORECASE) for pattern in PROFANITY_PATTERNS]
     
     def _load_support_resources(self) -> List[Dict[str, str]]:
         """
         Load mental health and support resources for users who need help.
         """
-        return [
-            {
-                "name": "Crisis Text Line",
-                "description": "Free 24/7 support via text message",
-                "contact": "Text HOME to 741741",
-                "url": "https://www.crisistextline.org/"
-            },
-            {
-                "name": "National Suicide Prevention Lifeline",
-                "description": "Free and confidential support 24/7",
-                "contact": "988",
-                "url": "https://suicidepreventionlifeline.org/"
-            },
-            {
-                "name": "StopBullying.gov",
-                "description": "Resources for dealing with cyberbullying",
-                "contact": "Online resources",
-                "url": "https://www.stopbullying.gov/"
-            }
-        ]
+        return [dict(resource) for resource in SUPPORT_RESOURCES]
@@ -0,0 +1,113 @@
+"""
+Conversation Awareness for Nirabhi
+
+The same message can mean very different things depending on where a
+conversation has been heading. "You'd better watch it" is banter in a
+friendly thread and a warning sign in one that has been heating up.
+
+Re-reading a whole conversation for every new message would get slower
+as threads grow, so instead we keep a tiny summary per thread - the last
+few verdicts plus rolling sentiment, toxicity and an escalation signal -
+and score each new message against it. The cost per message stays the
+same whether a thread has five messages or five thousand.
+"""
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+
+# How much weight the newest message gets in the rolling averages
+ROLLING_WEIGHT = 0.3
+
+# Messages at or above this score count as toxic for streaks
+TOXIC_SCORE = 0.5
+
+
+@dataclass
+class ThreadState:
+    """Everything we remember about one conversation"""
+    recent: Deque[Tuple[float, str]] = field(default_factory=lambda: deque(maxlen=10))
+    rolling_sentiment: float = 0.0
+    rolling_toxicity: float = 0.0
+    toxic_streak: int = 0
+    message_count: int = 0
+
+    @property
+    def escalation(self) -> float:
+        """
+        How heated the conversation is getting, from 0 (calm) to 1.
+        Rolling toxicity matters most; negativity and a run of toxic
+        messages in a row push it higher.
+        """
+        signal = (
+            0.5 * self.rolling_toxicity +
+            0.3 * max(0.0, -self.rolling_sentiment) +
+            0.1 * self.toxic_streak
+        )
+        return min(signal, 1.0)
+
+    def observe(self, toxicity: float, sentiment: float, category: str):
+        """Fold one more message into the summary - O(1)"""
+        if self.message_count == 0:
+            self.rolling_toxicity = toxicity
+            self.rolling_sentiment = sentiment
+        else:
+            self.rolling_toxicity += ROLLING_WEIGHT * (toxicity - self.rolling_toxicity)
+            self.rolling_sentiment += ROLLING_WEIGHT * (sentiment - self.rolling_sentiment)
+        self.toxic_streak = self.toxic_streak + 1 if toxicity >= TOXIC_SCORE else 0
+        self.recent.append((toxicity, category))
+        self.message_count += 1
+
+    def signals(self) -> Dict[str, float]:
+        """The summary as reported back to clients"""
+        return {
+            "escalation": round(self.escalation, 3),
+            "rolling_sentiment": round(self.rolling_sentiment, 3),
+            "rolling_toxicity": round(self.rolling_toxicity, 3),
+            "toxic_streak": self.toxic_streak,
+            "messages": self.message_count,
+        }
+
+
+class ConversationTracker:
+    """
+    Per-thread state with least-recently-used eviction, so memory stays
+    bounded no matter how many conversations we've seen.
+    """
+
+    def __init__(self, max_threads: int = 10000, recent_messages: int = 10):
+        self.max_threads = max_threads
+        self.recent_messages = recent_messages
+        self._threads: "OrderedDict[str, ThreadState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._threads)
+
+    def get(self, thread_id: str) -> Optional[ThreadState]:
+        """Look up a thread and mark it as recently used"""
+        state = self._threads.get(thread_id)
+        if state is not None:
+            self._threads.move_to_end(thread_id)
+        return state
+
+    def create(self, thread_id: str) -> ThreadState:
+        """Start tracking a new thread, evicting the stalest if we're full"""
+        state = ThreadState(recent=deque(maxlen=self.recent_messages))
+        self._threads[thread_id] = state
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+        return state
+
+
+def adjust_for_conversation(score: float, sentiment: float, state: ThreadState) -> float:
+    """
+    Nudge a message's toxicity score using its conversation.
+
+    Only messages that already show some warning sign are nudged, so
+    a perfectly neutral reply in a heated thread stays neutral.
+    """
+    escalation = state.escalation
+    if escalation < 0.3 or (score < 0.2 and sentiment > -0.3):
+        return score
+    return min(score + 0.25 * escalation, 1.0)
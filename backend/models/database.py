@@ -8,21 +8,39 @@ Think of it as the memory of our application - it remembers everything
 so we can learn and improve over time.
 """
 
+import os
+import sys
 import json
+import time
 import asyncio
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Sequence, Tuple, AsyncIterator
+from datetime import date, datetime, timedelta
 from dataclasses import dataclass
 
+from loguru import logger
+
 # For now, we'll use a simple in-memory database for the MVP
 # In production, this would connect to PostgreSQL or another robust database
 from .schemas import (
-    ContentAnalysisResponse,
     UserPreferences,
     ToxicityReport,
     ToxicityCategory,
-    AnalysisHistory
+    SeverityLevel,
+    AnalysisHistory,
+    AnalysisHistoryPage,
+    JobInfo,
+    JobStatus
 )
+from .history_index import HistoryIndex, encode_cursor, decode_cursor
+from .health_metrics import CommunityHealth
+from .rollups import RollupStore, DailyRollup
+from .policy import CompiledPolicy, DEFAULT_POLICY, PolicyCache
+from .verdict import Verdict
+
+# Rough allowance for the record and its verdict, not counting the texts
+# (a stored analysis measured ~2.5 KiB deep on CPython 3.11; verdicts share
+# their support resources with the analyzer instead of copying them)
+RECORD_OVERHEAD_BYTES = 2 * 1024
 
 @dataclass
 class InMemoryRecord:
@@ -31,6 +49,7 @@ class InMemoryRecord:
     data: Dict[str, Any]
     created_at: datetime
     updated_at: datetime
+    seq: int = 0
 
 class Database:
     """
@@ -41,14 +60,52 @@ class Database:
     like PostgreSQL with proper persistence, indexing, and scaling.
     """
     
-    def __init__(self):
-        """Initialize our in-memory database"""
+    def __init__(
+        self,
+        rollup_retention_days: int = 90,
+        rollup_compaction_interval_seconds: float = 3600,
+        rollup_monthly_retention_months: int = 24,
+        rollup_compaction_slice_ms: float = 5.0,
+        policy_cache_size: int = 10000,
+        jobs_journal_path: Optional[str] = None,
+        job_retention_days: int = 7,
+        health_max_communities: int = 1000
+    ):
+        """
+        Initialize our in-memory database.
+        
+        Batch jobs are the one thing that has to outlive a restart, so with
+        a `jobs_journal_path` every change to them is appended to that file
+        and replayed on connect.
+        """
         self.connected = False
+        self.rollup_retention_days = rollup_retention_days
+        self.rollup_compaction_interval_seconds = rollup_compaction_interval_seconds
+        self.rollup_monthly_retention_months = rollup_monthly_retention_months
+        self.rollup_compaction_slice_seconds = rollup_compaction_slice_ms / 1000
+        self._compaction_task: Optional[asyncio.Task] = None
         
         # Our simple data stores
-        self.analysis_history: List[InMemoryRecord] = []
+        self.analysis_history: Dict[int, InMemoryRecord] = {}  # seq -> record, oldest first
+        self.history_index = HistoryIndex()
         self.user_preferences: Dict[str, UserPreferences] = {}
-        self.user_reports: Dict[str, List[ToxicityReport]] = {}
+        self.policies = PolicyCache(max_entries=policy_cache_size)
+        self.rollups = RollupStore()
+        
+        # Sliding-window health metrics, updated as analyses are stored
+        self.health = CommunityHealth(max_communities=health_max_communities)
+        
+        # Coarse per-day aggregates of analyses that retention has expired
+        self.archive: Dict[date, DailyRollup] = {}
+        self.approx_record_bytes = 0
+        
+        # Batch jobs, their pending items (inline batches only) and results
+        self.jobs: Dict[str, JobInfo] = {}
+        self.job_items: Dict[str, List[Dict[str, Any]]] = {}
+        self.job_results: Dict[str, List[Dict[str, Any]]] = {}
+        self.jobs_journal_path = jobs_journal_path
+        self.job_retention_days = job_retention_days
+        self._journal_file = None
         
         # Some demo data for testing
         self._setup_demo_data()
@@ -61,7 +118,7 @@ class Database:
         if self.connected:
             return
         
-        print("💾 Connecting to database...")
+        logger.info("💾 Connecting to database...")
         
         # In a real app, this would:
         # - Connect to PostgreSQL
@@ -72,8 +129,12 @@ class Database:
         # For now, we just simulate this
         await asyncio.sleep(0.1)  # Simulate connection time
         
+        if self.jobs_journal_path:
+            self._load_job_journal()
+        
         self.connected = True
-        print("✅ Database connected successfully!")
+        self._compaction_task = asyncio.create_task(self._compact_rollups_periodically())
+        logger.info("✅ Database connected successfully!")
     
     async def disconnect(self):
         """
@@ -83,18 +144,26 @@ class Database:
         if not self.connected:
             return
         
-        print("👋 Disconnecting from database...")
+        logger.info("👋 Disconnecting from database...")
         
         # In a real app, this would close connection pools
-        # For now, we just clear our in-memory data
+        # For now, we just stop our background jobs
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
+            self._compaction_task = None
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
         
         self.connected = False
-        print("✅ Database disconnected cleanly!")
+        logger.info("✅ Database disconnected cleanly!")
     
     async def store_analysis(
         self,
         original_text: str,
-        analysis_result: ContentAnalysisResponse
+        analysis_result: Verdict,
+        user_id: Optional[str] = None,
+        community_id: Optional[str] = None
     ) -> str:
         """
         Store an analysis result for future learning and reporting.
@@ -108,25 +177,47 @@ class Database:
         if not self.connected:
             await self.connect()
         
-        # Generate a unique ID
-        analysis_id = f"analysis_{len(self.analysis_history) + 1}_{int(datetime.utcnow().timestamp())}"
+        created_at = datetime.utcnow()
+        
+        # Index first - the sequence number doubles as our primary key
+        seq = self.history_index.add(
+            created_at,
+            user_id,
+            analysis_result.category,
+            analysis_result.severity
+        )
+        analysis_id = f"analysis_{seq}_{int(created_at.timestamp())}"
         
         # Create the record
         record = InMemoryRecord(
             id=analysis_id,
             data={
                 "original_text": original_text,
-                "analysis_result": analysis_result.dict(),
-                "user_id": None,  # Could be extracted from request context
+                "analysis_result": analysis_result,  # Immutable, so we keep it as is
+                "user_id": user_id,
             },
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+            created_at=created_at,
+            updated_at=created_at,
+            seq=seq
         )
         
         # Store it
-        self.analysis_history.append(record)
-        
-        print(f"📊 Stored analysis result: {analysis_id}")
+        self.analysis_history[seq] = record
+        self.approx_record_bytes += self._record_size(record)
+        
+        # Keep the user's daily rollup current so reports never need a scan
+        if user_id is not None:
+            self.rollups.record(
+                user_id,
+                created_at,
+                analysis_result.category,
+                analysis_result.is_toxic,
+                analysis_result.toxicity_score,
+                analysis_result.sentiment_score
+            )
+        self.health.record(analysis_result, community_id)
+        
+        logger.debug("📊 Stored analysis result: {}", analysis_id)
         return analysis_id
     
     async def get_user_reports(self, user_id: str) -> List[ToxicityReport]:
@@ -135,19 +226,42 @@ class Database:
         
         This gives users insights into their digital environment
         and helps them make informed decisions about their online safety.
+        Reports are built from at most 30 daily rollups, so they cost the
+        same for a brand-new user and for one with years of history.
         """
         if not self.connected:
             await self.connect()
         
-        # For the MVP, we'll return some sample reports
-        # In production, this would analyze real user data
-        
-        if user_id not in self.user_reports:
-            # Generate a sample report
-            sample_report = self._generate_sample_report(user_id)
-            self.user_reports[user_id] = [sample_report]
-        
-        return self.user_reports[user_id]
+        end_date = datetime.utcnow()
+        rows = self.rollups.recent(user_id, end_date.date(), days=30)
+        return [self._build_report(user_id, rows, end_date)]
+    
+    async def compact_rollups(self) -> int:
+        """
+        Fold daily rollups past the retention window into monthly ones and
+        drop monthly ones past theirs, one small slice at a time.
+        Returns how many daily rows were compacted.
+        """
+        today = datetime.utcnow().date()
+        cutoff = today - timedelta(days=self.rollup_retention_days)
+        drop_months_before = None
+        if self.rollup_monthly_retention_months > 0:
+            months_back = today.year * 12 + today.month - 1 - self.rollup_monthly_retention_months
+            drop_months_before = date(months_back // 12, months_back % 12 + 1, 1)
+        
+        compacted = 0
+        while True:
+            deadline = time.perf_counter() + self.rollup_compaction_slice_seconds
+            count, finished = self.rollups.compact(cutoff, deadline, drop_months_before)
+            compacted += count
+            if finished:
+                break
+            # Let waiting requests run before we take another slice
+            await asyncio.sleep(0)
+        
+        if compacted:
+            logger.info("🗜️ Compacted {} daily rollups older than {}", compacted, cutoff)
+        return compacted
     
     async def update_user_preferences(
         self,
@@ -163,7 +277,8 @@ class Database:
             await self.connect()
         
         self.user_preferences[user_id] = preferences
-        print(f"⚙️ Updated preferences for user: {user_id}")
+        self.policies.invalidate(user_id)
+        logger.info("⚙️ Updated preferences for user: {}", user_id)
     
     async def get_user_preferences(self, user_id: str) -> Optional[UserPreferences]:
         """
@@ -174,6 +289,21 @@ class Database:
         
         return self.user_preferences.get(user_id)
     
+    async def get_user_policy(self, user_id: str) -> CompiledPolicy:
+        """
+        Get a user's preferences compiled for analysis.
+        
+        Compiled policies are cached until the user changes their
+        preferences, so the common case never touches the preference store.
+        Users without preferences get the default policy.
+        """
+        policy = self.policies.get(user_id)
+        if policy is None:
+            preferences = await self.get_user_preferences(user_id)
+            policy = CompiledPolicy.compile(preferences) if preferences is not None else DEFAULT_POLICY
+            self.policies.put(user_id, policy)
+        return policy
+    
     async def get_analysis_history(
         self,
         user_id: Optional[str] = None,
@@ -183,37 +313,122 @@ class Database:
         Get historical analysis data.
         Useful for generating reports and improving our models.
         """
+        page = await self.query_analysis_history(user_id=user_id, limit=limit)
+        return page.items
+    
+    async def query_analysis_history(
+        self,
+        user_id: Optional[str] = None,
+        category: Optional[ToxicityCategory] = None,
+        severity: Optional[SeverityLevel] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> AnalysisHistoryPage:
+        """
+        Find analyses matching the given filters, newest first.
+        
+        Matches come straight from the secondary indexes, so a page costs
+        the same whether we hold a thousand records or ten million. Pass
+        the returned `next_cursor` back in to get the following page.
+        Raises ValueError if the cursor is not one we issued.
+        """
         if not self.connected:
             await self.connect()
         
-        # Filter and convert our records
-        results = []
-        for record in self.analysis_history[-limit:]:  # Get the most recent
-            if user_id is None or record.data.get("user_id") == user_id:
-                try:
-                    analysis_history = AnalysisHistory(
-                        id=record.id,
-                        user_id=record.data.get("user_id"),
-                        original_text=record.data["original_text"],
-                        analysis_result=ContentAnalysisResponse(**record.data["analysis_result"]),
-                        feedback=record.data.get("feedback"),
-                        created_at=record.created_at
-                    )
-                    results.append(analysis_history)
-                except Exception as e:
-                    print(f"⚠️ Error converting record {record.id}: {str(e)}")
-                    continue
-        
-        return results
+        before = decode_cursor(cursor) if cursor else None
+        
+        # Ask for one extra match so we know whether another page exists
+        seqs = self.history_index.query(
+            limit + 1,
+            user_id=user_id,
+            category=category,
+            severity=severity,
+            since=since,
+            until=until,
+            before=before
+        )
+        has_more = len(seqs) > limit
+        seqs = seqs[:limit]
+        
+        items = []
+        for seq in seqs:
+            record = self.analysis_history.get(seq)
+            if record is None:
+                continue
+            try:
+                items.append(self._to_history(record))
+            except Exception as e:
+                logger.warning("⚠️ Error converting record {}: {}", record.id, e)
+                continue
+        
+        return AnalysisHistoryPage(
+            items=items,
+            next_cursor=encode_cursor(seqs[-1]) if has_more else None
+        )
+    
+    async def iter_analysis_records(
+        self,
+        user_id: Optional[str] = None,
+        category: Optional[ToxicityCategory] = None,
+        severity: Optional[SeverityLevel] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        batch_size: int = 500
+    ) -> AsyncIterator[List[InMemoryRecord]]:
+        """
+        Yield matching raw records in batches, oldest first, for exports.
+        
+        Only one batch of sequence numbers is held at a time and nothing is
+        converted to Pydantic models, so memory stays flat however many
+        records match. `cursor` resumes after the record it points at.
+        Raises ValueError if the cursor is not one we issued.
+        """
+        if not self.connected:
+            await self.connect()
+        
+        after = decode_cursor(cursor) if cursor else None
+        # Export a snapshot: records stored after we start are left for the next resume
+        before = self.history_index.next_seq
+        while True:
+            # Re-query per batch so concurrent retention can't invalidate us
+            seqs = self.history_index.query(
+                batch_size,
+                user_id=user_id,
+                category=category,
+                severity=severity,
+                since=since,
+                until=until,
+                after=after,
+                before=before,
+                descending=False
+            )
+            if not seqs:
+                return
+            batch = [
+                record for record in map(self.analysis_history.get, seqs)
+                if record is not None
+            ]
+            if batch:
+                yield batch
+            after = seqs[-1]
     
     async def get_toxicity_stats(self) -> Dict[str, Any]:
         """
         Get overall toxicity statistics for dashboard and analytics.
+        Expired analyses still count through their archived aggregates.
         """
         if not self.connected:
             await self.connect()
         
-        total_analyses = len(self.analysis_history)
+        # Start from everything retention has already folded away
+        archived = DailyRollup(day=date.min)
+        for rollup in self.archive.values():
+            archived.merge(rollup)
+        
+        total_analyses = len(self.analysis_history) + archived.total
         if total_analyses == 0:
             return {
                 "total_analyses": 0,
@@ -223,33 +438,222 @@ class Database:
             }
         
         # Calculate stats from our stored analyses
-        toxic_count = 0
-        toxicity_scores = []
-        category_counts = {}
+        toxic_count = archived.toxic
+        toxicity_sum = archived.toxicity_sum
+        category_counts = dict(archived.category_counts)
         
-        for record in self.analysis_history:
+        for record in self.analysis_history.values():
             try:
                 result = record.data["analysis_result"]
                 
-                if result.get("is_toxic", False):
+                if result.is_toxic:
                     toxic_count += 1
                 
-                toxicity_scores.append(result.get("toxicity_score", 0.0))
+                toxicity_sum += result.toxicity_score
                 
-                category = result.get("category", "unknown")
+                category = result.category.value
                 category_counts[category] = category_counts.get(category, 0) + 1
                 
             except Exception as e:
-                print(f"⚠️ Error processing record for stats: {str(e)}")
+                logger.warning("⚠️ Error processing record for stats: {}", e)
                 continue
         
         return {
             "total_analyses": total_analyses,
             "toxic_content_rate": (toxic_count / total_analyses) * 100,
             "category_breakdown": category_counts,
-            "average_toxicity_score": sum(toxicity_scores) / len(toxicity_scores) if toxicity_scores else 0.0
+            "average_toxicity_score": toxicity_sum / total_analyses
         }
     
+    def expire_analyses(self, cutoff: datetime, deadline: float) -> Tuple[int, bool]:
+        """
+        Drop raw analyses created before `cutoff`, oldest first, folding each
+        into the per-day archive so stats stay correct.
+        
+        Stops once time.perf_counter() passes `deadline` so callers can
+        spread the work out. Returns (records expired, whether we caught up).
+        """
+        expired = 0
+        caught_up = True
+        seq = self.history_index.floor
+        
+        while seq < self.history_index.next_seq:
+            if time.perf_counter() >= deadline:
+                caught_up = False
+                break
+            record = self.analysis_history.get(seq)
+            if record is not None:
+                if record.created_at >= cutoff:
+                    break
+                del self.analysis_history[seq]
+                self.approx_record_bytes -= self._record_size(record)
+                self._archive_record(record)
+                expired += 1
+            seq += 1
+        
+        self.history_index.expire_through(seq - 1)
+        # Trim the index with whatever is left of this slice
+        index_done = self.history_index.compact(deadline)
+        return expired, caught_up and index_done
+    
+    async def create_job(self, job: JobInfo, items: Optional[List[Dict[str, Any]]] = None):
+        """Save a new batch job, with its items if they came inline"""
+        if not self.connected:
+            await self.connect()
+        
+        self.jobs[job.job_id] = job
+        self.job_results[job.job_id] = []
+        if items is not None:
+            self.job_items[job.job_id] = items
+        self._journal({"job": job.model_dump(mode="json"), "items": items})
+    
+    async def get_job(self, job_id: str) -> Optional[JobInfo]:
+        """A job's current status, or None if we don't know it"""
+        if not self.connected:
+            await self.connect()
+        
+        return self.jobs.get(job_id)
+    
+    async def get_job_items(self, job_id: str) -> List[Dict[str, Any]]:
+        """The items of an inline batch that hasn't finished yet"""
+        return self.job_items.get(job_id, [])
+    
+    async def get_job_results(self, job_id: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """A slice of a job's results, in input order"""
+        return self.job_results.get(job_id, [])[offset:offset + limit]
+    
+    async def update_job(self, job_id: str, results: Sequence[Dict[str, Any]] = (), **changes) -> JobInfo:
+        """
+        Change a job's fields and append new results, as one journal entry,
+        so progress and the results it counts can never disagree.
+        """
+        job = self.jobs[job_id].model_copy(update=changes)
+        self.jobs[job_id] = job
+        self.job_results[job_id].extend(results)
+        if job.status in (JobStatus.COMPLETED, JobStatus.FAILED):
+            self.job_items.pop(job_id, None)  # Nothing left to resume
+        self._journal({"job": job.model_dump(mode="json"), "results": list(results)})
+        return job
+    
+    async def unfinished_jobs(self) -> List[JobInfo]:
+        """Jobs to pick up again after a restart, oldest first"""
+        return [
+            job for job in self.jobs.values()
+            if job.status in (JobStatus.QUEUED, JobStatus.RUNNING) or job.callback_status == "pending"
+        ]
+    
+    def storage_stats(self) -> Dict[str, Any]:
+        """
+        How much we are holding, for the storage metrics endpoint.
+        """
+        index_bytes = self.history_index.memory_bytes()
+        oldest = self.analysis_history.get(self.history_index.floor)
+        return {
+            "records": len(self.analysis_history),
+            "record_bytes": self.approx_record_bytes,
+            "index_bytes": index_bytes,
+            "approx_bytes": self.approx_record_bytes + index_bytes,
+            "rollup_rows": self.rollups.row_count(),
+            "archive_rows": len(self.archive),
+            "oldest_record_at": oldest.created_at if oldest else None,
+        }
+    
+    async def _compact_rollups_periodically(self):
+        """Background job that keeps the rollup tables small"""
+        while True:
+            await asyncio.sleep(self.rollup_compaction_interval_seconds)
+            try:
+                await self.compact_rollups()
+            except Exception as e:
+                logger.error("⚠️ Error compacting rollups: {}", e)
+    
+    def _journal(self, entry: Dict[str, Any]):
+        """Append one job change to the journal, if we keep one"""
+        if self._journal_file is not None:
+            self._journal_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal_file.flush()
+    
+    def _load_job_journal(self):
+        """
+        Replay the job journal, drop jobs past retention and rewrite it
+        compacted (one line per job) before appending to it again.
+        """
+        path = self.jobs_journal_path
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Only the last write can be torn by a crash
+                        logger.warning("⚠️ Ignoring unreadable job journal line {}", line_number)
+                        continue
+                    job = JobInfo(**entry["job"])
+                    self.jobs[job.job_id] = job
+                    if entry.get("items") is not None:
+                        self.job_items[job.job_id] = entry["items"]
+                    self.job_results.setdefault(job.job_id, []).extend(entry.get("results") or ())
+        
+        cutoff = datetime.utcnow() - timedelta(days=self.job_retention_days)
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff and job.callback_status != "pending":
+                del self.jobs[job_id]
+                self.job_items.pop(job_id, None)
+                self.job_results.pop(job_id, None)
+            elif job.status in (JobStatus.COMPLETED, JobStatus.FAILED):
+                self.job_items.pop(job_id, None)
+        
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for job_id, job in self.jobs.items():
+                f.write(json.dumps({
+                    "job": job.model_dump(mode="json"),
+                    "items": self.job_items.get(job_id),
+                    "results": self.job_results.get(job_id, []),
+                }, ensure_ascii=False) + "\n")
+        os.replace(temp_path, path)
+        self._journal_file = open(path, "a", encoding="utf-8")
+        if self.jobs:
+            logger.info("📂 Loaded {} batch jobs from {}", len(self.jobs), path)
+    
+    def _archive_record(self, record: InMemoryRecord):
+        """Fold an expiring record into its day's coarse aggregate"""
+        result = record.data["analysis_result"]
+        day = record.created_at.date()
+        rollup = self.archive.get(day)
+        if rollup is None:
+            rollup = self.archive[day] = DailyRollup(day=day)
+        rollup.add(
+            result.category.value,
+            result.is_toxic,
+            result.toxicity_score,
+            result.sentiment_score
+        )
+    
+    def _record_size(self, record: InMemoryRecord) -> int:
+        """
+        A cheap estimate of a record's footprint: the texts we hold plus a
+        fixed allowance for the record and result containers.
+        """
+        result = record.data["analysis_result"]
+        return (
+            sys.getsizeof(record.data["original_text"]) +
+            sys.getsizeof(result.text) +
+            sys.getsizeof(result.explanation) +
+            RECORD_OVERHEAD_BYTES
+        )
+    
+    def _to_history(self, record: InMemoryRecord) -> AnalysisHistory:
+        """Convert a stored record into its API representation"""
+        return AnalysisHistory(
+            id=record.id,
+            user_id=record.data.get("user_id"),
+            original_text=record.data["original_text"],
+            analysis_result=record.data["analysis_result"].to_response(),
+            feedback=record.data.get("feedback"),
+            created_at=record.created_at
+        )
+    
     def _setup_demo_data(self):
         """
         Set up some demo data for testing and demonstration.
@@ -268,29 +672,28 @@ class Database:
             language="en"
         )
     
-    def _generate_sample_report(self, user_id: str) -> ToxicityReport:
+    def _build_report(
+        self,
+        user_id: str,
+        rows: List[DailyRollup],
+        end_date: datetime
+    ) -> ToxicityReport:
         """
-        Generate a sample toxicity report for demonstration.
-        In production, this would analyze real user data.
+        Turn the last 30 days of rollups into a friendly report.
         """
-        end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=30)  # Last 30 days
         
-        # Generate some realistic sample data
-        total_content = 150
-        toxic_content = 12
+        period = DailyRollup(day=start_date.date())
+        for row in rows:
+            period.merge(row)
         
         category_breakdown = {
-            ToxicityCategory.SAFE: 138,
-            ToxicityCategory.INAPPROPRIATE: 7,
-            ToxicityCategory.HARASSMENT: 3,
-            ToxicityCategory.CYBERBULLYING: 2,
-            ToxicityCategory.HATE_SPEECH: 0,
-            ToxicityCategory.THREAT: 0
+            ToxicityCategory(category): count
+            for category, count in period.category_counts.items()
         }
         
         # Calculate wellness score (0-100)
-        toxicity_rate = (toxic_content / total_content) * 100
+        toxicity_rate = (period.toxic / period.total) * 100 if period.total else 0.0
         wellness_score = max(0, 100 - (toxicity_rate * 2))  # Simple calculation
         
         recommendations = [
@@ -300,22 +703,56 @@ class Database:
             "Report inappropriate content to help keep platforms safe for everyone"
         ]
         
-        trend_analysis = (
-            "Your digital environment has been relatively healthy this month. "
-            f"You encountered toxic content in {toxicity_rate:.1f}% of interactions, "
-            "which is below the platform average. Keep up the great work in "
-            "choosing positive online spaces!"
-        )
-        
         return ToxicityReport(
             user_id=user_id,
             report_period_start=start_date,
             report_period_end=end_date,
-            total_content_analyzed=total_content,
-            toxic_content_detected=toxic_content,
+            total_content_analyzed=period.total,
+            toxic_content_detected=period.toxic,
             toxicity_rate=toxicity_rate,
             category_breakdown=category_breakdown,
-            trend_analysis=trend_analysis,
+            trend_analysis=self._describe_trend(rows, end_date, toxicity_rate),
             recommendations=recommendations,
             wellness_score=wellness_score
         )
+    
+    def _describe_trend(
+        self,
+        rows: List[DailyRollup],
+        end_date: datetime,
+        toxicity_rate: float
+    ) -> str:
+        """
+        Compare the last week against the rest of the month.
+        """
+        if not rows:
+            return (
+                "We haven't analyzed any content for you in the last 30 days yet. "
+                "Your report will fill in as you use Nirabhi."
+            )
+        
+        week_start = end_date.date() - timedelta(days=6)
+        recent, earlier = DailyRollup(day=week_start), DailyRollup(day=week_start)
+        for row in rows:
+            (recent if row.day >= week_start else earlier).merge(row)
+        
+        summary = (
+            f"You encountered toxic content in {toxicity_rate:.1f}% of "
+            f"interactions over the last 30 days."
+        )
+        if not recent.total or not earlier.total:
+            return summary
+        
+        recent_rate = recent.toxic / recent.total * 100
+        earlier_rate = earlier.toxic / earlier.total * 100
+        if recent_rate < earlier_rate - 1:
+            return summary + (
+                f" Things are improving: {recent_rate:.1f}% this week versus "
+                f"{earlier_rate:.1f}% before. Keep up the great work!"
+            )
+        if recent_rate > earlier_rate + 1:
+            return summary + (
+                f" This week was rougher ({recent_rate:.1f}% versus {earlier_rate:.1f}% "
+                "before) - it might be a good time for a break or stricter filters."
+            )
+        return summary + " That's steady compared with earlier in the month."
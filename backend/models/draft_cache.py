@@ -0,0 +1,140 @@
+"""
+Sentence-Level Memoization for Live Drafts
+
+Pre-posting warnings re-check a draft every time the user pauses typing.
+Between two checks usually only the last sentence has changed, so we
+remember the expensive per-sentence results (model, sentiment and
+pattern checks) by a hash of the sentence and only analyze what's new.
+
+The per-sentence results are then merged back into the same shape the
+analyzer produces for a whole text, so the usual scoring rules decide
+the final verdict.
+"""
+
+import hashlib
+import math
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+CAPS_RUN = re.compile(r'[A-Z]{4,}')
+PUNCTUATION_RUN = re.compile(r'[!?]{3,}')
+
+# VADER squashes its raw valence sum into a compound score with this constant
+VADER_ALPHA = 15
+
+
+class DraftStats(NamedTuple):
+    """How much work a draft check actually did"""
+    sentences: int
+    cache_hits: int
+
+
+@dataclass(frozen=True)
+class SentenceFeatures:
+    """Everything the scoring rules need to know about one sentence"""
+    toxicity: Dict[str, float]
+    sentiment: Dict[str, float]
+    patterns: Dict[str, bool]
+    caps_runs: int
+    punctuation_runs: int
+    length: int
+
+    @classmethod
+    def measure(
+        cls,
+        sentence: str,
+        toxicity: Dict[str, float],
+        sentiment: Dict[str, float],
+        patterns: Dict[str, bool]
+    ) -> "SentenceFeatures":
+        return cls(
+            toxicity=toxicity,
+            sentiment=sentiment,
+            patterns=patterns,
+            caps_runs=len(CAPS_RUN.findall(sentence)),
+            punctuation_runs=len(PUNCTUATION_RUN.findall(sentence)),
+            length=len(sentence)
+        )
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split cleaned text into sentences at ., ! or ? followed by whitespace"""
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence]
+
+
+def sentence_key(sentence: str) -> bytes:
+    """A short, collision-resistant cache key that doesn't keep the sentence alive"""
+    return hashlib.blake2b(sentence.encode("utf-8"), digest_size=16).digest()
+
+
+def merge_sentence_features(
+    features: List[SentenceFeatures]
+) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, bool]]:
+    """
+    Rebuild document-level toxicity, sentiment and pattern results.
+
+    - Toxicity: the worst sentence sets each score
+    - Sentiment: each sentence's compound score is turned back into VADER's
+      raw valence sum, the sums are added and squashed again - close to
+      what VADER gives for the whole text, though not exact (rules that
+      cross sentences, like "but", are lost). neg/neu/pos are averaged
+      by sentence length
+    - Patterns: any sentence matching counts; caps and punctuation runs
+      are counted across the whole draft, as they are for full analysis
+    """
+    toxicity: Dict[str, float] = {}
+    patterns: Dict[str, bool] = {}
+    sentiment = {"neg": 0.0, "neu": 0.0, "pos": 0.0}
+    valence = 0.0
+    total_length = sum(feature.length for feature in features) or 1
+    caps_runs = 0
+    punctuation_runs = 0
+
+    for feature in features:
+        for label, score in feature.toxicity.items():
+            toxicity[label] = max(toxicity.get(label, 0.0), score)
+        for label, matched in feature.patterns.items():
+            patterns[label] = patterns.get(label, False) or matched
+        weight = feature.length / total_length
+        for label in sentiment:
+            sentiment[label] += feature.sentiment.get(label, 0.0) * weight
+        valence += _raw_valence(feature.sentiment.get("compound", 0.0))
+        caps_runs += feature.caps_runs
+        punctuation_runs += feature.punctuation_runs
+
+    sentiment["compound"] = valence / math.sqrt(valence * valence + VADER_ALPHA)
+    patterns["excessive_caps"] = caps_runs > 2
+    patterns["excessive_punctuation"] = punctuation_runs > 0
+    return toxicity, sentiment, patterns
+
+
+def _raw_valence(compound: float) -> float:
+    """Undo VADER's normalization: compound = v / sqrt(v^2 + alpha)"""
+    compound = max(min(compound, 0.9999), -0.9999)
+    return compound * math.sqrt(VADER_ALPHA / (1 - compound * compound))
+
+
+class SentenceCache:
+    """A bounded least-recently-used map from sentence hash to features"""
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, SentenceFeatures]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Optional[SentenceFeatures]:
+        features = self._entries.get(key)
+        if features is not None:
+            self._entries.move_to_end(key)
+        return features
+
+    def put(self, key: bytes, features: SentenceFeatures):
+        self._entries[key] = features
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
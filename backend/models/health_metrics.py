@@ -0,0 +1,346 @@
+"""
+Streaming Community Health Metrics
+
+Moderators want to know how a community is doing right now - is it
+getting more toxic this hour, how bad is the worst 1% of today - and
+`get_toxicity_stats` can only answer with all-time averages from a full
+scan. Here every analysis is folded into running metrics as it is
+stored, so answering never touches stored history:
+
+- Sliding windows of the last minute, hour and day. Each window is a
+  ring of buckets (10 s, 5 min and 1 h wide) plus a running total: a new
+  analysis is added to the current bucket and the total, and a bucket
+  that slides out is subtracted from the total and reused. So the
+  windows slide one bucket at a time.
+- Per bucket: analyses, toxic ones, category counts, score sums and
+  quantile sketches of `toxicity_score` and `sentiment_score`.
+- The sketches are fixed-bin histograms. Both scores live in fixed
+  ranges, so bins 0.02 wide give any quantile within ±0.01. Adding
+  is one increment, and two sketches merge by adding their bins. That
+  is also how windows combine buckets, and how workers could combine
+  theirs.
+
+Metrics are kept globally and per community (or tenant), for at most
+`max_communities` communities; the one updated longest ago is dropped
+first. Memory is fixed by that number, and a bucket only allocates its
+sketches once something lands in it, so quiet communities stay small.
+"""
+
+import math
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .verdict import CATEGORIES, Verdict
+
+# (name, length in seconds, buckets)
+WINDOWS: Tuple[Tuple[str, int, int], ...] = (
+    ("1m", 60, 6),
+    ("1h", 3600, 12),
+    ("24h", 86400, 24),
+)
+
+TOXICITY_RANGE = (0.0, 1.0, 50)
+SENTIMENT_RANGE = (-1.0, 1.0, 100)
+
+QUANTILES = (("p50", 0.50), ("p90", 0.90), ("p99", 0.99))
+
+
+def bin_index(value: float, low: float, high: float, bins: int) -> int:
+    index = int((value - low) / (high - low) * bins)
+    return min(max(index, 0), bins - 1)
+
+
+class HistogramSketch:
+    """
+    A mergeable quantile sketch for values in [low, high]: counts in
+    equal-width bins. Quantiles are bin midpoints, so they are within
+    half a bin of the true value.
+    """
+    __slots__ = ("low", "high", "counts", "count")
+
+    def __init__(self, low: float, high: float, bins: int):
+        self.low = low
+        self.high = high
+        self.counts = array("I", bytes(4 * bins))
+        self.count = 0
+
+    def bin(self, value: float) -> int:
+        """Which bin a value falls in"""
+        return bin_index(value, self.low, self.high, len(self.counts))
+
+    def add(self, value: float):
+        self.add_to_bin(self.bin(value))
+
+    def add_to_bin(self, index: int):
+        self.counts[index] += 1
+        self.count += 1
+
+    def merge(self, other: "HistogramSketch"):
+        """Fold another sketch with the same bins into this one"""
+        self._check_layout(other)
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.count += other.count
+
+    def subtract(self, other: "HistogramSketch"):
+        """Take back a sketch previously merged into this one"""
+        self._check_layout(other)
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] -= count
+        self.count -= other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The value below which a share `q` of the values fall (None when empty)"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        width = (self.high - self.low) / len(self.counts)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.low + (index + 0.5) * width
+        return self.high
+
+    def _check_layout(self, other: "HistogramSketch"):
+        if (self.low, self.high, len(self.counts)) != (other.low, other.high, len(other.counts)):
+            raise ValueError("Only sketches with the same bins can be merged")
+
+
+# One analysis as the windows take it: (is_toxic, category code,
+# toxicity, sentiment, toxicity bin, sentiment bin). Bins are worked out
+# once, however many windows and scopes the analysis lands in.
+_Sample = Tuple[bool, int, float, float, int, int]
+
+
+class _Bucket:
+    """Everything counted over one stretch of time"""
+    __slots__ = ("count", "toxic", "categories", "toxicity_sum", "sentiment_sum", "toxicity", "sentiment")
+
+    def __init__(self):
+        self.categories = array("I", bytes(4 * len(CATEGORIES)))
+        self.toxicity: Optional[HistogramSketch] = None
+        self.sentiment: Optional[HistogramSketch] = None
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.toxic = 0
+        for index in range(len(self.categories)):
+            self.categories[index] = 0
+        self.toxicity_sum = 0.0
+        self.sentiment_sum = 0.0
+        self.toxicity = None  # Sketches are only allocated once something lands here
+        self.sentiment = None
+
+    def add(self, sample: _Sample):
+        is_toxic, category_code, toxicity, sentiment, toxicity_bin, sentiment_bin = sample
+        if self.toxicity is None:
+            self.toxicity = HistogramSketch(*TOXICITY_RANGE)
+            self.sentiment = HistogramSketch(*SENTIMENT_RANGE)
+        self.count += 1
+        self.toxic += is_toxic
+        self.categories[category_code] += 1
+        self.toxicity_sum += toxicity
+        self.sentiment_sum += sentiment
+        self.toxicity.add_to_bin(toxicity_bin)
+        self.sentiment.add_to_bin(sentiment_bin)
+
+    def subtract(self, other: "_Bucket"):
+        """Take back a bucket whose analyses were also added here"""
+        if not other.count:
+            return
+        self.count -= other.count
+        if not self.count:
+            self.clear()  # Also drops any float drift in the sums
+            return
+        self.toxic -= other.toxic
+        for index, count in enumerate(other.categories):
+            self.categories[index] -= count
+        self.toxicity_sum -= other.toxicity_sum
+        self.sentiment_sum -= other.sentiment_sum
+        self.toxicity.subtract(other.toxicity)
+        self.sentiment.subtract(other.sentiment)
+
+
+class SlidingWindow:
+    """A window of `seconds` that slides forward one bucket at a time"""
+
+    def __init__(self, seconds: float, buckets: int):
+        self.seconds = seconds
+        self.bucket_seconds = seconds / buckets
+        self.ring = [_Bucket() for _ in range(buckets)]
+        self.total = _Bucket()
+        self.epoch: Optional[int] = None  # Which bucket-width slice of time is current
+
+    def _advance(self, now: float):
+        """Retire the buckets that slid out since the last call"""
+        epoch = int(now // self.bucket_seconds)
+        if self.epoch is None:
+            self.epoch = epoch
+            return
+        steps = epoch - self.epoch
+        if steps <= 0:
+            return
+        if steps >= len(self.ring):
+            for bucket in self.ring:
+                bucket.clear()
+            self.total.clear()
+        else:
+            for step in range(1, steps + 1):
+                bucket = self.ring[(self.epoch + step) % len(self.ring)]
+                self.total.subtract(bucket)
+                bucket.clear()
+        self.epoch = epoch
+
+    def add(self, now: float, sample: _Sample):
+        self._advance(now)
+        self.ring[self.epoch % len(self.ring)].add(sample)
+        self.total.add(sample)
+
+    def summary(self, now: float, covered_seconds: float) -> Dict[str, Any]:
+        """The window's totals; rates are over the part of it we have been watching"""
+        self._advance(now)
+        total = self.total
+        span = max(min(self.seconds, covered_seconds), self.bucket_seconds)
+        return {
+            "window_seconds": self.seconds,
+            "analyses": total.count,
+            "per_minute": round(total.count / span * 60, 3),
+            "toxic_rate": round(total.toxic / total.count, 4) if total.count else None,
+            "categories": {
+                category.value: count for category, count in zip(CATEGORIES, total.categories) if count
+            },
+            "toxicity": _distribution(total.toxicity, total.toxicity_sum, total.count),
+            "sentiment": _distribution(total.sentiment, total.sentiment_sum, total.count),
+        }
+
+
+def _distribution(sketch: Optional[HistogramSketch], value_sum: float, count: int) -> Dict[str, Optional[float]]:
+    if sketch is None or not count:
+        return {"mean": None, **{name: None for name, _ in QUANTILES}}
+    return {
+        "mean": round(value_sum / count, 4),
+        **{name: round(sketch.quantile(q), 4) for name, q in QUANTILES},
+    }
+
+
+class _Scope:
+    """The windows of one community (or of everything)"""
+    __slots__ = ("windows", "started")
+
+    def __init__(self, now: float):
+        self.windows = [(name, SlidingWindow(seconds, buckets)) for name, seconds, buckets in WINDOWS]
+        self.started = now
+
+    def add(self, now: float, sample: _Sample):
+        for _, window in self.windows:
+            window.add(now, sample)
+
+    def summary(self, now: float) -> Dict[str, Any]:
+        return {name: window.summary(now, now - self.started) for name, window in self.windows}
+
+
+class CommunityHealth:
+    """
+    Sliding-window health metrics, globally and per community.
+    `record()` every stored analysis; `snapshot()` for the endpoint.
+    """
+
+    def __init__(self, max_communities: int = 1000):
+        self.max_communities = max_communities
+        self.everyone = _Scope(time.monotonic())
+        self.communities: "OrderedDict[str, _Scope]" = OrderedDict()
+
+    def record(self, verdict: Verdict, community: Optional[str] = None, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        toxicity, sentiment = verdict.toxicity_score, verdict.sentiment_score
+        sample = (
+            verdict.is_toxic,
+            verdict.category_code,
+            toxicity,
+            sentiment,
+            bin_index(toxicity, *TOXICITY_RANGE),
+            bin_index(sentiment, *SENTIMENT_RANGE)
+        )
+        self.everyone.add(now, sample)
+        if community is None or self.max_communities <= 0:
+            return
+        scope = self.communities.get(community)
+        if scope is None:
+            scope = self.communities[community] = _Scope(now)
+            if len(self.communities) > self.max_communities:
+                self.communities.popitem(last=False)
+        else:
+            self.communities.move_to_end(community)
+        scope.add(now, sample)
+
+    def snapshot(self, community: Optional[str] = None, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Every window for one community, or for everyone; None for a community we aren't tracking"""
+        now = time.monotonic() if now is None else now
+        scope = self.everyone if community is None else self.communities.get(community)
+        if scope is None:
+            return None
+        return {"community": community, "windows": scope.summary(now)}
+
+    def tracked_communities(self) -> List[str]:
+        """Communities with metrics, most recently active first"""
+        return list(reversed(self.communities))
+
+
+# Benchmarks: python -m models.health_metrics
+if __name__ == "__main__":
+    import random
+
+    rng = random.Random(50)
+
+    def random_verdict() -> Verdict:
+        toxicity = rng.betavariate(0.7, 3)
+        return Verdict(
+            text="", toxicity_score=toxicity, is_toxic=toxicity > 0.5, category_code=rng.randrange(len(CATEGORIES)),
+            severity_code=0, sentiment_score=rng.uniform(-1, 1), confidence=0.5, explanation="", suggestions=(),
+            support_resources=None, analyzed_at=0.0, processing_time_ms=0.0
+        )
+
+    # Two days of traffic, one analysis every ~3 s, checked against an exact recount
+    health = CommunityHealth()
+    log = []
+    now = 0.0
+    worst_error = 0.0
+    windows_exact = True
+    for step in range(60000):
+        now += rng.expovariate(1 / 3)
+        verdict = random_verdict()
+        health.record(verdict, "community", now=now)
+        log.append((now, verdict))
+        if step % 10000 != 9999:
+            continue
+        summary = health.snapshot("community", now=now)["windows"]
+        for name, seconds, buckets in WINDOWS:
+            bucket_seconds = seconds / buckets
+            since = (now // bucket_seconds - buckets + 1) * bucket_seconds
+            inside = [verdict for at, verdict in log if at >= since]
+            windows_exact &= summary[name]["analyses"] == len(inside)
+            for field, key in (("toxicity", "toxicity_score"), ("sentiment", "sentiment_score")):
+                ordered = sorted(getattr(verdict, key) for verdict in inside)
+                for label, q in QUANTILES:
+                    exact = ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+                    worst_error = max(worst_error, abs(summary[name][field][label] - exact))
+    print(f"📊 window counts match a recount: {windows_exact}, worst quantile error {worst_error:.4f}")
+
+    verdicts = [random_verdict() for _ in range(20000)]
+    for label, community in (("global only", None), ("global + community", "community")):
+        health = CommunityHealth()
+        started = time.perf_counter()
+        for verdict in verdicts:
+            health.record(verdict, community)
+        print(f"  record, {label:<20} {(time.perf_counter() - started) / len(verdicts) * 1e6:6.2f} µs")
+    started = time.perf_counter()
+    health.snapshot("community")
+    print(f"  snapshot (3 windows)              {(time.perf_counter() - started) * 1e6:6.0f} µs")
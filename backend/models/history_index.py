@@ -0,0 +1,384 @@
+"""
+Secondary Indexes for Analysis History
+
+Finding "everything user X saw last week" shouldn't mean reading every
+analysis we have ever stored. This module keeps small, sorted posting
+lists next to the history so queries become a couple of binary searches
+plus a walk over just the matching records.
+
+Every stored analysis gets a monotonically increasing sequence number.
+Because records arrive in time order, sequence numbers are also sorted by
+time, which lets one number do three jobs: the primary key, the time index
+and the pagination cursor.
+"""
+
+import base64
+import binascii
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+CURSOR_VERSION = "v1"
+
+# Arrays with more live entries than this are trimmed by copying their live
+# part into a new array a step at a time, instead of one big memmove
+TRIM_STEP = 65536
+
+
+def _key(value) -> Optional[str]:
+    """Index keys are plain strings, whether we got an enum or its value"""
+    if value is None:
+        return None
+    return str(getattr(value, "value", value))
+
+
+def _timestamp(moment: datetime) -> float:
+    """Seconds since the epoch; naive datetimes are UTC, like everything we store"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def encode_cursor(seq: int) -> str:
+    """Turn a sequence number into an opaque, URL-safe cursor"""
+    raw = f"{CURSOR_VERSION}:{seq}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Turn a cursor back into a sequence number.
+    Raises ValueError for anything we didn't hand out ourselves.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, _, seq = base64.urlsafe_b64decode(padded).decode("ascii").partition(":")
+        if version != CURSOR_VERSION:
+            raise ValueError("unsupported cursor version")
+        return int(seq)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+class HistoryIndex:
+    """
+    Posting lists over analysis sequence numbers.
+
+    Each indexed value (a user, a category, a severity) maps to a sorted
+    array of sequence numbers. Arrays keep 10M entries at ~8 bytes each
+    instead of ~36 bytes for a list of Python ints.
+    """
+
+    def __init__(self):
+        self.by_user: Dict[str, array] = {}
+        self.by_category: Dict[str, array] = {}
+        self.by_severity: Dict[str, array] = {}
+
+        # Time index: _times[i] is the timestamp of sequence _base_seq + i
+        self._times = array("d")
+        self._base_seq = 1
+        self._last_time = float("-inf")
+
+        # Everything below the floor has been expired and must be ignored
+        self.floor = 1
+        self.next_seq = 1
+
+        # Posting lists still waiting to be trimmed by an interrupted compact()
+        self._compact_queue: Deque[Tuple[Dict[str, array], str]] = deque()
+
+        # A long array being copied without its dead prefix:
+        # (source, copy, next position to copy, installs the finished copy)
+        self._copy: Optional[Tuple[array, array, int, Callable[[array], None]]] = None
+
+    def __len__(self) -> int:
+        return self.next_seq - self.floor
+
+    def add(
+        self,
+        created_at: datetime,
+        user_id: Optional[str],
+        category,
+        severity
+    ) -> int:
+        """Index a new record and return its sequence number"""
+        seq = self.next_seq
+        self.next_seq += 1
+
+        # Clocks can step backwards; keep the time index sorted regardless
+        timestamp = max(_timestamp(created_at), self._last_time)
+        self._last_time = timestamp
+        self._times.append(timestamp)
+
+        for postings, value in (
+            (self.by_user, _key(user_id)),
+            (self.by_category, _key(category)),
+            (self.by_severity, _key(severity)),
+        ):
+            if value is not None:
+                postings.setdefault(value, array("q")).append(seq)
+
+        return seq
+
+    def expire_through(self, seq: int):
+        """
+        Forget every record up to and including `seq`.
+
+        Raising the floor is O(1); the dead prefixes are trimmed lazily by
+        `compact()` once they are worth the copy.
+        """
+        self.floor = max(self.floor, min(seq + 1, self.next_seq))
+
+    def compact(self, deadline: Optional[float] = None) -> bool:
+        """
+        Physically drop expired prefixes from the time index and postings.
+
+        With a `deadline` (a time.perf_counter() value) we stop once it has
+        passed and pick up where we left off on the next call, so large
+        indexes are trimmed in small slices. Returns True when done.
+        """
+        if self._copy is not None and not self._continue_copy(deadline):
+            return False
+
+        dead = self.floor - self._base_seq
+        if dead > 0 and not self._trim(self._times, dead, self._install_times(self.floor), deadline):
+            return False
+
+        if not self._compact_queue:
+            self._compact_queue.extend(
+                (postings, value)
+                for postings in (self.by_user, self.by_category, self.by_severity)
+                for value in postings
+            )
+
+        while self._compact_queue:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            postings, value = self._compact_queue.popleft()
+            seqs = postings.get(value)
+            if seqs is None:
+                continue
+            cut = bisect_left(seqs, self.floor)
+            if cut == len(seqs):
+                del postings[value]
+            elif cut and not self._trim(seqs, cut, self._install_postings(postings, value, seqs), deadline):
+                return False
+        return True
+
+    def _trim(
+        self,
+        seqs: array,
+        cut: int,
+        install: Callable[[array], None],
+        deadline: Optional[float]
+    ) -> bool:
+        """
+        Drop the first `cut` entries of `seqs`. Short arrays are trimmed in
+        place; long ones are copied in TRIM_STEP pieces (once at least a
+        fifth of them is dead, so each entry is copied only a few times) and
+        `install` swaps the copy in. Returns False if the deadline hit first.
+        """
+        live = len(seqs) - cut
+        if live <= TRIM_STEP:
+            del seqs[:cut]
+            install(seqs)
+            return True
+        if cut * 4 < live:
+            return True  # Not worth a copy yet
+        self._copy = (seqs, array(seqs.typecode), cut, install)
+        return self._continue_copy(deadline)
+
+    def _continue_copy(self, deadline: Optional[float]) -> bool:
+        """
+        Copy more of the array being trimmed. Records added meanwhile are
+        appended to the source, so we stop only once the copy has caught up.
+        """
+        source, copy, position, install = self._copy
+        while position < len(source):
+            if deadline is not None and time.perf_counter() >= deadline:
+                self._copy = (source, copy, position, install)
+                return False
+            copy.extend(source[position:position + TRIM_STEP])
+            position += TRIM_STEP
+        self._copy = None
+        install(copy)
+        return True
+
+    def _install_times(self, base_seq: int) -> Callable[[array], None]:
+        def install(times: array):
+            self._times = times
+            self._base_seq = base_seq
+        return install
+
+    def _install_postings(self, postings: Dict[str, array], value: str, seqs: array) -> Callable[[array], None]:
+        def install(copy: array):
+            if postings.get(value) is seqs:
+                postings[value] = copy
+        return install
+
+    def seq_range(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> range:
+        """Live sequence numbers whose timestamps fall in [since, until]"""
+        offset = self.floor - self._base_seq
+        lo = offset
+        hi = len(self._times)
+        if since is not None:
+            lo = max(lo, bisect_left(self._times, _timestamp(since), lo, hi))
+        if until is not None:
+            hi = bisect_right(self._times, _timestamp(until), lo, hi)
+        return range(self._base_seq + lo, self._base_seq + hi)
+
+    def iter_seqs(
+        self,
+        user_id: Optional[str] = None,
+        category=None,
+        severity=None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after: Optional[int] = None,
+        before: Optional[int] = None,
+        descending: bool = True
+    ) -> Iterator[int]:
+        """
+        Yield matching sequence numbers, newest first by default.
+
+        We walk the smallest matching posting list and check membership in
+        the others with a binary search, so the cost follows the size of the
+        answer rather than the size of the history.
+        """
+        window = self.seq_range(since, until)
+        lo, hi = window.start, window.stop
+        if after is not None:
+            lo = max(lo, after + 1)
+        if before is not None:
+            hi = min(hi, before)
+        if lo >= hi:
+            return
+
+        filters = []
+        for postings, value in (
+            (self.by_user, _key(user_id)),
+            (self.by_category, _key(category)),
+            (self.by_severity, _key(severity)),
+        ):
+            if value is None:
+                continue
+            seqs = postings.get(value)
+            if seqs is None:
+                return
+            start = bisect_left(seqs, lo)
+            stop = bisect_left(seqs, hi, start)
+            if start == stop:
+                return
+            filters.append((stop - start, seqs, start, stop))
+
+        if not filters:
+            yield from (reversed(range(lo, hi)) if descending else range(lo, hi))
+            return
+
+        filters.sort(key=lambda f: f[0])
+        _, driver, start, stop = filters[0]
+        others = [(seqs, a, b) for _, seqs, a, b in filters[1:]]
+
+        positions = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+        for position in positions:
+            seq = driver[position]
+            if all(_contains(seqs, seq, a, b) for seqs, a, b in others):
+                yield seq
+
+    def query(self, limit: int, **filters) -> List[int]:
+        """The first `limit` matches of `iter_seqs`"""
+        results = []
+        if limit <= 0:
+            return results
+        for seq in self.iter_seqs(**filters):
+            results.append(seq)
+            if len(results) >= limit:
+                break
+        return results
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the index payload in bytes"""
+        total = self._times.buffer_info()[1] * self._times.itemsize
+        for postings in (self.by_user, self.by_category, self.by_severity):
+            for seqs in postings.values():
+                total += seqs.buffer_info()[1] * seqs.itemsize
+        return total
+
+
+def _contains(seqs: array, seq: int, lo: int, hi: int) -> bool:
+    """Binary-search membership test on a sorted posting array"""
+    position = bisect_left(seqs, seq, lo, hi)
+    return position < hi and seqs[position] == seq
+
+
+# Benchmarks: python -m models.history_index --records 1000000 10000000
+if __name__ == "__main__":
+    import argparse
+    import random
+    import resource
+    from datetime import timedelta
+
+    parser = argparse.ArgumentParser(description="Benchmark the analysis history index")
+    parser.add_argument("--records", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    args = parser.parse_args()
+
+    categories = ["safe"] * 90 + ["inappropriate"] * 5 + ["harassment"] * 3 + ["threat"] * 2
+    severities = ["low", "medium", "high", "critical"]
+
+    def timed(label: str, fn, repeat: int):
+        start = time.perf_counter()
+        for i in range(repeat):
+            fn(i)
+        elapsed_us = (time.perf_counter() - start) / repeat * 1e6
+        print(f"  {label:<44} {elapsed_us:>10.1f} µs/query")
+
+    for total in args.records:
+        rng = random.Random(42)
+        index = HistoryIndex()
+        start_time = datetime(2025, 1, 1)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        started = time.perf_counter()
+        for i in range(total):
+            index.add(
+                start_time + timedelta(seconds=i),
+                f"user_{rng.randrange(args.users)}",
+                rng.choice(categories),
+                rng.choice(severities)
+            )
+        build_s = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        print(f"\n📊 {total:,} records")
+        print(f"  build: {build_s:.1f}s ({total / build_s:,.0f} inserts/s)")
+        print(f"  index payload: {index.memory_bytes() / 2**20:.1f} MiB, "
+              f"max RSS growth: {(rss_after - rss_before) / 1024:.1f} MiB")
+
+        users = [f"user_{rng.randrange(args.users)}" for _ in range(args.queries)]
+        mid = start_time + timedelta(seconds=total // 2)
+
+        timed("user_id, newest 50", lambda i: index.query(50, user_id=users[i]), args.queries)
+        timed("category=threat, newest 50", lambda i: index.query(50, category="threat"), args.queries)
+        timed("category=threat + severity=critical, 50",
+              lambda i: index.query(50, category="threat", severity="critical"), args.queries)
+        timed("user_id + since (last half), 50",
+              lambda i: index.query(50, user_id=users[i], since=mid), args.queries)
+        timed("1-hour window, 50",
+              lambda i: index.query(50, since=mid, until=mid + timedelta(hours=1)), args.queries)
+
+        def paginate(_):
+            cursor = None
+            for _ in range(20):
+                page = index.query(50, category="harassment", before=cursor)
+                cursor = page[-1]
+
+        timed("category=harassment, 20 pages of 50", paginate, max(args.queries // 20, 1))
+        del index
@@ -0,0 +1,325 @@
+"""
+Batch Jobs
+
+Some callers send us thousands of texts at once and can't hold a
+connection open while they're scored. They submit a job instead - the
+items themselves or a file in our job input directory - get its ID
+straight back, and poll for progress and results.
+
+- A fixed number of worker tasks take jobs from a queue, so however many
+  jobs are submitted, only that many are scored at once.
+- Items are scored a few at a time with `analyze_batch`, with the model
+  (when loaded) on the analyzer's worker threads and a yield to the
+  event loop between batches, so interactive requests don't wait behind
+  a job. Stored texts aren't live traffic, so they never touch the
+  flood index the way `analyze_text` would.
+- Progress and results are saved through the Database every
+  `chunk_size` items, in one write. After a restart, unfinished jobs are
+  queued again and carry on after the last saved item.
+- With a `callback_url`, the finished job's status is POSTed there, with
+  a few retries. Undelivered callbacks are retried after a restart too.
+  Callbacks only go to hosts on the configured allowlist, so a job can't
+  make us POST to internal services.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import uuid
+from dataclasses import replace
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from loguru import logger
+
+from .content_analyzer import ContentAnalyzer
+from .database import Database
+from .policy import DEFAULT_POLICY
+from .schemas import JobInfo, JobRequest, JobStatus
+
+# (id, text, error) for each record of a job's input
+JobRecord = Tuple[Any, Optional[str], Optional[str]]
+
+# Items scored per analyze_batch call, between yields to the event loop
+SCORE_BATCH = 16
+
+# Job results have no explanations or suggestions, so they're never built
+JOB_POLICY = replace(DEFAULT_POLICY, explanations=False, suggestions=False, support=False)
+
+
+class JobRunner:
+    """
+    Runs batch jobs in the background with bounded concurrency.
+    `start()` it once the database is connected; `stop()` on shutdown.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        analyzer: ContentAnalyzer,
+        workers: int = 2,
+        chunk_size: int = 100,
+        max_items: int = 10000,
+        max_text_length: int = 10000,
+        input_dir: Optional[str] = None,
+        callback_timeout_seconds: float = 10,
+        callback_attempts: int = 3,
+        callback_allowed_hosts: Optional[List[str]] = None
+    ):
+        """
+        Callbacks may only go to `callback_allowed_hosts`: exact host names,
+        or ".example.com" for a domain and its subdomains. Without any,
+        jobs can't ask for callbacks.
+        """
+        self.database = database
+        self.analyzer = analyzer
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_items = max_items
+        self.max_text_length = max_text_length
+        self.input_dir = os.path.realpath(input_dir) if input_dir else None
+        self.callback_timeout_seconds = callback_timeout_seconds
+        self.callback_attempts = callback_attempts
+        self.callback_allowed_hosts = [host.lower() for host in callback_allowed_hosts or []]
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Queue whatever was unfinished before a restart and start the workers"""
+        if self._tasks:
+            return
+        for job in await self.database.unfinished_jobs():
+            self._queue.put_nowait(job.job_id)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def stop(self):
+        """Stop the workers; unsaved progress is redone after the next start"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def submit(self, request: JobRequest) -> JobInfo:
+        """
+        Save a new job and queue it. Raises ValueError if the request
+        names neither or both of items and file, has too many items,
+        points at a file we can't read or wants a callback to a host
+        that isn't allowed.
+        """
+        if (request.items is None) == (request.file is None):
+            raise ValueError("Send exactly one of 'items' or 'file'")
+        if request.callback_url and not self._callback_allowed(str(request.callback_url)):
+            raise ValueError("Callbacks to that host are not allowed")
+
+        job = JobInfo(
+            job_id=f"job_{uuid.uuid4().hex}",
+            file=request.file,
+            text_field=request.text_field,
+            id_field=request.id_field,
+            callback_url=str(request.callback_url) if request.callback_url else None,
+            callback_status="pending" if request.callback_url else None
+        )
+        items = None
+        if request.items is not None:
+            if not request.items:
+                raise ValueError("A job needs at least one item")
+            if len(request.items) > self.max_items:
+                raise ValueError(f"A job can have at most {self.max_items} items")
+            items = [item.model_dump() for item in request.items]
+            job.total = len(items)
+        else:
+            self._input_path(request.file)
+
+        await self.database.create_job(job, items)
+        self._queue.put_nowait(job.job_id)
+        logger.info("📥 Queued job {} ({} items)", job.job_id, job.total if job.total is not None else "file")
+        return job
+
+    def _callback_allowed(self, url: str) -> bool:
+        """Whether `url` points at a host on the callback allowlist"""
+        host = (urlsplit(url).hostname or "").lower()
+        return bool(host) and any(
+            host == allowed or (allowed.startswith(".") and (host == allowed[1:] or host.endswith(allowed)))
+            for allowed in self.callback_allowed_hosts
+        )
+
+    def _input_path(self, name: str) -> str:
+        """Resolve a file name inside the job input directory, refusing anything else"""
+        if self.input_dir is None:
+            raise ValueError("File jobs are not enabled on this server")
+        path = os.path.realpath(os.path.join(self.input_dir, name))
+        if os.path.commonpath([path, self.input_dir]) != self.input_dir:
+            raise ValueError("The file must be inside the job input directory")
+        if not os.path.isfile(path):
+            raise ValueError(f"No such input file: {name}")
+        return path
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await self.database.get_job(job_id)
+                if job is not None and job.status in (JobStatus.QUEUED, JobStatus.RUNNING):
+                    job = await self._run(job)
+                if job is not None and job.callback_status == "pending":
+                    await self._deliver_callback(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("❌ Job {} stopped unexpectedly: {}", job_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: JobInfo) -> JobInfo:
+        job = await self.database.update_job(
+            job.job_id,
+            status=JobStatus.RUNNING,
+            started_at=job.started_at or datetime.utcnow()
+        )
+        chunk: List[Dict[str, Any]] = []
+        processed, failed = job.processed, job.failed
+        try:
+            records = await self._records(job, start=processed)
+            while True:
+                batch = list(islice(records, SCORE_BATCH))
+                if not batch:
+                    break
+                results = await self._score(batch)
+                # Without the model, analyze_batch never suspends; let requests in between batches
+                await asyncio.sleep(0)
+                for result in results:
+                    chunk.append(result)
+                    processed += 1
+                    failed += result.get("error") is not None
+                    if len(chunk) >= self.chunk_size:
+                        job = await self.database.update_job(job.job_id, chunk, processed=processed, failed=failed)
+                        chunk = []
+        except Exception as e:
+            logger.error("❌ Job {} failed: {}", job.job_id, e)
+            return await self.database.update_job(
+                job.job_id,
+                chunk,
+                processed=processed,
+                failed=failed,
+                status=JobStatus.FAILED,
+                error=str(e),
+                finished_at=datetime.utcnow()
+            )
+
+        job = await self.database.update_job(
+            job.job_id,
+            chunk,
+            processed=processed,
+            failed=failed,
+            total=processed,
+            status=JobStatus.COMPLETED,
+            finished_at=datetime.utcnow()
+        )
+        logger.info("✅ Job {} completed: {} items, {} failed", job.job_id, processed, failed)
+        return job
+
+    async def _records(self, job: JobInfo, start: int) -> Iterator[JobRecord]:
+        """The job's records, skipping the first `start` ones already done"""
+        if job.file is None:
+            items = await self.database.get_job_items(job.job_id)
+            return (
+                (item.get("id") if item.get("id") is not None else index, item["text"], None)
+                for index, item in enumerate(items[start:], start)
+            )
+        path = self._input_path(job.file)
+        return self._file_records(path, job.text_field, job.id_field, start)
+
+    @staticmethod
+    def _file_records(path: str, text_field: str, id_field: str, start: int) -> Iterator[JobRecord]:
+        """Read JSONL or CSV records lazily; blank lines don't count as records"""
+        with open(path, encoding="utf-8", newline="") as f:
+            if path.lower().endswith(".csv"):
+                rows = ((line_number, row, None) for line_number, row in enumerate(csv.DictReader(f), 2))
+            else:
+                rows = (_parse_json_line(line_number, line) for line_number, line in enumerate(f, 1) if line.strip())
+            for index, (line_number, row, error) in enumerate(rows):
+                if index < start:
+                    continue
+                if error is not None:
+                    yield line_number, None, error
+                    continue
+                text = row.get(text_field)
+                record_id = row.get(id_field, line_number)
+                if not isinstance(text, str) or not text.strip():
+                    yield record_id, None, f"missing or empty '{text_field}'"
+                else:
+                    yield record_id, text, None
+
+    async def _score(self, records: List[JobRecord]) -> List[Dict[str, Any]]:
+        """Score records as one batch; if that fails, text by text to find the culprit"""
+        records = [
+            (record_id, None, f"text is longer than {self.max_text_length} characters")
+            if error is None and len(text) > self.max_text_length else (record_id, text, error)
+            for record_id, text, error in records
+        ]
+        try:
+            verdicts = iter(await self.analyzer.analyze_batch(
+                [text.strip() for _, text, error in records if error is None], JOB_POLICY, offload=True
+            ))
+        except Exception:
+            verdicts = None
+
+        results = []
+        for record_id, text, error in records:
+            if error is not None:
+                results.append({"id": record_id, "error": error})
+                continue
+            try:
+                verdict = next(verdicts) if verdicts is not None else (
+                    await self.analyzer.analyze_batch([text.strip()], JOB_POLICY, offload=True)
+                )[0]
+            except Exception as e:
+                results.append({"id": record_id, "error": f"analysis failed: {e}"})
+                continue
+            results.append({
+                "id": record_id,
+                "toxicity_score": verdict.toxicity_score,
+                "is_toxic": verdict.is_toxic,
+                "category": verdict.category.value,
+                "severity": verdict.severity.value,
+                "sentiment_score": verdict.sentiment_score,
+                "confidence": verdict.confidence,
+            })
+        return results
+
+    async def _deliver_callback(self, job: JobInfo):
+        """POST the job's final status to its callback URL, retrying with backoff"""
+        if not self._callback_allowed(job.callback_url):
+            # Queued before the allowlist changed; redirects aren't followed either
+            logger.warning("⚠️ Not delivering the callback for job {}: host not allowed", job.job_id)
+            await self.database.update_job(job.job_id, callback_status="failed")
+            return
+        payload = job.model_dump(mode="json")
+        last_error = None
+        async with httpx.AsyncClient(timeout=self.callback_timeout_seconds) as client:
+            for attempt in range(self.callback_attempts):
+                if attempt:
+                    await asyncio.sleep(2 ** (attempt - 1))
+                try:
+                    response = await client.post(job.callback_url, json=payload)
+                    if response.status_code < 300:
+                        await self.database.update_job(job.job_id, callback_status="delivered")
+                        return
+                    last_error = f"HTTP {response.status_code}"
+                except httpx.HTTPError as e:
+                    last_error = str(e) or type(e).__name__
+        logger.warning("⚠️ Couldn't deliver the callback for job {}: {}", job.job_id, last_error)
+        await self.database.update_job(job.job_id, callback_status="failed")
+
+
+def _parse_json_line(line_number: int, line: str) -> Tuple[int, Optional[Dict[str, Any]], Optional[str]]:
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return line_number, None, f"unparseable record: {e}"
+    if not isinstance(row, dict):
+        return line_number, None, "record is not an object"
+    return line_number, row, None
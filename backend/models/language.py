@@ -0,0 +1,302 @@
+"""
+Language Identification and Per-Language Rule Sets
+
+Our patterns and VADER only understand English, but plenty of our users
+write in Hindi - in Devanagari, or more often romanized and mixed freely
+with English ("yaar you are such a pagal"). Running every language's
+rules over every text would make each new language slow everyone down,
+so a cheap identification step runs first and each text is checked
+against the default (English) rules plus the rule sets registered for the
+other language(s) it is written in.
+
+Identification works word by word from tables built once at import:
+
+- Devanagari letters mean Hindi, no questions asked.
+- Common words we know are unambiguous vote for their language.
+- Any other word is scored by its character trigrams. Each trigram is
+  stored with only the language it points to most strongly, so scoring
+  costs one lookup per trigram however many languages we support.
+
+Every language holding a fair share of the words is reported, which is
+how code-mixed Hinglish ends up checked against both rule sets. English
+rules run whatever the vote says: an English insult at the end of a
+mostly-Hindi message is still an insult.
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+ENGLISH = "en"
+HINDI = "hi"
+
+# A language must hold this share of a text's words to get its rules run
+# (the default language's rules always run)
+MIN_SHARE = 0.2
+
+# Trigram evidence has to be this strong (in nats) to decide a word
+MIN_MARGIN = 1.0
+
+# Words we've already placed by trigrams, remembered up to this many
+MAX_REMEMBERED_WORDS = 50000
+
+WORD = re.compile(r"[^\W\d_]+")
+DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+
+# Seed vocabularies the lookup tables are built from
+SEED_WORDS = {
+    ENGLISH: """
+        the be to of and a in that have i it for not on with he as you do at this but his by
+        from they we say her she or an will my one all would there their what so up out if
+        about who get which go me when make can like time no just him know take people into
+        year your good some could them see other than then now look only come its over think
+        also back after use two how our work first well way even new want because any these
+        give day most us is are was were am been has had did does don't can't won't i'm you're
+        it's that's really very much too more lol omg please thanks thank love hate idiot
+        stupid shut everyone nobody something nothing always never school friend friends
+        should where why here today tomorrow yesterday right wrong great little thing
+        things many those same another being doing going getting through while
+        before again still life world family home house money game play watch video
+        post comment message reply account someone anyone everything whatever sorry fine
+        happy sad angry funny ugly dumb loser kill die hurt beat destroy careful better
+        """,
+    HINDI: """
+        hai hain ho tha thi the hoon hun hu mera meri mere tera teri tere tum tu aap apna apni
+        apne hum humara hamara yeh ye woh wo kya kyu kyun kyon kaise kaisa kaisi kab kahan
+        kaun nahi nahin mat bhi aur toh ki ka ke ko se pe liye ek bahut bohot bahot
+        accha acha achha theek thik yaar yar bhai behen dost pyaar pyar dil kuch sab abhi
+        kal aaj phir fir karo kar karna karta karti kiya gaya gayi raha rahi rahe hoga hogi
+        chal chalo dekh dekho bol bolo sun suno samajh pata log ghar kaam paisa bakwas bekar
+        ganda gandi pagal chup kamina kamine saala sala kutta kutte harami bewakoof ullu gadha
+        maar maarunga marunga jaan khatam zinda tumhara tumhari tumse tujhe mujhe mujhse
+        unka unki unse inka inki humko tumko sabko kisi koi kuchh jaldi baat baatein batao
+        bata kyunki lekin magar sirf wala wali wale waala jaise waise itna utna kitna zyada
+        thoda sahi galat bura buri badhiya mast shukriya dhanyavad khush dukhi gussa nafrat
+        ghatiya sharam besharam dimaag dimag chod chhod chhodo jao aaja aao arre arey haan
+        ji bas matlab
+        """,
+}
+
+# Words both vocabularies share ("to", "main"...) or that are too short to
+# call are left to their trigrams (and usually to their neighbours)
+_AMBIGUOUS = {"to", "do", "main", "the", "hi", "me", "he", "ha", "na", "a", "i"}
+
+
+def _trigrams(word: str) -> List[str]:
+    padded = f" {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _build_tables(seed_words: Dict[str, str]) -> Tuple[Dict[str, int], Dict[str, Tuple[int, float]], List[str]]:
+    """
+    Words unique to one vocabulary map to that language. Trigrams map to
+    the language they are most likely under, weighted by how much more
+    likely than under the runner-up (add-one smoothed log-odds).
+    """
+    languages = list(seed_words)
+    vocabularies = {code: set(words.split()) for code, words in seed_words.items()}
+
+    words: Dict[str, int] = {}
+    for index, code in enumerate(languages):
+        others = set().union(*(v for c, v in vocabularies.items() if c != code))
+        for word in vocabularies[code] - others - _AMBIGUOUS:
+            words[word] = index
+
+    counts = {code: Counter(t for w in vocabularies[code] for t in _trigrams(w)) for code in languages}
+    vocabulary_size = len(set().union(*counts.values()))
+    trigrams: Dict[str, Tuple[int, float]] = {}
+    for trigram in set().union(*counts.values()):
+        log_probs = [
+            math.log((counts[code][trigram] + 1) / (sum(counts[code].values()) + vocabulary_size))
+            for code in languages
+        ]
+        ranked = sorted(range(len(languages)), key=log_probs.__getitem__, reverse=True)
+        margin = log_probs[ranked[0]] - log_probs[ranked[1]] if len(ranked) > 1 else log_probs[ranked[0]]
+        if margin > 0:
+            trigrams[trigram] = (ranked[0], margin)
+    return words, trigrams, languages
+
+
+class LanguageIdentifier:
+    """Word-level language ID from precomputed word and trigram tables"""
+
+    def __init__(self, seed_words: Dict[str, str] = SEED_WORDS, default: str = ENGLISH):
+        self.words, self.trigrams, self.languages = _build_tables(seed_words)
+        self.default = default
+        self._hindi = self.languages.index(HINDI) if HINDI in self.languages else None
+        self._placed: Dict[str, int] = {}
+
+    def _word_language(self, word: str) -> int:
+        """Index of the language a word is in, or -1 if we can't tell"""
+        language = self.words.get(word)
+        if language is None:
+            language = self._placed.get(word)
+        if language is not None:
+            return language
+        if self._hindi is not None and DEVANAGARI.match(word):
+            return self._hindi
+
+        language = self._score_trigrams(word)
+        if len(self._placed) >= MAX_REMEMBERED_WORDS:
+            self._placed.clear()
+        self._placed[word] = language
+        return language
+
+    def _score_trigrams(self, word: str) -> int:
+        """Sum each trigram's vote; a clear winner places the word"""
+        scores: Dict[int, float] = {}
+        lookup = self.trigrams.get
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            hit = lookup(padded[i:i + 3])
+            if hit is not None:
+                scores[hit[0]] = scores.get(hit[0], 0.0) + hit[1]
+        if not scores:
+            return -1
+        ranked = sorted(scores.values(), reverse=True)
+        if ranked[0] - (ranked[1] if len(ranked) > 1 else 0.0) < MIN_MARGIN:
+            return -1
+        return max(scores, key=scores.__getitem__)
+
+    def detect(self, folded: str) -> Tuple[str, ...]:
+        """
+        Languages holding at least MIN_SHARE of the words we could place,
+        most common first. Expects lowercased text (the normalizer's
+        matching view); falls back to the default language.
+        """
+        votes: Dict[int, int] = {}
+        for word in WORD.findall(folded):
+            if len(word) < 2 and not DEVANAGARI.match(word):
+                continue
+            language = self._word_language(word)
+            if language >= 0:
+                votes[language] = votes.get(language, 0) + 1
+
+        placed = sum(votes.values())
+        if not placed:
+            return (self.default,)
+        ranked = sorted(votes, key=votes.__getitem__, reverse=True)
+        return tuple(self.languages[i] for i in ranked if votes[i] >= MIN_SHARE * placed)
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """The patterns and sentiment model a text is checked with"""
+    languages: Tuple[str, ...]  # What the text is written in, main language first
+    hate_speech: Tuple[re.Pattern, ...]
+    threat: Tuple[re.Pattern, ...]
+    profanity: Tuple[re.Pattern, ...]
+    sentiment: Any  # A VADER-style analyzer with polarity_scores()
+
+
+class LanguageRouter:
+    """
+    Sends each text to the rule sets registered for its languages.
+
+    Every text gets the default rule set's patterns, plus those of each
+    other language it is written in, and the sentiment model of its main
+    language. `languages` on the result still names only the detected
+    languages, so callers can tell a Hindi text that carries the English
+    patterns from an English one. Merged rule sets are built on first use
+    and reused, so routing is one identification plus a dict lookup.
+    """
+
+    def __init__(self, identifier: LanguageIdentifier, default: RuleSet):
+        self.identifier = identifier
+        self.default = default
+        self._rules: Dict[str, RuleSet] = {default.languages[0]: default}
+        self._merged: Dict[Tuple[str, ...], RuleSet] = {}
+
+    def register(self, rules: RuleSet):
+        for language in rules.languages:
+            self._rules[language] = rules
+        self._merged.clear()
+
+    def route(self, folded: str) -> RuleSet:
+        languages = tuple(
+            language for language in self.identifier.detect(folded) if language in self._rules
+        )
+        merged = self._merged.get(languages)
+        if merged is None:
+            merged = self._merged[languages] = self._merge(languages)
+        return merged
+
+    def _merge(self, languages: Tuple[str, ...]) -> RuleSet:
+        sets = []
+        for language in languages:
+            if self._rules[language] not in sets:
+                sets.append(self._rules[language])
+        if self.default not in sets:
+            sets.append(self.default)
+        if len(sets) == 1:
+            return sets[0]
+        return RuleSet(
+            languages=languages,
+            hate_speech=tuple(p for rules in sets for p in rules.hate_speech),
+            threat=tuple(p for rules in sets for p in rules.threat),
+            profanity=tuple(p for rules in sets for p in rules.profanity),
+            sentiment=sets[0].sentiment
+        )
+
+
+# Hindi rules, written for romanized Hinglish and for Devanagari
+# (Devanagari vowel signs aren't word characters to `re`, so no \b there)
+HINDI_HATE_SPEECH_PATTERNS = [
+    r'\b(tumse|tujhse|unse|inse|un\s+logon\s+se)\s+nafrat\b',
+    r'\b(mar\s+ja|mar\s+jao|marr\s+ja|mar\s+kyun\s+nahi\s+jata)\b',
+    r'\b(ye|yeh|woh|wo|saare|sab|aise)\s+log\s+(gande|ganda|kachra|jaahil|jahil|neech)\b',
+    r'(तुमसे|तुझसे|उनसे)\s*नफ़?रत',
+    r'मर\s*जा',
+]
+
+HINDI_THREAT_PATTERNS = [
+    r'\b(maar|mar|maarke)\s*(dunga|dungi|daalunga|dalunga|denge|daalenge)\b',
+    r'\b(dekh\s+lunga|dekh\s+lenge|dekh\s+loonga)\b',
+    r'\b(chhodunga|chodunga|chhodenge)\s+nahi\b',
+    r'मार\s*(दूंगा|डालूंगा|देंगे)',
+    r'देख\s*लूंगा',
+]
+
+HINDI_PROFANITY_PATTERNS = [
+    r'\b(kamina|kamine|kameena|kamini|saala|saali|harami|haramkhor|kutta|kutte|kutiya)\b',
+    r'\b(chutiya|chutiye|chutiyapa|bhosdi\w*|madarchod|behenchod|bc|mc)\b',
+    r'(कमीना|कमीने|हरामी|कुत्ता|कुत्ते|साला|चूतिया)',
+]
+
+# Romanized Hindi words added to VADER's (English) lexicon, on its scale
+HINGLISH_LEXICON = {
+    "accha": 1.5, "acha": 1.5, "achha": 1.5, "badhiya": 2.0, "mast": 1.8, "shukriya": 1.9,
+    "dhanyavad": 1.9, "pyaar": 2.5, "pyar": 2.5, "khush": 2.0, "sundar": 2.0, "sahi": 1.2,
+    "bura": -1.8, "buri": -1.8, "bekar": -1.9, "bakwas": -2.0, "ganda": -1.9, "gandi": -1.9,
+    "gande": -1.9, "pagal": -1.5, "nafrat": -2.7, "dukhi": -2.0, "gussa": -2.0, "ghatiya": -2.3,
+    "bewakoof": -2.0, "ullu": -1.5, "gadha": -1.7, "kamina": -2.5, "kamine": -2.5, "harami": -2.8,
+    "besharam": -2.2, "sharam": -1.2, "galat": -1.3, "jaahil": -2.2, "jahil": -2.2,
+}
+
+
+# Benchmarks: python -m models.language
+if __name__ == "__main__":
+    import time
+
+    identifier = LanguageIdentifier()
+    examples = [
+        "you are such an idiot, nobody likes you",
+        "yaar tum bahut pagal ho, chup karo",
+        "bro ye movie was so bakwas, total waste of time yaar",
+        "तुम बहुत बुरे हो",
+        "thanks for sharing, this is really helpful",
+        "main tujhe dekh lunga kal school mein",
+        "ok",
+    ]
+    for text in examples:
+        print(f"  {identifier.detect(text)!s:<14} {text}")
+
+    texts = [e * 3 for e in examples] * 300
+    started = time.perf_counter()
+    for text in texts:
+        identifier.detect(text)
+    per_text = (time.perf_counter() - started) / len(texts) * 1e6
+    print(f"📊 detect: {per_text:.1f} µs per text (~{sum(map(len, texts)) / len(texts):.0f} chars), "
+          f"{len(identifier.words)} words / {len(identifier.trigrams)} trigrams in the tables")
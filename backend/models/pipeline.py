@@ -0,0 +1,202 @@
+"""
+Stage-Graph Analysis Pipeline
+
+An analysis is a handful of steps - check for floods, clean the text,
+score toxicity, sentiment and patterns, read the conversation, build
+the verdict. Instead of one method calling them in a fixed order, each
+step is a `Stage` that declares which values it reads and which it
+produces, and the pipeline works out the order:
+
+- Stages are grouped into waves: a stage runs in the first wave after
+  everything it reads (or is declared to run `after`) is done.
+- Within a wave, stages marked `offload` go to the worker pool first,
+  async stages are gathered together, and plain stages run on the event
+  loop meanwhile. Only blocking work that releases the GIL (a model
+  forward pass, I/O) is worth offloading; small pure-Python stages cost
+  more to hand to a thread than to just run.
+- `when` makes a stage conditional on the values so far - a skipped
+  stage produces None for each of its outputs.
+- `halts_on` names an output that ends the run early when it is set,
+  so later waves never start.
+
+Every stage is timed, per run and in running totals.
+"""
+
+import asyncio
+import inspect
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One step of the pipeline. `run` is called with its inputs, in order."""
+    name: str
+    run: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    when: Optional[Callable[[Dict[str, Any]], bool]] = None
+    after: Tuple[str, ...] = ()  # Stages to wait for without reading their outputs
+    offload: bool = False
+    halts_on: Optional[str] = None
+
+
+@dataclass
+class StageStats:
+    """Running totals for one stage"""
+    runs: int = 0
+    skipped: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def record(self, elapsed_ms: float):
+        self.runs += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+
+@dataclass
+class PipelineRun:
+    """What one run produced, how long each stage took and who halted it"""
+    values: Dict[str, Any]
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    halted_by: Optional[str] = None
+
+
+def _timed(fn: Callable[..., Any], args: List[Any]) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+async def _timed_async(fn: Callable[..., Any], args: List[Any]) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = await fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+class Pipeline:
+    """
+    A validated graph of stages. Build it once; `run()` it per request.
+    Raises ValueError if a stage reads something nobody provides, two
+    stages produce the same value, or the stages depend on each other
+    in a cycle.
+    """
+
+    def __init__(self, stages: Iterable[Stage], inputs: Iterable[str], executor: Optional[Executor] = None):
+        self.stages = list(stages)
+        self.inputs = tuple(inputs)
+        self.executor = executor
+        self.offloaded_in_flight = 0  # Submitted to the executor and not back yet
+        self.waves = self._plan()
+        self.stats: Dict[str, StageStats] = {stage.name: StageStats() for stage in self.stages}
+        self._is_async = {stage.name: inspect.iscoroutinefunction(stage.run) for stage in self.stages}
+        for stage in self.stages:
+            if stage.offload and self._is_async[stage.name]:
+                raise ValueError(f"Stage '{stage.name}' is async and can't be offloaded to a thread")
+
+    def _plan(self) -> List[List[Stage]]:
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Stage names must be unique")
+
+        producer: Dict[str, str] = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in producer or output in self.inputs:
+                    raise ValueError(f"'{output}' is produced by more than one stage")
+                producer[output] = stage.name
+
+        depends: Dict[str, set] = {}
+        for stage in self.stages:
+            needs = set(stage.after)
+            for name in stage.inputs:
+                if name in producer:
+                    needs.add(producer[name])
+                elif name not in self.inputs:
+                    raise ValueError(f"Stage '{stage.name}' reads '{name}', which nothing provides")
+            unknown = needs - set(names)
+            if unknown:
+                raise ValueError(f"Stage '{stage.name}' runs after unknown stages {sorted(unknown)}")
+            depends[stage.name] = needs
+
+        waves: List[List[Stage]] = []
+        done: set = set()
+        remaining = list(self.stages)
+        while remaining:
+            wave = [stage for stage in remaining if depends[stage.name] <= done]
+            if not wave:
+                raise ValueError(f"Stages depend on each other in a cycle: {[s.name for s in remaining]}")
+            # Hand work to the pool before running anything on the loop
+            waves.append(sorted(wave, key=lambda stage: not stage.offload))
+            done.update(stage.name for stage in wave)
+            remaining = [stage for stage in remaining if stage.name not in done]
+        return waves
+
+    async def run(self, initial: Dict[str, Any]) -> PipelineRun:
+        values = dict(initial)
+        outcome = PipelineRun(values)
+        loop = None
+
+        for wave in self.waves:
+            waiting = []
+            offloaded = 0
+            for stage in wave:
+                if stage.when is not None and not stage.when(values):
+                    for output in stage.outputs:
+                        values[output] = None
+                    self.stats[stage.name].skipped += 1
+                    continue
+                args = [values[name] for name in stage.inputs]
+                if stage.offload and self.executor is not None:
+                    loop = loop or asyncio.get_running_loop()
+                    waiting.append((stage, loop.run_in_executor(self.executor, _timed, stage.run, args)))
+                    offloaded += 1
+                elif self._is_async[stage.name]:
+                    waiting.append((stage, _timed_async(stage.run, args)))
+                else:
+                    started = time.perf_counter()
+                    result = stage.run(*args)
+                    self._finish(stage, result, (time.perf_counter() - started) * 1000, outcome)
+
+            if waiting:
+                self.offloaded_in_flight += offloaded
+                try:
+                    finished = await asyncio.gather(*(pending for _, pending in waiting))
+                finally:
+                    self.offloaded_in_flight -= offloaded
+                for (stage, _), (result, elapsed_ms) in zip(waiting, finished):
+                    self._finish(stage, result, elapsed_ms, outcome)
+
+            for stage in wave:
+                if stage.halts_on is not None and values.get(stage.halts_on) is not None:
+                    outcome.halted_by = stage.name
+                    return outcome
+        return outcome
+
+    def _finish(self, stage: Stage, result: Any, elapsed_ms: float, outcome: PipelineRun):
+        if len(stage.outputs) == 1:
+            outcome.values[stage.outputs[0]] = result
+        elif stage.outputs:
+            outcome.values.update(zip(stage.outputs, result))
+        outcome.timings_ms[stage.name] = elapsed_ms
+        self.stats[stage.name].record(elapsed_ms)
+
+    def describe(self) -> Dict[str, Any]:
+        """The execution plan and per-stage running totals"""
+        return {
+            "waves": [[stage.name for stage in wave] for wave in self.waves],
+            "stages": {
+                name: {
+                    "runs": stats.runs,
+                    "skipped": stats.skipped,
+                    "mean_ms": round(stats.total_ms / stats.runs, 4) if stats.runs else 0.0,
+                    "max_ms": round(stats.max_ms, 4),
+                    "offloaded": stage.offload and self.executor is not None,
+                }
+                for stage, (name, stats) in zip(self.stages, self.stats.items())
+            },
+        }
@@ -0,0 +1,86 @@
+"""
+Per-User Moderation Policies
+
+Users tell us how they want content moderated through their preferences.
+Reading a preferences model and checking categories against a list for
+every single message would be wasteful, so each user's preferences are
+compiled once into a tiny immutable policy - a threshold, a bitmask of
+the categories they filter and which parts of the response they want -
+and kept in a small LRU cache until they change their preferences.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from .schemas import ToxicityCategory, UserPreferences
+
+# One bit per category, so "does this user filter X?" is a single AND
+CATEGORY_BITS = {category: 1 << position for position, category in enumerate(ToxicityCategory)}
+
+
+def category_mask(*categories: ToxicityCategory) -> int:
+    mask = 0
+    for category in categories:
+        mask |= CATEGORY_BITS[category]
+    return mask
+
+
+@dataclass(frozen=True)
+class CompiledPolicy:
+    """Everything analysis needs to know about one user's preferences"""
+    threshold: float
+    categories: int
+    explanations: bool = True
+    suggestions: bool = True
+    support: bool = True
+
+    @classmethod
+    def compile(cls, preferences: UserPreferences) -> "CompiledPolicy":
+        return cls(
+            threshold=preferences.toxicity_threshold,
+            categories=category_mask(*preferences.categories_to_filter),
+            explanations=preferences.show_explanations,
+            suggestions=preferences.educational_mode,
+            support=preferences.wellness_features
+        )
+
+    def filters(self, category: ToxicityCategory) -> bool:
+        return bool(self.categories & CATEGORY_BITS[category])
+
+    def is_toxic(self, score: float, category: ToxicityCategory) -> bool:
+        """Flag content above the threshold in a category the user filters"""
+        return score > self.threshold and self.filters(category)
+
+
+# What everyone gets without saved preferences: flag anything over 0.5
+DEFAULT_POLICY = CompiledPolicy(
+    threshold=0.5,
+    categories=category_mask(*(c for c in ToxicityCategory if c != ToxicityCategory.SAFE))
+)
+
+
+class PolicyCache:
+    """A bounded least-recently-used map from user ID to compiled policy"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CompiledPolicy]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str) -> Optional[CompiledPolicy]:
+        policy = self._entries.get(user_id)
+        if policy is not None:
+            self._entries.move_to_end(user_id)
+        return policy
+
+    def put(self, user_id: str, policy: CompiledPolicy):
+        self._entries[user_id] = policy
+        self._entries.move_to_end(user_id)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
@@ -0,0 +1,94 @@
+"""
+Retention for Stored Analyses
+
+Raw analyses are only useful for so long. After the retention window we
+drop the raw record, but first fold its numbers into coarse per-day
+aggregates so dashboards and stats keep adding up. User reports are
+already served from rollups (see rollups.py), so they are unaffected.
+
+Expiry runs in small time slices with a yield to the event loop in
+between, so even a huge backlog never stalls request handling.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+
+class RetentionManager:
+    """
+    Background job that enforces the retention window on a Database.
+    """
+
+    def __init__(
+        self,
+        database,
+        retention_days: int = 30,
+        slice_ms: float = 5.0,
+        interval_seconds: float = 60.0
+    ):
+        self.database = database
+        self.retention_days = retention_days
+        self.slice_seconds = slice_ms / 1000
+        self.interval_seconds = interval_seconds
+        self.total_expired = 0
+        self.last_run: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start enforcing retention in the background"""
+        if self.retention_days <= 0 or self._task is not None:
+            return  # Keeping everything forever
+        self._task = asyncio.create_task(self._run_periodically())
+
+    def stop(self):
+        """Stop the background job"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run_once(self) -> int:
+        """
+        Expire everything older than the retention window, one small slice
+        at a time. Returns how many raw records were expired.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        expired = 0
+        while True:
+            deadline = time.perf_counter() + self.slice_seconds
+            count, finished = self.database.expire_analyses(cutoff, deadline)
+            expired += count
+            if finished:
+                break
+            # Let waiting requests run before we take another slice
+            await asyncio.sleep(0)
+
+        self.total_expired += expired
+        self.last_run = datetime.utcnow()
+        return expired
+
+    def metrics(self) -> Dict[str, Any]:
+        """Storage size and retention progress, for the metrics endpoint"""
+        return {
+            **self.database.storage_stats(),
+            "retention_days": self.retention_days,
+            "total_expired": self.total_expired,
+            "last_retention_run": self.last_run,
+        }
+
+    async def _run_periodically(self):
+        while True:
+            try:
+                expired = await self.run_once()
+                if expired:
+                    stats = self.database.storage_stats()
+                    logger.info(
+                        "🧹 Expired {} analyses; holding {} records (~{:.1f} MiB)",
+                        expired, stats['records'], stats['approx_bytes'] / 2**20
+                    )
+            except Exception as e:
+                logger.error("⚠️ Error enforcing retention: {}", e)
+            await asyncio.sleep(self.interval_seconds)
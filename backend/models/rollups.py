@@ -0,0 +1,164 @@
+"""
+Per-User Daily Rollups for Nirabhi
+
+User reports summarize a month of someone's digital environment. Instead
+of re-reading every analysis each time a report is requested, we keep a
+tiny running summary per user per day and update it as analyses arrive.
+A report then only needs the last 30 of those rows, however long the
+user's history is.
+
+Old daily rows are periodically compacted into monthly rows, and monthly
+rows past their own retention are dropped, so memory follows the number of
+users, not the age of the service. Compaction works through users in
+deadline-bounded slices so it never holds the event loop for long.
+"""
+
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class DailyRollup:
+    """Running totals for one user over one period (a day, or a month once compacted)"""
+    day: date
+    total: int = 0
+    toxic: int = 0
+    category_counts: Dict[str, int] = field(default_factory=dict)
+    toxicity_sum: float = 0.0
+    sentiment_sum: float = 0.0
+
+    def add(self, category: str, is_toxic: bool, toxicity_score: float, sentiment_score: float):
+        """Fold a single analysis into this rollup"""
+        self.total += 1
+        if is_toxic:
+            self.toxic += 1
+        self.category_counts[category] = self.category_counts.get(category, 0) + 1
+        self.toxicity_sum += toxicity_score
+        self.sentiment_sum += sentiment_score
+
+    def merge(self, other: "DailyRollup"):
+        """Fold another rollup into this one"""
+        self.total += other.total
+        self.toxic += other.toxic
+        for category, count in other.category_counts.items():
+            self.category_counts[category] = self.category_counts.get(category, 0) + count
+        self.toxicity_sum += other.toxicity_sum
+        self.sentiment_sum += other.sentiment_sum
+
+
+class RollupStore:
+    """
+    Daily rollups keyed by user and UTC date, plus monthly rollups for
+    days that have been compacted.
+    """
+
+    def __init__(self):
+        self.daily: Dict[str, Dict[date, DailyRollup]] = {}
+        self.monthly: Dict[str, Dict[date, DailyRollup]] = {}
+        # Users still to visit in the current compaction pass, and where we are
+        self._pass_users: List[str] = []
+        self._pass_position = 0
+
+    def record(
+        self,
+        user_id: str,
+        created_at: datetime,
+        category,
+        is_toxic: bool,
+        toxicity_score: float,
+        sentiment_score: float
+    ):
+        """Update the user's rollup for the day of `created_at` - O(1)"""
+        day = created_at.date()
+        days = self.daily.setdefault(user_id, {})
+        rollup = days.get(day)
+        if rollup is None:
+            rollup = days[day] = DailyRollup(day=day)
+        rollup.add(
+            str(getattr(category, "value", category)),
+            is_toxic,
+            toxicity_score,
+            sentiment_score
+        )
+
+    def recent(self, user_id: str, end: date, days: int = 30) -> List[DailyRollup]:
+        """
+        The user's daily rollups for the `days` days ending on `end`, oldest first.
+        This is at most `days` dictionary lookups, never a scan.
+        """
+        user_days = self.daily.get(user_id)
+        if not user_days:
+            return []
+        rows = []
+        for offset in range(days - 1, -1, -1):
+            rollup = user_days.get(end - timedelta(days=offset))
+            if rollup is not None:
+                rows.append(rollup)
+        return rows
+
+    def compact(
+        self,
+        before: date,
+        deadline: float,
+        drop_months_before: Optional[date] = None
+    ) -> Tuple[int, bool]:
+        """
+        Fold daily rollups older than `before` into monthly rollups, and
+        drop monthly rollups older than `drop_months_before` if given.
+        
+        Works through users one at a time and stops once time.perf_counter()
+        passes `deadline`; the next call picks up where this one stopped.
+        Returns (daily rows compacted, whether the pass finished).
+        """
+        if self._pass_position >= len(self._pass_users):
+            # Start a new pass over everyone who has rows of either kind
+            self._pass_users = list(self.daily.keys() | self.monthly.keys())
+            self._pass_position = 0
+        
+        compacted = 0
+        while self._pass_position < len(self._pass_users):
+            if time.perf_counter() >= deadline:
+                return compacted, False
+            user_id = self._pass_users[self._pass_position]
+            self._pass_position += 1
+            compacted += self._compact_user(user_id, before, drop_months_before)
+        
+        self._pass_users = []
+        self._pass_position = 0
+        return compacted, True
+
+    def _compact_user(self, user_id: str, before: date, drop_months_before: Optional[date]) -> int:
+        """Compact one user's rows, returning how many daily rows were folded"""
+        compacted = 0
+        user_days = self.daily.get(user_id)
+        if user_days:
+            old_days = [day for day in user_days if day < before]
+            if old_days:
+                months = self.monthly.setdefault(user_id, {})
+                for day in old_days:
+                    rollup = user_days.pop(day)
+                    month = day.replace(day=1)
+                    bucket = months.get(month)
+                    if bucket is None:
+                        bucket = months[month] = DailyRollup(day=month)
+                    bucket.merge(rollup)
+                    compacted += 1
+            if not user_days:
+                del self.daily[user_id]
+        
+        months = self.monthly.get(user_id)
+        if months and drop_months_before is not None:
+            for month in [month for month in months if month < drop_months_before]:
+                del months[month]
+            if not months:
+                del self.monthly[user_id]
+        return compacted
+
+    def row_count(self) -> int:
+        """Total number of rollup rows we are holding"""
+        return (
+            sum(len(days) for days in self.daily.values()) +
+            sum(len(months) for months in self.monthly.values())
+        )
@@ -8,7 +8,7 @@ structured, validated, and easy to understand.
 Each model represents a different piece of our content moderation puzzle.
 """
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, HttpUrl, validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -56,6 +56,26 @@ class ContentAnalysisRequest(BaseModel):
         None,
         description="User's personal moderation preferences"
     )
+    thread_id: Optional[str] = Field(
+        None,
+        description="Conversation this message belongs to, for context-aware scoring",
+        max_length=128
+    )
+    user_id: Optional[str] = Field(
+        None,
+        description="Whose saved preferences to apply (and whose reports this counts towards)",
+        max_length=128
+    )
+    community_id: Optional[str] = Field(
+        None,
+        description="Community or tenant this content was posted in, for its health metrics and flood detection",
+        max_length=128
+    )
+    sender_id: Optional[str] = Field(
+        None,
+        description="Who posted the content, so a flood needs several different senders",
+        max_length=128
+    )
     
     @validator('text')
     def text_must_not_be_empty(cls, v):
@@ -135,6 +155,11 @@ class ContentAnalysisResponse(BaseModel):
         None,
         description="How long the analysis took in milliseconds"
     )
+    
+    conversation: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Running signals for the message's conversation (escalation, rolling sentiment...)"
+    )
 
 class UserPreferences(BaseModel):
     """
@@ -258,7 +283,95 @@ class AnalysisHistory(BaseModel):
     analysis_result: ContentAnalysisResponse = Field(..., description="The analysis results")
     feedback: Optional[str] = Field(None, description="User feedback on the analysis")
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    
+
+class AnalysisHistoryPage(BaseModel):
+    """
+    One page of analysis history.
+    Hand `next_cursor` back to us to continue where this page stopped.
+    """
+    items: List[AnalysisHistory] = Field(
+        default_factory=list,
+        description="Matching analyses, newest first"
+    )
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Opaque cursor for the next page (null when there are no more results)"
+    )
+
+class JobStatus(str, Enum):
+    """Where a batch job is in its life"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class JobItem(BaseModel):
+    """One text in a batch job"""
+    id: Optional[str] = Field(None, description="Your ID for this item (defaults to its position)", max_length=128)
+    text: str = Field(..., description="The content to analyze", min_length=1, max_length=10000)
+
+class JobRequest(BaseModel):
+    """
+    A batch too big to score while the caller waits.
+    Send either the items themselves or the name of a file we can read.
+    """
+    items: Optional[List[JobItem]] = Field(None, description="The texts to score")
+    file: Optional[str] = Field(
+        None,
+        description="A JSONL or CSV file in the server's job input directory",
+        max_length=255
+    )
+    text_field: str = Field("text", description="Field holding the text, for file jobs")
+    id_field: str = Field("id", description="Field holding the item ID, for file jobs")
+    callback_url: Optional[HttpUrl] = Field(
+        None,
+        description="We POST the finished job's status here when it completes or fails"
+    )
+
+class JobInfo(BaseModel):
+    """
+    A batch job's status and progress.
+    Poll it until `status` is completed or failed, then page through the results.
+    """
+    job_id: str = Field(..., description="Unique identifier for this job")
+    status: JobStatus = Field(JobStatus.QUEUED, description="Where the job is in its life")
+    file: Optional[str] = Field(None, description="The input file, for file jobs")
+    text_field: str = Field("text", description="Field holding the text, for file jobs")
+    id_field: str = Field("id", description="Field holding the item ID, for file jobs")
+    total: Optional[int] = Field(None, description="How many items there are (file jobs know once done)")
+    processed: int = Field(0, description="Items scored or rejected so far")
+    failed: int = Field(0, description="Items that couldn't be scored")
+    error: Optional[str] = Field(None, description="Why the job failed, if it did")
+    callback_url: Optional[str] = Field(None, description="Where we report completion")
+    callback_status: Optional[str] = Field(None, description="pending, delivered or failed")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = Field(None, description="When a worker picked the job up")
+    finished_at: Optional[datetime] = Field(None, description="When the job completed or failed")
+
+class JobItemResult(BaseModel):
+    """The scores for one item of a batch job, or why it has none"""
+    id: Any = Field(..., description="The item's ID")
+    toxicity_score: Optional[float] = None
+    is_toxic: Optional[bool] = None
+    category: Optional[ToxicityCategory] = None
+    severity: Optional[SeverityLevel] = None
+    sentiment_score: Optional[float] = None
+    confidence: Optional[float] = None
+    error: Optional[str] = Field(None, description="Why this item couldn't be scored")
+
+class JobResultsPage(BaseModel):
+    """
+    One page of a job's results, in input order.
+    Pass `next_offset` back to us to get the next page.
+    """
+    job_id: str = Field(..., description="The job these results belong to")
+    status: JobStatus = Field(..., description="The job's status when this page was read")
+    results: List[JobItemResult] = Field(default_factory=list)
+    next_offset: Optional[int] = Field(
+        None,
+        description="Offset to read from next (null once the job is finished and fully read)"
+    )
+
 class ErrorResponse(BaseModel):
     """
     When things go wrong, we want to communicate clearly and helpfully.
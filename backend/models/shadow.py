@@ -0,0 +1,292 @@
+"""
+Shadow Evaluation
+
+Before a new lexicon, rule set or model goes live we want to see how it
+would have scored real traffic. In shadow mode a sample of /analyze
+requests is scored a second time by a candidate analyzer, after the
+response has gone out, and the two verdicts are compared.
+
+Shadow work must never cost live traffic anything, so it is dropped
+rather than queued:
+
+- Only one shadow analysis runs at a time. A request whose turn comes
+  while another is running is dropped.
+- A CPU budget: shadow scoring earns time at `cpu_budget` seconds per
+  second (a share of one core, with a small burst allowance) and spends
+  what each analysis takes. When the budget is spent, samples are
+  dropped until it refills.
+- A sample that waited longer than `max_delay_ms` to run means the
+  worker is falling behind, so it is dropped too.
+
+Disagreements go to a small bounded store (newest kept); agreement and
+latency are summarized for the metrics endpoint.
+
+A candidate is described by a JSON file:
+
+    {
+        "name": "lexicon-2024-06",
+        "use_model": false,
+        "hate_speech_patterns": ["..."],
+        "threat_patterns": ["..."],
+        "profanity_patterns": ["..."],
+        "lexicon": {"word": -2.5},
+        "lexicon_size": 2000,
+        "thresholds": {"safe_below": 0.25},
+        "cascade_band": [0.2, 0.7]
+    }
+
+Every key but "name" is optional. Pattern lists replace the English
+rules, "lexicon" is layered over VADER's and "lexicon_size" keeps only
+that many of VADER's strongest words. "thresholds" overrides fields of
+ScoringThresholds; "cascade_band" only matters with the model. A model
+candidate's forward pass runs on a worker thread, like the live one's.
+"""
+
+import json
+import random
+import re
+import time
+from collections import ChainMap, Counter, deque
+from dataclasses import fields, replace
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from loguru import logger
+
+from .content_analyzer import (
+    HATE_SPEECH_PATTERNS,
+    PROFANITY_PATTERNS,
+    THREAT_PATTERNS,
+    ContentAnalyzer,
+    DEFAULT_THRESHOLDS
+)
+from .schemas import ToxicityCategory
+from .verdict import CATEGORY_CODES, Verdict
+
+# Only this much of a disagreeing text is kept
+MAX_STORED_TEXT = 280
+
+SPAM_CODE = CATEGORY_CODES[ToxicityCategory.SPAM]
+
+# Spending more than the budget allows happens one analysis at a time;
+# this caps how far ahead an idle stretch lets it get
+BURST_SECONDS = 0.05
+
+
+class CandidateAnalyzer(ContentAnalyzer):
+    """A ContentAnalyzer with rules and lexicon taken from a candidate spec"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.name = spec["name"]
+        # No flood tracking (it only sees a sample) and small caches. Rules
+        # run on the loop, but a model would block it for a whole forward
+        # pass, so a model candidate gets one worker thread (one shadow
+        # analysis runs at a time) to offload it to
+        super().__init__(
+            max_tracked_threads=1000,
+            sentence_cache_size=1000,
+            spam_index_size=0,
+            analysis_workers=1 if spec.get("use_model", False) else 0,
+            use_model=spec.get("use_model", False),
+            thresholds=replace(DEFAULT_THRESHOLDS, **spec.get("thresholds", {})),
+            cascade_band=tuple(spec["cascade_band"]) if spec.get("cascade_band") else None
+        )
+
+    def _compile(self, key: str, default: List[str]) -> List[re.Pattern]:
+        return [re.compile(pattern, re.IGNORECASE) for pattern in self.spec.get(key, default)]
+
+    def _compile_hate_speech_patterns(self) -> List[re.Pattern]:
+        return self._compile("hate_speech_patterns", HATE_SPEECH_PATTERNS)
+
+    def _compile_threat_patterns(self) -> List[re.Pattern]:
+        return self._compile("threat_patterns", THREAT_PATTERNS)
+
+    def _compile_profanity_patterns(self) -> List[re.Pattern]:
+        return self._compile("profanity_patterns", PROFANITY_PATTERNS)
+
+    def _create_sentiment_analyzer(self):
+        analyzer = super()._create_sentiment_analyzer()
+        if self.spec.get("lexicon_size") is not None:
+            strongest = sorted(analyzer.lexicon.items(), key=lambda item: abs(item[1]), reverse=True)
+            analyzer.lexicon = dict(strongest[:self.spec["lexicon_size"]])
+        if self.spec.get("lexicon"):
+            analyzer.lexicon = ChainMap(self.spec["lexicon"], analyzer.lexicon)
+        return analyzer
+
+
+def load_candidate(path: str) -> CandidateAnalyzer:
+    """Build a candidate from its spec file. Raises ValueError if it's unusable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+    except OSError as e:
+        raise ValueError(f"can't read {path}: {e}") from e
+    if not isinstance(spec, dict) or not isinstance(spec.get("name"), str):
+        raise ValueError(f"{path} must be a JSON object with a 'name'")
+    for key in ("hate_speech_patterns", "threat_patterns", "profanity_patterns"):
+        if not isinstance(spec.get(key, []), list):
+            raise ValueError(f"'{key}' must be a list of regular expressions")
+    if not isinstance(spec.get("lexicon", {}), dict):
+        raise ValueError("'lexicon' must map words to valences")
+    unknown = set(spec.get("thresholds", {})) - {field.name for field in fields(DEFAULT_THRESHOLDS)}
+    if unknown:
+        raise ValueError(f"unknown thresholds {sorted(unknown)}")
+    band = spec.get("cascade_band")
+    if band is not None and (not isinstance(band, list) or len(band) != 2):
+        raise ValueError("'cascade_band' must be [low, high]")
+    try:
+        return CandidateAnalyzer(spec)
+    except re.error as e:
+        raise ValueError(f"bad pattern in {path}: {e}") from e
+
+
+class Disagreement(NamedTuple):
+    """One text the live analyzer and the candidate scored differently"""
+    analyzed_at: float
+    text: str
+    live_category: str
+    live_score: float
+    candidate_category: str
+    candidate_score: float
+
+
+def _summarize_ms(samples) -> Dict[str, Optional[float]]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"mean": None, "p50": None, "p99": None}
+    return {
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(ordered[len(ordered) // 2], 3),
+        "p99": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+    }
+
+
+class ShadowEvaluator:
+    """
+    Scores sampled requests with a candidate analyzer off the request path.
+    Call `sample()` per request; if it says yes, run `evaluate()` after
+    the response (as a background task).
+    """
+
+    def __init__(
+        self,
+        candidate: CandidateAnalyzer,
+        sample_rate: float = 0.05,
+        cpu_budget: float = 0.05,
+        max_delay_ms: float = 100,
+        score_tolerance: float = 0.15,
+        max_disagreements: int = 1000,
+        latency_samples: int = 1024
+    ):
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.cpu_budget = cpu_budget
+        self.max_delay_seconds = max_delay_ms / 1000
+        self.score_tolerance = score_tolerance
+        self.disagreements: deque = deque(maxlen=max_disagreements)
+        self.counts: Counter = Counter()
+        self._live_ms: deque = deque(maxlen=latency_samples)
+        self._candidate_ms: deque = deque(maxlen=latency_samples)
+        self._credit = BURST_SECONDS
+        self._credited_at = time.perf_counter()
+        self._running = False
+
+    async def initialize(self):
+        await self.candidate.initialize()
+        logger.info("👥 Shadow evaluation of '{}' on {:.1%} of requests", self.candidate.name, self.sample_rate)
+
+    def sample(self, live: Verdict) -> Optional[float]:
+        """
+        When a request is picked for shadowing, the time it was picked.
+        Flood verdicts are never picked: the candidate doesn't track floods.
+        """
+        if random.random() >= self.sample_rate or live.category_code == SPAM_CODE:
+            return None
+        self.counts["sampled"] += 1
+        return time.perf_counter()
+
+    def _admit(self, sampled_at: float) -> Optional[str]:
+        """Why a sample has to be dropped, or None if it may run"""
+        now = time.perf_counter()
+        self._credit = min(BURST_SECONDS, self._credit + (now - self._credited_at) * self.cpu_budget)
+        self._credited_at = now
+        if self._running:
+            return "busy"
+        if now - sampled_at > self.max_delay_seconds:
+            return "behind"
+        if self._credit <= 0:
+            return "budget"
+        return None
+
+    async def evaluate(self, live: Verdict, sampled_at: float, **request):
+        """Score the text again with the candidate and compare. Never raises."""
+        reason = self._admit(sampled_at)
+        if reason is not None:
+            self.counts[f"dropped_{reason}"] += 1
+            return
+
+        self._running = True
+        started = time.perf_counter()
+        try:
+            shadow = await self.candidate.analyze_text(live.text, **request)
+        except Exception as e:
+            self.counts["errors"] += 1
+            logger.warning("⚠️ Shadow analysis failed: {}", e)
+            return
+        finally:
+            elapsed = time.perf_counter() - started
+            self._credit -= elapsed
+            self._running = False
+
+        self.counts["evaluated"] += 1
+        self._live_ms.append(live.processing_time_ms)
+        self._candidate_ms.append(elapsed * 1000)
+        if (
+            shadow.is_toxic == live.is_toxic
+            and shadow.category_code == live.category_code
+            and abs(shadow.toxicity_score - live.toxicity_score) <= self.score_tolerance
+        ):
+            self.counts["agreed"] += 1
+            return
+
+        self.counts["disagreed"] += 1
+        self.disagreements.append(Disagreement(
+            analyzed_at=live.analyzed_at,
+            text=live.text[:MAX_STORED_TEXT],
+            live_category=live.category.value,
+            live_score=live.toxicity_score,
+            candidate_category=shadow.category.value,
+            candidate_score=shadow.toxicity_score
+        ))
+        logger.bind(
+            event="shadow.disagreement",
+            live_category=live.category.value,
+            candidate_category=shadow.category.value,
+            score_delta=round(shadow.toxicity_score - live.toxicity_score, 4)
+        ).debug("👥 Shadow verdict disagrees")
+
+    def summary(self) -> Dict[str, Any]:
+        """Agreement, drops and latency so far, for the metrics endpoint"""
+        evaluated = self.counts["evaluated"]
+        return {
+            "candidate": self.candidate.name,
+            "sample_rate": self.sample_rate,
+            "cpu_budget": self.cpu_budget,
+            "sampled": self.counts["sampled"],
+            "evaluated": evaluated,
+            "dropped": {
+                reason: self.counts[f"dropped_{reason}"] for reason in ("busy", "behind", "budget")
+            },
+            "errors": self.counts["errors"],
+            "agreement_rate": round(self.counts["agreed"] / evaluated, 4) if evaluated else None,
+            "disagreements": self.counts["disagreed"],
+            "latency_ms": {
+                "live": _summarize_ms(self._live_ms),
+                "candidate": _summarize_ms(self._candidate_ms),
+            },
+        }
+
+    def recent_disagreements(self, limit: int) -> List[Dict[str, Any]]:
+        """The newest disagreements first"""
+        newest = list(self.disagreements)[-limit:]
+        return [entry._asdict() for entry in reversed(newest)]
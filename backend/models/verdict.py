@@ -0,0 +1,170 @@
+"""
+Compact Analysis Results
+
+Every analysis used to become a fully validated `ContentAnalysisResponse`
+straight away. Storing it called `.dict()` on it, reading it back
+validated it again, and FastAPI validated it once more on the way out -
+three rounds of checking numbers we had just computed ourselves.
+
+Inside the service a result is now a `Verdict`: an immutable named
+tuple with the category and severity kept as small integer codes. The
+analyzer builds it, the spam cache reuses it and storage keeps it as it
+is. Only at the API edge is it turned into the Pydantic model, with
+`model_construct` (no validation), and into JSON.
+"""
+
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .schemas import ContentAnalysisResponse, SeverityLevel, ToxicityCategory
+
+# Codes are positions in these tuples (the same order policy bits use)
+CATEGORIES: Tuple[ToxicityCategory, ...] = tuple(ToxicityCategory)
+SEVERITIES: Tuple[SeverityLevel, ...] = tuple(SeverityLevel)
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+SEVERITY_CODES = {severity: code for code, severity in enumerate(SEVERITIES)}
+
+
+class Verdict(NamedTuple):
+    """One analysis result, as the analyzer, caches and storage pass it around"""
+    text: str
+    toxicity_score: float
+    is_toxic: bool
+    category_code: int
+    severity_code: int
+    sentiment_score: float
+    confidence: float
+    explanation: str
+    suggestions: Tuple[str, ...]
+    support_resources: Optional[List[Dict[str, str]]]  # The analyzer's shared list, never copied
+    analyzed_at: float  # time.time()
+    processing_time_ms: float
+    conversation: Optional[Dict[str, Any]] = None
+
+    @property
+    def category(self) -> ToxicityCategory:
+        return CATEGORIES[self.category_code]
+
+    @property
+    def severity(self) -> SeverityLevel:
+        return SEVERITIES[self.severity_code]
+
+    @property
+    def analysis_timestamp(self) -> datetime:
+        return datetime.utcfromtimestamp(self.analyzed_at)
+
+    def to_response(self) -> ContentAnalysisResponse:
+        """The API model, built without re-validating values we produced ourselves"""
+        return ContentAnalysisResponse.model_construct(
+            text=self.text,
+            toxicity_score=self.toxicity_score,
+            is_toxic=self.is_toxic,
+            category=self.category,
+            severity=self.severity,
+            sentiment_score=self.sentiment_score,
+            confidence=self.confidence,
+            explanation=self.explanation,
+            suggestions=list(self.suggestions),
+            support_resources=self.support_resources,
+            analysis_timestamp=self.analysis_timestamp,
+            processing_time_ms=self.processing_time_ms,
+            conversation=self.conversation
+        )
+
+    def to_json(self) -> str:
+        """Exactly the JSON `ContentAnalysisResponse` would give"""
+        return self.to_response().model_dump_json()
+
+
+# Benchmarks: python -m models.verdict
+if __name__ == "__main__":
+    import asyncio
+    import json
+    import tracemalloc
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    from .content_analyzer import SUPPORT_RESOURCES
+
+    fields = dict(
+        text="You are such an idiot, nobody wants you here. Just leave already!",
+        toxicity_score=0.82,
+        is_toxic=True,
+        sentiment_score=-0.71,
+        confidence=0.9,
+        explanation="This content contains language that could be perceived as bullying, "
+                    "which can have serious emotional impact on others.",
+        support_resources=SUPPORT_RESOURCES,
+        processing_time_ms=0.41,
+        conversation=None,
+    )
+    suggestions = [
+        "Try focusing on the behavior or situation rather than the person",
+        "Consider how your words might affect someone's self-esteem",
+        "Think about whether this message helps resolve the situation",
+    ]
+    response_field = create_response_field(name="Response_analyze", type_=ContentAnalysisResponse)
+
+    async def pydantic_path() -> Tuple[Any, str]:
+        """Build validated, store .dict(), read back validated, FastAPI serializes"""
+        response = ContentAnalysisResponse(
+            category=ToxicityCategory.CYBERBULLYING, severity=SeverityLevel.HIGH,
+            suggestions=suggestions, analysis_timestamp=datetime.utcnow(), **fields
+        )
+        stored = response.model_dump()
+        ContentAnalysisResponse(**stored)
+        content = await serialize_response(field=response_field, response_content=response)
+        return stored, JSONResponse(content).body.decode()
+
+    async def verdict_path() -> Tuple[Any, str]:
+        """Build the tuple, store it as is, serialize once at the edge"""
+        verdict = Verdict(
+            category_code=CATEGORY_CODES[ToxicityCategory.CYBERBULLYING],
+            severity_code=SEVERITY_CODES[SeverityLevel.HIGH],
+            suggestions=tuple(suggestions), analyzed_at=time.time(), **fields
+        )
+        verdict.to_response()  # Reading it back for history
+        return verdict, verdict.to_json()
+
+    async def measure(path, rounds: int = 20000):
+        for _ in range(1000):
+            await path()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await path()
+        per_request_us = (time.perf_counter() - started) / rounds * 1e6
+
+        tracemalloc.start()
+        transient = 0
+        for _ in range(200):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            await path()
+            transient += tracemalloc.get_traced_memory()[1] - current
+
+        kept = []
+        baseline = tracemalloc.take_snapshot()
+        for _ in range(1000):
+            kept.append((await path())[0])
+        retained = tracemalloc.take_snapshot().compare_to(baseline, "filename")
+        tracemalloc.stop()
+        retained_bytes = sum(stat.size_diff for stat in retained) / len(kept)
+        allocations = sum(stat.count_diff for stat in retained) / len(kept)
+        return per_request_us, transient / 200, retained_bytes, allocations
+
+    async def main():
+        old = json.loads((await pydantic_path())[1])
+        new = json.loads((await verdict_path())[1])
+        same = {k: v for k, v in old.items() if k != "analysis_timestamp"} == {
+            k: v for k, v in new.items() if k != "analysis_timestamp"
+        }
+        print(f"📊 per analysis (build, store, read back, serialize), same JSON: {same}")
+        for label, path in (("validated model", pydantic_path), ("verdict tuple", verdict_path)):
+            per_request_us, peak_bytes, retained_bytes, allocations = await measure(path)
+            print(f"  {label:<16} {per_request_us:6.1f} µs   peak {peak_bytes / 1024:5.1f} KiB   "
+                  f"stored result keeps {retained_bytes:5.0f} bytes in {allocations:4.1f} blocks")
+
+    asyncio.run(main())
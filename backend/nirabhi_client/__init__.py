@@ -0,0 +1,15 @@
+# Python client for the Nirabhi API - see client.py
+from .cache import VerdictCache
+from .client import AsyncNirabhiClient, NirabhiClient
+from .results import AnalysisResult, APIError, NirabhiError
+from .retry import RetryPolicy
+
+__all__ = [
+    "AnalysisResult",
+    "APIError",
+    "AsyncNirabhiClient",
+    "NirabhiClient",
+    "NirabhiError",
+    "RetryPolicy",
+    "VerdictCache",
+]
@@ -0,0 +1,63 @@
+"""
+Checks and benchmarks against the app in-process: python -m nirabhi_client
+
+Runs from the backend directory, where `main` can be imported.
+"""
+
+import asyncio
+import time
+from typing import List
+
+import httpx
+
+import main
+
+from .client import AsyncNirabhiClient
+from .results import AnalysisResult, APIError
+
+TEXTS = [
+    "You are such an idiot, nobody wants you here. Just leave already!",
+    "Thanks so much for the help yesterday, it made my week",
+    "I'm going to hurt you if you show up again",
+    "this is a damn crap idea",
+]
+
+
+async def timed(client: AsyncNirabhiClient, texts: List[str]) -> float:
+    started = time.perf_counter()
+    await client.analyze_many(texts)
+    return (time.perf_counter() - started) / len(texts) * 1e6
+
+
+async def check():
+    await main.app.router.startup()
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as plain:
+            expected = [(await plain.post("/analyze", json={"text": text})).json() for text in TEXTS]
+
+        async with AsyncNirabhiClient("http://app", transport=transport, cache_size=100) as client:
+            results = await client.analyze_many(TEXTS)
+            same = all(
+                (result.toxicity_score, result.category, result.severity, result.confidence)
+                == (want["toxicity_score"], want["category"], want["severity"], want["confidence"])
+                for result, want in zip(results, expected)
+            )
+            print(f"📊 batched verdicts match /analyze: {same} ({client.counts['batches']} batch)")
+
+            failures = await client.analyze_many(["fine", "x" * 20000], return_exceptions=True)
+            print(f"  a bad item fails alone: {isinstance(failures[0], AnalysisResult) and isinstance(failures[1], APIError)}")
+
+            await client.analyze(TEXTS[0])
+            print(f"  repeated text served from the cache: {client.cache.hits == 1}")
+
+        texts = [f"{TEXTS[i % len(TEXTS)]} #{i}" for i in range(2000)]
+        for label, window in (("one request per call", 0), ("batched", 5)):
+            async with AsyncNirabhiClient("http://app", transport=transport, batch_window_ms=window) as client:
+                await timed(client, texts[:200])
+                print(f"  {label:<22} {await timed(client, texts):7.1f} µs per call, 2,000 concurrent calls")
+    finally:
+        await main.app.router.shutdown()
+
+
+asyncio.run(check())
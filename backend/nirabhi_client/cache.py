@@ -0,0 +1,43 @@
+"""
+A small local cache of recent verdicts
+"""
+
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from .results import AnalysisResult
+
+
+class VerdictCache:
+    """
+    Least-recently-used verdicts, each good for `ttl_seconds`. Hits never
+    reach the server, so they aren't stored there or counted in reports.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, AnalysisResult]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[AnalysisResult]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, result: AnalysisResult):
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,319 @@
+"""
+Nirabhi Client - Talking to the Moderation API
+
+Every service that calls /analyze used to write its own httpx code, each
+opening connections its own way and sending one request per text. This
+client does it once, properly:
+
+- One pooled set of HTTP/1.1 keep-alive connections per client, so calls
+  reuse warm connections instead of paying for a new one each time.
+- Calls made at about the same time are combined: they wait up to
+  `batch_window_ms` for company and go out together as one
+  /analyze/stream request, each caller getting its own verdict back. A
+  call that is alone in its window goes to /analyze as usual, having
+  paid up to `batch_window_ms` of extra latency for the chance. Calls with
+  a `context`, `user_id` or `user_preferences` always go to /analyze,
+  since the stream endpoint doesn't take them.
+- Requests refused with 429 or 503, or that couldn't connect at all, are
+  retried with jittered backoff, waiting as long as Retry-After asks.
+  Anything else is not retried: the server may already have stored it.
+- Optionally, a local LRU of recent verdicts answers repeated texts
+  without a round trip (only for calls without thread or context).
+
+`AsyncNirabhiClient` is the asyncio API. `NirabhiClient` is the blocking
+one: it runs an async client on a private event loop thread, so calls
+from many threads are batched together too.
+"""
+
+import asyncio
+import json
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from .cache import VerdictCache
+from .results import AnalysisResult, APIError, NirabhiError
+from .retry import RETRY_STATUSES, RetryPolicy, parse_retry_after
+
+# Failures where the request never reached the server, so trying again is safe
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# (text, thread_id, the caller's future)
+PendingCall = Tuple[str, Optional[str], asyncio.Future]
+
+
+class AsyncNirabhiClient:
+    """
+    The asyncio client. Use it as `async with AsyncNirabhiClient(...)`
+    or call `aclose()` when done, so queued calls are sent and pooled
+    connections closed.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        batch_window_ms: float = 5.0,
+        max_batch_size: int = 64,
+        retry: Optional[RetryPolicy] = None,
+        cache_size: int = 0,
+        cache_ttl_seconds: float = 60.0,
+        headers: Optional[Dict[str, str]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        `batch_window_ms` 0 sends every call on its own. `max_batch_size`
+        should stay at or below the server's STREAM_MAX_IN_FLIGHT.
+        `cache_size` 0 turns the verdict cache off. A `transport` replaces
+        the network, e.g. `httpx.ASGITransport(app)` to run in-process.
+        """
+        self.base_url = base_url
+        self.batch_window_seconds = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.retry = retry or RetryPolicy()
+        self.cache = VerdictCache(cache_size, cache_ttl_seconds) if cache_size > 0 else None
+        self.counts: Counter = Counter()
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            headers=headers,
+            transport=transport
+        )
+        self._pending: List[PendingCall] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> "AsyncNirabhiClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Send whatever is still waiting for company, then close the connections"""
+        self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        await self._http.aclose()
+
+    async def analyze(
+        self,
+        text: str,
+        thread_id: Optional[str] = None,
+        context: Optional[str] = None,
+        user_id: Optional[str] = None,
+        user_preferences: Optional[Dict[str, Any]] = None
+    ) -> AnalysisResult:
+        """Analyze one text. Raises APIError if the server rejects it, NirabhiError if it can't be reached."""
+        cache_key = (text, user_id)
+        cacheable = self.cache is not None and thread_id is None and context is None and user_preferences is None
+        if cacheable:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if self.batch_window_seconds > 0 and context is None and user_id is None and user_preferences is None:
+            result = await self._queue(text, thread_id)
+        else:
+            result = await self._analyze_one({
+                key: value for key, value in (
+                    ("text", text),
+                    ("thread_id", thread_id),
+                    ("context", context),
+                    ("user_id", user_id),
+                    ("user_preferences", user_preferences),
+                ) if value is not None
+            })
+
+        if cacheable:
+            self.cache.put(cache_key, result)
+        return result
+
+    async def analyze_many(self, texts: List[str], return_exceptions: bool = False, **options) -> List[Any]:
+        """Analyze several texts concurrently (so they batch), results in input order"""
+        return await asyncio.gather(
+            *(self.analyze(text, **options) for text in texts),
+            return_exceptions=return_exceptions
+        )
+
+    async def _analyze_one(self, payload: Dict[str, Any]) -> AnalysisResult:
+        self.counts["single_requests"] += 1
+        response = await self._send("POST", "/analyze", json=payload)
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        return AnalysisResult.from_json(response.json())
+
+    def _queue(self, text: str, thread_id: Optional[str]) -> asyncio.Future:
+        """Wait for the current batch window; the future resolves to this call's verdict"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, thread_id, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(self.batch_window_seconds, self._flush)
+        return future
+
+    def _flush(self):
+        """Send the calls gathered so far"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        calls = [call for call in self._pending if not call[2].done()]  # Callers may have given up
+        self._pending = []
+        if not calls:
+            return
+        if len(calls) == 1:
+            text, thread_id, future = calls[0]
+            payload = {"text": text} if thread_id is None else {"text": text, "thread_id": thread_id}
+            task = asyncio.create_task(self._resolve_one(payload, future))
+        else:
+            task = asyncio.create_task(self._send_batch(calls))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _resolve_one(self, payload: Dict[str, Any], future: asyncio.Future):
+        try:
+            result = await self._analyze_one(payload)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def _send_batch(self, calls: List[PendingCall]):
+        """One /analyze/stream request for the batch; verdicts are handed out as they arrive"""
+        self.counts["batches"] += 1
+        self.counts["batched_calls"] += len(calls)
+        body = "".join(
+            json.dumps({"text": text} if thread_id is None else {"text": text, "thread_id": thread_id}) + "\n"
+            for text, thread_id, _ in calls
+        )
+        try:
+            response = await self._send(
+                "POST",
+                "/analyze/stream",
+                content=body.encode("utf-8"),
+                headers={"Content-Type": "application/x-ndjson"}
+            )
+            try:
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    future = calls[item["index"]][2]
+                    if future.done():
+                        continue
+                    if "result" in item:
+                        future.set_result(AnalysisResult.from_json(item["result"]))
+                    else:
+                        future.set_exception(APIError(None, item.get("error")))
+            finally:
+                await response.aclose()
+            error: Exception = NirabhiError("the server ended the batch without answering this item")
+        except Exception as e:
+            error = e if isinstance(e, NirabhiError) else NirabhiError(f"batch request failed: {e}")
+        for _, _, future in calls:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Send with retries. Returns a successful response unread (the caller
+        closes it); raises APIError or NirabhiError otherwise.
+        """
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = await self._http.send(self._http.build_request(method, path, **kwargs), stream=True)
+            except CONNECT_ERRORS as e:
+                failure: Exception = NirabhiError(f"couldn't reach {self.base_url}: {e}")
+            except httpx.HTTPError as e:
+                raise NirabhiError(f"{method} {path} failed: {e}") from e
+            else:
+                if response.status_code < 400:
+                    return response
+                await response.aread()
+                await response.aclose()
+                failure = APIError(response.status_code, _error_detail(response))
+                if response.status_code not in RETRY_STATUSES:
+                    raise failure
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+            delay = self.retry.delay(attempt, retry_after)
+            if delay is None:
+                raise failure
+            self.counts["retries"] += 1
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def _error_detail(response: httpx.Response) -> Any:
+    try:
+        return response.json().get("detail", response.text)
+    except (ValueError, AttributeError):
+        return response.text
+
+
+class NirabhiClient:
+    """
+    The blocking client. It owns an AsyncNirabhiClient running on a
+    private event loop thread, so it is safe to share between threads and
+    their concurrent calls are batched together. Close it when done (or
+    use it as a context manager).
+    """
+
+    def __init__(self, base_url: str = "http://localhost:8000", **options):
+        """Takes the same options as AsyncNirabhiClient"""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="nirabhi-client", daemon=True)
+        self._thread.start()
+        self._client = AsyncNirabhiClient(base_url, **options)
+
+    def __enter__(self) -> "NirabhiClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def counts(self) -> Counter:
+        return self._client.counts
+
+    @property
+    def cache(self) -> Optional[VerdictCache]:
+        return self._client.cache
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def analyze(self, text: str, **options) -> AnalysisResult:
+        """See AsyncNirabhiClient.analyze"""
+        return self._run(self._client.analyze(text, **options))
+
+    def analyze_many(self, texts: List[str], return_exceptions: bool = False, **options) -> List[Any]:
+        """See AsyncNirabhiClient.analyze_many"""
+        return self._run(self._client.analyze_many(texts, return_exceptions=return_exceptions, **options))
+
+    def close(self):
+        """Send what's queued, close the connections and stop the loop thread"""
+        if self._loop.is_closed():
+            return
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
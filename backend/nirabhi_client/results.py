@@ -0,0 +1,43 @@
+"""
+What the client hands back: analysis results and errors
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+class AnalysisResult(NamedTuple):
+    """One verdict, with the fields of the API's ContentAnalysisResponse"""
+    text: str
+    toxicity_score: float
+    is_toxic: bool
+    category: str
+    severity: str
+    sentiment_score: float
+    confidence: float
+    explanation: str
+    suggestions: List[str]
+    support_resources: Optional[List[Dict[str, str]]]
+    analysis_timestamp: str
+    processing_time_ms: float
+    conversation: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "AnalysisResult":
+        """Build from response JSON, ignoring fields newer servers may add"""
+        return cls(**{field: data.get(field) for field in cls._fields})
+
+
+class NirabhiError(Exception):
+    """Anything that stopped a call from returning a verdict"""
+
+
+class APIError(NirabhiError):
+    """
+    The server answered with an error. `status_code` is None when the
+    error came back for one item of a batched request.
+    """
+
+    def __init__(self, status_code: Optional[int], detail: Any):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(f"HTTP {status_code}: {detail}" if status_code is not None else str(detail))
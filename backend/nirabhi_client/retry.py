@@ -0,0 +1,53 @@
+"""
+When and how long to wait before trying a request again
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Statuses that mean the request wasn't handled and is worth repeating:
+# rate limited, or a server/pod that isn't ready
+RETRY_STATUSES = frozenset({429, 503})
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, so clients that failed together
+    don't come back together. A server's Retry-After is honored (plus a
+    little jitter) unless it asks for more than `max_retry_after_seconds`,
+    in which case we give up instead.
+    """
+    attempts: int = 3  # Tries in total, the first one included
+    backoff_seconds: float = 0.1
+    max_backoff_seconds: float = 5.0
+    max_retry_after_seconds: float = 30.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Seconds to wait after failed try number `attempt` (from 0), or None to give up"""
+        if attempt + 1 >= self.attempts:
+            return None
+        if retry_after is not None:
+            if retry_after > self.max_retry_after_seconds:
+                return None
+            return retry_after + random.uniform(0, self.backoff_seconds)
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """A Retry-After header (seconds or an HTTP date) in seconds from now"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1 @@
+# Backend tests - run with `pytest tests/ -v` from backend/
@@ -0,0 +1,116 @@
+"""
+Vectorized batch scoring gives exactly the verdicts the scalar rules give
+"""
+
+import asyncio
+import itertools
+import random
+
+import pytest
+
+from models.batch_scoring import NUMPY_AVAILABLE, flag_toxic, gather_signals, score_batch
+from models.content_analyzer import DEFAULT_THRESHOLDS, ContentAnalyzer
+from models.policy import DEFAULT_POLICY
+from models.verdict import CATEGORY_CODES, SEVERITY_CODES
+
+pytestmark = pytest.mark.skipif(not NUMPY_AVAILABLE, reason="batch scoring needs NumPy")
+
+TOXICITY_KEYS = ('toxicity', 'severe_toxicity', 'obscene', 'threat', 'insult')
+PATTERN_KEYS = ('has_hate_speech', 'has_threats', 'has_profanity', 'excessive_caps', 'excessive_punctuation')
+
+# Signals sitting exactly on a cutoff are where a vectorized rule is most
+# likely to differ from the scalar one
+EDGES = [0.0, 0.1, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 1.0]
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return ContentAnalyzer(spam_index_size=0, analysis_workers=0, use_model=False)
+
+
+def random_signals(rng: random.Random):
+    def value(low: float = 0.0) -> float:
+        if rng.random() < 0.4:
+            return rng.choice([edge for edge in EDGES if edge >= low] + [-edge for edge in EDGES if low < 0])
+        return rng.uniform(low, 1.0)
+
+    toxicity = {key: value() for key in TOXICITY_KEYS if rng.random() < 0.9}  # Labels can be missing
+    sentiment = {'compound': value(-1.0)}
+    patterns = {key: rng.random() < 0.3 for key in PATTERN_KEYS}
+    return toxicity, sentiment, patterns
+
+
+def edge_signals():
+    """Every toxicity edge against every sentiment edge, with no patterns, all patterns and each one alone"""
+    pattern_sets = [{}, {key: True for key in PATTERN_KEYS}] + [{key: True} for key in PATTERN_KEYS]
+    for edge, compound, patterns in itertools.product(EDGES, [-1.0, -0.5, 0.0, 0.5], pattern_sets):
+        yield {}, {'compound': compound}, patterns
+        yield {key: edge for key in TOXICITY_KEYS}, {'compound': compound}, patterns
+        yield {'toxicity': edge, 'threat': edge}, {'compound': -edge}, patterns
+
+
+def scalar(analyzer, toxicity, sentiment, patterns):
+    score = analyzer._combine_analysis_scores(toxicity, sentiment, patterns)
+    category = analyzer._determine_category(toxicity, patterns, score)
+    return (
+        score,
+        CATEGORY_CODES[category],
+        SEVERITY_CODES[analyzer._determine_severity(score, category)],
+        analyzer._calculate_confidence(toxicity, patterns),
+        DEFAULT_POLICY.is_toxic(score, category)
+    )
+
+
+def vectorized(batch):
+    scores = score_batch(gather_signals(*(list(column) for column in zip(*batch))), DEFAULT_THRESHOLDS)
+    toxic = flag_toxic(scores, DEFAULT_POLICY)
+    return [
+        (score, category, severity, confidence, is_toxic)
+        for score, category, severity, confidence, is_toxic in zip(
+            scores.toxicity_score.tolist(),
+            scores.category_code.tolist(),
+            scores.severity_code.tolist(),
+            scores.confidence.tolist(),
+            toxic.tolist()
+        )
+    ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_signals_match_the_scalar_rules(analyzer, seed):
+    rng = random.Random(seed)
+    batch = [random_signals(rng) for _ in range(2000)]
+    assert vectorized(batch) == [scalar(analyzer, *signals) for signals in batch]
+
+
+def test_edge_case_signals_match_the_scalar_rules(analyzer):
+    batch = list(edge_signals())
+    assert vectorized(batch) == [scalar(analyzer, *signals) for signals in batch]
+
+
+def test_analyze_batch_gives_the_verdicts_of_analyze_text(analyzer):
+    texts = [
+        "have a lovely day, everyone!",
+        "you are such an idiot, nobody likes you",
+        "I will kill you",
+        "STOP BEING SO DAMN STUPID!!!",
+        "all those people are trash",
+        "yaar tum bahut pagal ho, chup karo",
+        "main tujhe dekh lunga kal school mein",
+        "ok",
+    ]
+
+    async def both():
+        batch = await analyzer.analyze_batch(texts)
+        single = [await analyzer.analyze_text(text) for text in texts]
+        return batch, single
+
+    batch, single = asyncio.run(both())
+    for from_batch, from_text in zip(batch, single):
+        assert (
+            from_batch.toxicity_score, from_batch.category, from_batch.severity,
+            from_batch.confidence, from_batch.is_toxic
+        ) == (
+            from_text.toxicity_score, from_text.category, from_text.severity,
+            from_text.confidence, from_text.is_toxic
+        ), from_text.text
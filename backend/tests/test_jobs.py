@@ -0,0 +1,112 @@
+"""
+Batch jobs: scoring stays off the live flood index, callbacks only reach allowed hosts
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from models.content_analyzer import ContentAnalyzer
+from models.database import Database
+from models.jobs import JobRunner
+from models.schemas import JobRequest, JobStatus
+
+
+@pytest.fixture
+def callback_server():
+    """A stub HTTP server on localhost that records the JSON bodies POSTed to it"""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append(json.loads(body))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/done", received
+    server.shutdown()
+    server.server_close()
+
+
+def run_job(request: JobRequest, allowed_hosts, analyzer=None):
+    """Submit one job, wait for it (and its callback) to finish, return its final state"""
+    async def scenario():
+        database = Database(jobs_journal_path=None)
+        await database.connect()
+        runner = JobRunner(
+            database,
+            analyzer or ContentAnalyzer(analysis_workers=0, use_model=False),
+            workers=1,
+            chunk_size=2,
+            callback_timeout_seconds=5,
+            callback_attempts=1,
+            callback_allowed_hosts=allowed_hosts
+        )
+        await runner.start()
+        try:
+            job = await runner.submit(request)
+            await asyncio.wait_for(runner._queue.join(), timeout=30)
+            return await database.get_job(job.job_id), await database.get_job_results(job.job_id, 0, 100)
+        finally:
+            runner.stop()
+            await database.disconnect()
+
+    return asyncio.run(scenario())
+
+
+def test_callback_is_delivered_to_an_allowed_host(callback_server):
+    url, received = callback_server
+    job, _ = run_job(
+        JobRequest(items=[{"text": "have a lovely day"}, {"text": "you are an idiot"}], callback_url=url),
+        allowed_hosts=["127.0.0.1"]
+    )
+
+    assert job.status == JobStatus.COMPLETED
+    assert job.callback_status == "delivered"
+    assert len(received) == 1
+    assert received[0]["job_id"] == job.job_id
+    assert received[0]["status"] == "completed"
+    assert received[0]["processed"] == 2
+
+
+def test_callback_to_a_host_off_the_allowlist_is_refused(callback_server):
+    url, received = callback_server
+    with pytest.raises(ValueError):
+        run_job(JobRequest(items=[{"text": "hello"}], callback_url=url), allowed_hosts=[".example.com"])
+    with pytest.raises(ValueError):
+        run_job(JobRequest(items=[{"text": "hello"}], callback_url=url), allowed_hosts=[])
+    assert received == []
+
+
+@pytest.mark.parametrize("url, allowed", [
+    ("https://example.com/hook", True),
+    ("https://hooks.example.com/hook", True),
+    ("https://a.b.example.com:8443/hook", True),
+    ("https://EXAMPLE.com/hook", True),
+    ("https://notexample.com/hook", False),
+    ("https://example.com.evil.net/hook", False),
+    ("http://169.254.169.254/latest", False),
+])
+def test_dot_domain_allows_the_domain_and_its_subdomains(url, allowed):
+    runner = JobRunner(Database(jobs_journal_path=None), None, callback_allowed_hosts=[".example.com"])
+    assert runner._callback_allowed(url) is allowed
+
+
+def test_job_scoring_leaves_the_flood_index_alone():
+    analyzer = ContentAnalyzer(analysis_workers=0, use_model=False)
+    text = "Buy cheap followers now at example dot com, limited offer!!"
+    job, results = run_job(JobRequest(items=[{"text": text}] * 10), allowed_hosts=[], analyzer=analyzer)
+
+    assert job.status == JobStatus.COMPLETED
+    assert len(analyzer.near_duplicates) == 0
+    assert all(result["category"] != "spam" for result in results)
@@ -0,0 +1,64 @@
+"""
+Language routing: every text meets the English rules, whatever else it's written in
+"""
+
+import asyncio
+
+import pytest
+
+from models.content_analyzer import ContentAnalyzer
+from models.language import ENGLISH, HINDI
+from models.schemas import ToxicityCategory
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    analyzer = ContentAnalyzer(spam_index_size=0, analysis_workers=0, use_model=False)
+    asyncio.run(analyzer.initialize())
+    return analyzer
+
+
+def test_mostly_hindi_text_still_gets_english_rules(analyzer):
+    # Under a fifth of the words are English, but "stupid people" is still hate speech
+    text = "arre yaar bhai tum log kya kar rahe ho sab, stupid people"
+    rules = analyzer.router.route(text)
+    assert rules.languages == (HINDI,)
+    assert set(analyzer.router.default.hate_speech) <= set(rules.hate_speech)
+
+    verdict = asyncio.run(analyzer.analyze_text(text))
+    assert verdict.category == ToxicityCategory.HATE_SPEECH
+    assert verdict.toxicity_score == pytest.approx(0.75)
+    assert verdict.is_toxic
+
+
+def test_hindi_rules_still_apply(analyzer):
+    verdict = asyncio.run(analyzer.analyze_text("main tujhe dekh lunga kal school mein"))
+    assert verdict.category == ToxicityCategory.THREAT
+    assert verdict.is_toxic
+
+
+def test_english_text_routes_to_english_only(analyzer):
+    assert analyzer.router.route("thanks for sharing, this is really helpful").languages == (ENGLISH,)
+
+
+@pytest.mark.parametrize("text, reads_english", [
+    ("तुम बहुत बुरे हो", False),
+    ("main tujhe dekh lunga kal school mein", False),
+    ("you are such an idiot, nobody likes you", True),
+])
+def test_model_only_reads_texts_detected_as_english(text, reads_english):
+    # The English patterns ride along on every text, but the English model must not
+    analyzer = ContentAnalyzer(spam_index_size=0, analysis_workers=0, use_model=False)
+    asyncio.run(analyzer.initialize())
+    seen = []
+
+    def classifier(text):
+        seen.append(text)
+        return [[{"label": "toxic", "score": 0.5}]]
+
+    analyzer.toxicity_classifier = classifier
+    rules = analyzer.router.route(text.lower())
+    assert (ENGLISH in rules.languages) is reads_english
+
+    asyncio.run(analyzer.analyze_text(text))
+    assert bool(seen) is reads_english
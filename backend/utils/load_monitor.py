@@ -0,0 +1,199 @@
+"""
+Load Monitoring for Health and Readiness
+
+A load balancer can only route around a saturated pod if the pod says
+so. This module keeps a few cheap gauges that the probe endpoints read
+without ever touching the analysis path:
+
+- Event-loop lag: a background task sleeps for a fixed interval and
+  records how late it woke up. A busy or blocked loop wakes it late.
+- In-flight requests and recent latency, counted by a plain ASGI
+  middleware. A request's latency ends when its first body bytes are
+  sent: that's when the client starts getting its answer, so streaming
+  responses (exports, NDJSON streams) that keep going for minutes don't
+  read as slow requests, and background work after the response doesn't
+  count either. A request stays in flight until its last byte.
+- Background write backlog: writes handed to a response's background
+  tasks that haven't finished yet.
+
+Everything is a counter or a small bounded buffer; reading them all
+costs a sort of at most a couple of thousand floats.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# The probes themselves don't count as traffic
+UNTRACKED_PATHS = frozenset({"/health", "/ready"})
+
+# Requests that take as long as the caller asks for before answering;
+# they count as in flight but not towards latency
+UNTIMED_PATHS = frozenset({"/admin/profile/sample"})
+
+
+@dataclass
+class ReadinessThresholds:
+    """Limits past which a pod reports not ready (0 turns a check off)"""
+    max_loop_lag_ms: float = 100.0
+    max_in_flight: int = 256
+    max_queued: int = 32
+    max_write_backlog: int = 1000
+    max_p99_ms: float = 1000.0
+
+
+class _TrackedWrite:
+    """
+    One background write, counted in the backlog from the moment it is
+    queued. If the task never runs (the client went away before the
+    response was sent), it is uncounted when it's thrown away.
+    """
+    __slots__ = ("monitor", "write", "pending")
+
+    def __init__(self, monitor: "LoadMonitor", write: Callable[..., Awaitable[Any]]):
+        self.monitor = monitor
+        self.write = write
+        self.pending = True
+        monitor.write_backlog += 1
+
+    async def __call__(self, *args, **kwargs):
+        try:
+            return await self.write(*args, **kwargs)
+        finally:
+            self._done()
+
+    def _done(self):
+        if self.pending:
+            self.pending = False
+            self.monitor.write_backlog -= 1
+
+    def __del__(self):
+        self._done()
+
+
+class LoadMonitor:
+    """
+    Gauges of how loaded this worker is. Wrap the app with `middleware()`,
+    `start()` the lag sampler on startup and read `snapshot()` from probes.
+    """
+
+    def __init__(
+        self,
+        lag_interval_seconds: float = 0.25,
+        lag_samples: int = 20,
+        latency_window_seconds: float = 60,
+        latency_samples: int = 2048
+    ):
+        self.lag_interval_seconds = lag_interval_seconds
+        self.latency_window_seconds = latency_window_seconds
+        self.in_flight = 0
+        self.write_backlog = 0
+        self._lags_ms: deque = deque(maxlen=lag_samples)
+        self._latencies: deque = deque(maxlen=latency_samples)  # (finished_at, ms)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start sampling event-loop lag in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample_lag())
+
+    def stop(self):
+        """Stop the background sampler"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample_lag(self):
+        interval = self.lag_interval_seconds
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            self._lags_ms.append(max(0.0, (time.perf_counter() - expected) * 1000))
+
+    def track_write(self, write: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Wrap an async write before handing it to BackgroundTasks"""
+        return _TrackedWrite(self, write)
+
+    def middleware(self, app):
+        """ASGI middleware counting in-flight HTTP requests and their latency"""
+        monitor = self
+
+        async def tracked_app(scope, receive, send):
+            if scope["type"] != "http" or scope["path"] in UNTRACKED_PATHS:
+                await app(scope, receive, send)
+                return
+
+            started = time.perf_counter()
+            timed = scope["path"] in UNTIMED_PATHS
+            finished = False
+
+            def first_byte():
+                nonlocal timed
+                if not timed:
+                    timed = True
+                    now = time.perf_counter()
+                    monitor._latencies.append((now, (now - started) * 1000))
+
+            def finish():
+                nonlocal finished
+                if not finished:
+                    finished = True
+                    monitor.in_flight -= 1
+
+            async def timed_send(message):
+                await send(message)
+                if message["type"] == "http.response.body":
+                    first_byte()
+                    if not message.get("more_body", False):
+                        finish()
+
+            monitor.in_flight += 1
+            try:
+                await app(scope, receive, timed_send)
+            finally:
+                first_byte()
+                finish()
+
+        return tracked_app
+
+    def loop_lag_ms(self) -> float:
+        """The worst lag among recent samples"""
+        return max(self._lags_ms, default=0.0)
+
+    def latency_p99_ms(self) -> Optional[float]:
+        """p99 latency of requests finished within the window (None without traffic)"""
+        horizon = time.perf_counter() - self.latency_window_seconds
+        recent: List[float] = sorted(ms for finished_at, ms in self._latencies if finished_at >= horizon)
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(len(recent) * 0.99))]
+
+    def snapshot(self, queued: int = 0) -> Dict[str, Any]:
+        """Current gauges; `queued` is work waiting behind busy workers"""
+        p99 = self.latency_p99_ms()
+        return {
+            "loop_lag_ms": round(self.loop_lag_ms(), 3),
+            "in_flight": self.in_flight,
+            "queued": queued,
+            "write_backlog": self.write_backlog,
+            "latency_p99_ms": round(p99, 3) if p99 is not None else None,
+        }
+
+    @staticmethod
+    def overloaded(snapshot: Dict[str, Any], thresholds: ReadinessThresholds) -> List[str]:
+        """Why a snapshot is past its thresholds (empty when it isn't)"""
+        checks = (
+            ("loop_lag_ms", thresholds.max_loop_lag_ms, "event loop lag"),
+            ("in_flight", thresholds.max_in_flight, "in-flight requests"),
+            ("queued", thresholds.max_queued, "queued analyses"),
+            ("write_backlog", thresholds.max_write_backlog, "background write backlog"),
+            ("latency_p99_ms", thresholds.max_p99_ms, "p99 latency"),
+        )
+        reasons = []
+        for key, limit, label in checks:
+            value = snapshot[key]
+            if limit and value is not None and value > limit:
+                reasons.append(f"{label} {value} > {limit}")
+        return reasons
@@ -7,13 +7,65 @@ what's happening in our application.
 """
 
 import sys
+import time
+import random
 import logging
-from typing import Optional
+from typing import Dict, Optional
 from loguru import logger
-from rich.console import Console
-from rich.logging import RichHandler
 
-def setup_logger(log_level: str = "INFO") -> logging.Logger:
+class EventSampler:
+    """
+    Decides which hot-path log events are worth writing.
+    
+    Each event type can be sampled (keep roughly this fraction) and rate
+    limited (at most this many per second, as a token bucket). Events
+    without a rule are always kept. Dropped events are counted so the
+    numbers can still be reported.
+    """
+    
+    def __init__(
+        self,
+        sample_rates: Optional[Dict[str, float]] = None,
+        rate_limits: Optional[Dict[str, float]] = None
+    ):
+        self.sample_rates = dict(sample_rates or {})
+        self.rate_limits = dict(rate_limits or {})
+        self.dropped: Dict[str, int] = {}
+        self._buckets: Dict[str, list] = {}  # event -> [tokens, last refill]
+    
+    def allow(self, event: str) -> bool:
+        rate = self.sample_rates.get(event)
+        if rate is not None and random.random() >= rate:
+            return self._drop(event)
+        
+        limit = self.rate_limits.get(event)
+        if limit is not None:
+            now = time.monotonic()
+            # Room for at least one event, or limits below 1/s would drop everything
+            capacity = max(limit, 1)
+            bucket = self._buckets.setdefault(event, [capacity, now])
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * limit)
+            bucket[1] = now
+            if bucket[0] < 1:
+                return self._drop(event)
+            bucket[0] -= 1
+        return True
+    
+    def _drop(self, event: str) -> bool:
+        self.dropped[event] = self.dropped.get(event, 0) + 1
+        return False
+
+# Keeps everything until setup_logger installs the configured rules
+sampler = EventSampler()
+
+def setup_logger(
+    log_level: str = "INFO",
+    log_format: str = "text",
+    log_file: str = "nirabhi.log",
+    production: bool = False,
+    sample_rates: Optional[Dict[str, float]] = None,
+    rate_limits: Optional[Dict[str, float]] = None
+) -> logging.Logger:
     """
     Set up a beautiful, informative logger for our application.
     
@@ -22,42 +74,49 @@ def setup_logger(log_level: str = "INFO") -> logging.Logger:
     - Informative with context
     - Properly formatted
     - Fun to look at (yes, logs can be fun!)
+    
+    With `log_format="json"` every line is a JSON object carrying the
+    bound fields. In `production`, sinks are written from a background
+    thread (so requests never wait on file I/O), stay plain, and never
+    dump local variables into tracebacks.
     """
+    global sampler
+    sampler = EventSampler(sample_rates, rate_limits)
     
     # Remove the default loguru handler
     logger.remove()
     
-    # Create a rich console for beautiful output
-    console = Console()
-    
     # Add a custom format that's both informative and pretty
-    log_format = (
+    text_format = (
         "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
         "<level>{level: <8}</level> | "
         "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> | "
         "<level>{message}</level>"
     )
+    sink_options = {
+        "level": log_level,
+        "serialize": log_format == "json",
+        "enqueue": production,
+        "backtrace": not production,
+        "diagnose": not production,
+    }
+    if log_format != "json":
+        sink_options["format"] = text_format
     
     # Add the new handler with our custom format
     logger.add(
         sys.stdout,
-        format=log_format,
-        level=log_level,
-        colorize=True,
-        backtrace=True,
-        diagnose=True
+        colorize=not production and log_format != "json",
+        **sink_options
     )
     
     # Also add a file handler for persistent logging
     logger.add(
-        "nirabhi.log",
-        format=log_format,
-        level=log_level,
+        log_file,
         rotation="10 MB",  # Rotate when file gets too big
         retention="7 days",  # Keep logs for a week
         compression="zip",  # Compress old logs
-        backtrace=True,
-        diagnose=True
+        **sink_options
     )
     
     # Create a standard logger that plays nice with other libraries
@@ -93,6 +152,18 @@ def setup_logger(log_level: str = "INFO") -> logging.Logger:
     # Return the loguru logger (it works great as a standard logger too!)
     return logger
 
+def log_event(event: str, message: str, level: str = "INFO", **fields):
+    """
+    Log a hot-path event, subject to its sampling and rate limit rules.
+    
+    The event name and fields are bound rather than formatted into the
+    message, so they come out as separate keys in JSON logs and user
+    text in the message is never treated as a format string.
+    """
+    if not sampler.allow(event):
+        return
+    logger.bind(event=event, **fields).log(level, message)
+
 def log_api_call(endpoint: str, method: str, user_id: Optional[str] = None):
     """
     Log an API call in a consistent, informative way.
@@ -0,0 +1,184 @@
+"""
+NDJSON Streaming for Batch Analysis
+
+A single JSON batch makes the client wait for the slowest item and makes
+us hold every result in memory. Here the request body is NDJSON, read
+line by line as it arrives, and the response is NDJSON written as each
+item finishes - so the first verdicts go out while the upload is still
+going, and memory stays flat however large the upload.
+
+Request lines:   {"id": "a", "text": "...", "thread_id": "t1"}   (id and thread_id are optional)
+Response lines:  {"index": 0, "id": "a", "result": {...}}
+                 {"index": 1, "id": null, "error": "..."}
+
+`index` is the 0-based position of the item in the upload; results
+arrive in completion order, not upload order.
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from models.content_analyzer import ContentAnalyzer
+
+
+class NDJSONDuplexResponse(StreamingResponse):
+    """
+    A streaming response that can keep reading the request body.
+
+    StreamingResponse normally reads the ASGI receive channel itself to
+    notice disconnects, which would swallow the body we are still
+    streaming in. Our generator reads the body and notices disconnects
+    on its own, so we only stream.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Optional[bytes]]:
+    """
+    Split a byte stream into lines. Lines longer than `max_line_bytes`
+    are skipped and reported as None, so one bad line can't make us
+    buffer the whole upload.
+
+    Each chunk is split once and only the piece after its last newline is
+    carried over, so the work stays linear in the size of the upload.
+    """
+    partial: List[bytes] = []  # Pieces of a line that spans chunks
+    partial_bytes = 0
+    skipping = False
+    async for chunk in chunks:
+        pieces = chunk.split(b"\n")
+        for piece in pieces[:-1]:
+            if skipping:
+                skipping = False
+                continue
+            if partial:
+                partial.append(piece)
+                piece = b"".join(partial)
+                partial = []
+                partial_bytes = 0
+            yield piece
+
+        tail = pieces[-1]
+        if skipping or not tail:
+            continue
+        partial.append(tail)
+        partial_bytes += len(tail)
+        if partial_bytes > max_line_bytes:
+            yield None
+            skipping = True
+            partial = []
+            partial_bytes = 0
+    if partial:
+        yield b"".join(partial)
+
+
+async def stream_analyses(
+    chunks: AsyncIterator[bytes],
+    analyzer: ContentAnalyzer,
+    window: int,
+    max_text_length: int,
+    on_result: Optional[Callable[[str, Any], Awaitable[None]]] = None
+) -> AsyncIterator[str]:
+    """
+    Analyze NDJSON items from `chunks` with at most `window` items in
+    flight, yielding one NDJSON result line per item as it completes.
+
+    A slot is only freed once its result line has been handed to the
+    client, so a slow reader slows the upload instead of filling memory.
+    """
+    slots = asyncio.Semaphore(window)
+    results: asyncio.Queue = asyncio.Queue()
+    done = object()
+    max_line_bytes = max_text_length * 4 + 1024  # Worst-case UTF-8 plus JSON framing
+
+    def emit(index: int, item_id: Any, payload: str):
+        results.put_nowait(f'{{"index":{index},"id":{json.dumps(item_id)},{payload}}}\n')
+
+    def emit_error(index: int, item_id: Any, error: str):
+        emit(index, item_id, f'"error":{json.dumps(error)}')
+
+    async def analyze_one(index: int, item_id: Any, text: str, thread_id: Optional[str]):
+        try:
+            result = await analyzer.analyze_text(text=text, thread_id=thread_id)
+        except Exception as e:
+            emit_error(index, item_id, f"analysis failed: {e}")
+            return
+        # Exactly one line per item: each line frees one slot
+        if on_result is not None:
+            try:
+                await on_result(text, result)
+            except Exception as e:
+                emit_error(index, item_id, f"storing the result failed: {e}")
+                return
+        emit(index, item_id, f'"result":{result.to_json()}')
+
+    async def produce():
+        tasks = set()
+        index = 0
+        try:
+            async for line in iter_lines(chunks, max_line_bytes):
+                if line is not None and not line.strip():
+                    continue
+                await slots.acquire()
+                task = _start_item(index, line)
+                if task is not None:
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                index += 1
+            await asyncio.gather(*tasks, return_exceptions=True)
+        except ClientDisconnect:
+            pass
+        finally:
+            # Client gone or consumer stopped (we get cancelled): drop what's in flight
+            for task in list(tasks):
+                task.cancel()
+            results.put_nowait(done)
+
+    def _start_item(index: int, line: Optional[bytes]) -> Optional[asyncio.Task]:
+        """Validate one line; start its analysis or report why we can't"""
+        if line is None:
+            emit_error(index, None, f"line is longer than {max_line_bytes} bytes")
+            return None
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError("each line must be a JSON object")
+        except ValueError as e:
+            emit_error(index, None, f"invalid JSON: {e}")
+            return None
+
+        item_id = item.get("id")
+        text = item.get("text")
+        if not isinstance(text, str) or not text.strip():
+            emit_error(index, item_id, "text content cannot be empty")
+            return None
+        if len(text) > max_text_length:
+            emit_error(index, item_id, f"text is longer than {max_text_length} characters")
+            return None
+        thread_id = item.get("thread_id")
+        if thread_id is not None and not isinstance(thread_id, str):
+            emit_error(index, item_id, "thread_id must be a string")
+            return None
+        return asyncio.create_task(analyze_one(index, item_id, text.strip(), thread_id))
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            line = await results.get()
+            if line is done:
+                break
+            yield line
+            slots.release()
+    finally:
+        producer.cancel()
@@ -0,0 +1,160 @@
+"""
+On-Demand CPU Profiling
+
+When analysis gets slower in production we want to see where the time
+goes, on the live node, without restarting it or slowing it down the
+rest of the time. Two modes, both returning collapsed stacks
+("frame;frame;frame weight" per line) that flamegraph.pl, speedscope
+and friends read directly:
+
+- Sampling: a short-lived thread peeks at the event loop thread's stack
+  every few milliseconds for a bounded time. Weights are sample counts.
+- Single request: one analysis runs with a profile hook installed only
+  while that request's own code is executing, so concurrent requests
+  don't leak in. Weights are microseconds of self time.
+
+Nothing is installed until a profile is requested, and only one profile
+runs at a time.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+
+def _label(code) -> str:
+    # co_qualname is 3.11+
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """Render stacks (root first) as collapsed-stack lines, heaviest first"""
+    return "".join(
+        f"{';'.join(stack)} {weight}\n"
+        for stack, weight in stacks.most_common()
+        if weight > 0
+    )
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval_seconds: float = 0.005):
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[Any, str] = {}
+
+    def run(self, duration_seconds: float) -> Counter:
+        """Sample until the duration is up (call from a worker thread)"""
+        deadline = time.monotonic() + duration_seconds
+        labels = self._labels
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _label(code)
+                stack.append(label)
+                frame = frame.f_back
+            del frame
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+            time.sleep(self.interval_seconds)
+        return self.stacks
+
+
+class CallProfiler:
+    """
+    Exact self time per call stack, from sys.setprofile events.
+    The hook is per-thread, and we only install it around the code we
+    are profiling.
+    """
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self._path: List[str] = []
+        self._labels: Dict[Any, str] = {}
+        self._last = 0
+        self.elapsed_ns = 0
+
+    def start(self):
+        self._last = time.perf_counter_ns()
+        sys.setprofile(self._hook)
+
+    def stop(self):
+        sys.setprofile(None)
+        self._charge(time.perf_counter_ns())
+        # The hook came off mid-call to setprofile, so that call never returned
+        self._path.clear()
+
+    def _charge(self, now: int):
+        if self._path:
+            self.stacks[tuple(self._path)] += now - self._last
+        self.elapsed_ns += now - self._last
+
+    def _hook(self, frame, event: str, arg: Any):
+        self._charge(time.perf_counter_ns())
+        if event == "call":
+            label = self._labels.get(frame.f_code)
+            if label is None:
+                label = self._labels[frame.f_code] = _label(frame.f_code)
+            self._path.append(label)
+        elif event == "c_call":
+            self._path.append(f"{getattr(arg, '__qualname__', repr(arg))} (builtin)")
+        elif self._path:  # return, c_return, c_exception
+            self._path.pop()
+        # Don't bill our own bookkeeping to the profiled code
+        self._last = time.perf_counter_ns()
+
+    def collapsed_microseconds(self) -> Counter:
+        micro = Counter()
+        for stack, ns in self.stacks.items():
+            micro[stack] = ns // 1000
+        return micro
+
+
+async def profile_coroutine(coro: Awaitable) -> Tuple[Any, CallProfiler]:
+    """
+    Drive a coroutine step by step with the profile hook on only while
+    it runs. Whenever it waits, the hook comes off and we wait on the
+    event loop like any task would, so other requests keep flowing and
+    stay out of the profile.
+    """
+    profiler = CallProfiler()
+    value: Any = None
+    error: Optional[BaseException] = None
+    while True:
+        profiler.start()
+        try:
+            yielded = coro.throw(error) if error is not None else coro.send(value)
+        except StopIteration as stop:
+            return stop.value, profiler
+        finally:
+            profiler.stop()
+
+        try:
+            if yielded is None:
+                value, error = await asyncio.sleep(0), None
+            else:
+                value, error = await yielded, None
+        except BaseException as e:
+            value, error = None, e
+
+
+async def sample_event_loop(duration_seconds: float, interval_seconds: float) -> StackSampler:
+    """Sample the thread running the current event loop for a while"""
+    sampler = StackSampler(threading.get_ident(), interval_seconds)
+    await asyncio.get_running_loop().run_in_executor(None, sampler.run, duration_seconds)
+    return sampler
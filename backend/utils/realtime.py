@@ -0,0 +1,218 @@
+"""
+Real-Time Chat Moderation over WebSockets
+
+Busy chat rooms send messages far faster than it makes sense to open an
+HTTP request for each one. A chat client keeps one WebSocket open
+instead, streams messages with IDs, and gets verdicts back as soon as
+each is ready - possibly out of order.
+
+Protocol (all frames are JSON text):
+
+    server -> {"type": "ready", "max_in_flight": 32}
+    client -> {"type": "config", "thread_id": "...", "context": "...", "user_preferences": {...},
+               "community_id": "..."}   (optional)
+    client -> {"id": "m1", "text": "hello there", "thread_id": "room-7", "sender_id": "u42"}
+              (thread_id and sender_id optional)
+    server -> {"type": "verdict", "id": "m1", "result": {...ContentAnalysisResponse...}}
+    server -> {"type": "error", "id": "m1", "error": "..."}
+    server -> {"type": "pause", "in_flight": 32}   stop sending, we're full
+    server -> {"type": "resume", "in_flight": 31}  go ahead again
+
+While paused we simply stop reading, so a client that ignores the
+signal is slowed down by TCP backpressure rather than by our memory.
+Every message holds its slot until the frame answering it has been
+written, so a client that stops reading can't make verdicts pile up in
+our outbox either. Binary frames aren't part of the protocol; the
+connection is closed with code 1003 if one arrives.
+"""
+
+import asyncio
+import json
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+from loguru import logger
+
+from models.content_analyzer import ContentAnalyzer
+
+UNSUPPORTED_DATA = 1003  # WebSocket close code for frames we can't accept
+
+
+class ChatModerationSession:
+    """
+    One WebSocket connection: reads messages, analyzes up to
+    `max_in_flight` of them concurrently and writes verdicts back
+    through a single writer task.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        analyzer: ContentAnalyzer,
+        max_in_flight: int,
+        max_text_length: int,
+        on_result: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ):
+        self.websocket = websocket
+        self.analyzer = analyzer
+        self.max_in_flight = max_in_flight
+        self.max_text_length = max_text_length
+        self.on_result = on_result
+
+        # Per-connection settings, parsed once from the optional config frame
+        self.context: Optional[str] = None
+        self.user_preferences: Optional[Dict[str, Any]] = None
+        self.thread_id: Optional[str] = None  # Default thread for messages that don't name one
+        self.community_id: Optional[str] = None  # Where floods are tracked for this connection
+
+        # A slot is taken per incoming frame and freed once its reply is written
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        # (frame, whether writing it frees a slot)
+        self._outbox: "asyncio.Queue[Tuple[str, bool]]" = asyncio.Queue()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def run(self):
+        """Serve the connection until the client goes away"""
+        await self.websocket.accept()
+        self._send({"type": "ready", "max_in_flight": self.max_in_flight})
+        reader = asyncio.create_task(self._read_frames())
+        writer = asyncio.create_task(self._write_frames())
+        try:
+            # The writer only finishes early if the socket broke under it
+            await asyncio.wait({reader, writer}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (reader, writer, *self._tasks):
+                task.cancel()
+
+        close_code = None
+        if reader.done() and not reader.cancelled():
+            if isinstance(reader.exception(), WebSocketDisconnect):
+                return
+            close_code = reader.result()
+        if close_code is not None:
+            await self.websocket.close(code=close_code, reason="only JSON text frames are supported")
+
+    async def _read_frames(self) -> Optional[int]:
+        """Read frames until the client leaves; returns a close code if we should hang up"""
+        while True:
+            if self._slots.locked():
+                # Window is full: tell the client, then wait for a free slot
+                self._send({"type": "pause", "in_flight": self.in_flight})
+                await self._slots.acquire()
+                self._send({"type": "resume", "in_flight": self.in_flight})
+            else:
+                await self._slots.acquire()
+            self._in_flight += 1
+
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("text") is None:
+                return UNSUPPORTED_DATA
+
+            self._accept_message(message["text"])
+
+    def _accept_message(self, raw: str):
+        """
+        Handle one incoming frame. It either gets an immediate reply or
+        starts an analysis; either way the reply frees its slot.
+        """
+        try:
+            message = json.loads(raw)
+            if not isinstance(message, dict):
+                raise ValueError("frames must be JSON objects")
+        except ValueError as e:
+            self._reply({"type": "error", "id": None, "error": f"invalid frame: {e}"})
+            return
+
+        if message.get("type") == "config":
+            self.context = message.get("context")
+            self.user_preferences = message.get("user_preferences")
+            self.community_id = message.get("community_id")
+            # With context but no thread, the connection becomes its own
+            # thread so the context is scored once rather than per message
+            self.thread_id = message.get("thread_id") or (
+                f"ws-{uuid.uuid4().hex}" if self.context else None
+            )
+            self._reply({"type": "configured", "thread_id": self.thread_id})
+            return
+
+        message_id = message.get("id")
+        text = message.get("text")
+        if message_id is None:
+            self._reply({"type": "error", "id": None, "error": "every message needs an 'id'"})
+            return
+        if not isinstance(text, str) or not text.strip():
+            self._reply({"type": "error", "id": message_id, "error": "text content cannot be empty"})
+            return
+        if len(text) > self.max_text_length:
+            self._reply({
+                "type": "error",
+                "id": message_id,
+                "error": f"text is longer than {self.max_text_length} characters"
+            })
+            return
+
+        thread_id = message.get("thread_id", self.thread_id)
+        if thread_id is not None and not isinstance(thread_id, str):
+            self._reply({"type": "error", "id": message_id, "error": "thread_id must be a string"})
+            return
+        sender_id = message.get("sender_id")
+        if sender_id is not None and not isinstance(sender_id, str):
+            self._reply({"type": "error", "id": message_id, "error": "sender_id must be a string"})
+            return
+        task = asyncio.create_task(self._analyze(message_id, text.strip(), thread_id, sender_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _analyze(self, message_id: Any, text: str, thread_id: Optional[str], sender_id: Optional[str]):
+        try:
+            result = await self.analyzer.analyze_text(
+                text=text,
+                context=self.context,
+                user_preferences=self.user_preferences,
+                thread_id=thread_id,
+                community_id=self.community_id,
+                sender_id=sender_id
+            )
+        except Exception as e:
+            self._reply({"type": "error", "id": message_id, "error": f"analysis failed: {e}"})
+            return
+
+        # Serialize the verdict once and splice it into the frame as-is
+        self._outbox.put_nowait((
+            f'{{"type":"verdict","id":{json.dumps(message_id)},"result":{result.to_json()}}}',
+            True
+        ))
+        if self.on_result is not None:
+            try:
+                await self.on_result(text, result)
+            except Exception as e:
+                # The verdict is already queued; a failed store only gets logged
+                logger.warning("⚠️ Couldn't store the verdict for message {}: {}", message_id, e)
+
+    def _reply(self, frame: Dict[str, Any]):
+        """Queue the answer to an incoming frame; writing it frees the frame's slot"""
+        self._outbox.put_nowait((json.dumps(frame), True))
+
+    def _send(self, frame: Dict[str, Any]):
+        """Queue a frame of our own (ready, pause, resume)"""
+        self._outbox.put_nowait((json.dumps(frame), False))
+
+    async def _write_frames(self):
+        """The only coroutine that writes to the socket, so frames never interleave"""
+        while True:
+            frame, frees_slot = await self._outbox.get()
+            try:
+                await self.websocket.send_text(frame)
+            except Exception:
+                return
+            if frees_slot:
+                self._in_flight -= 1
+                self._slots.release()